@@ -1,10 +1,38 @@
+import os
 import sys
-import math
+import time
+from functools import lru_cache
+
+# For --time-startup: everything from here to the first paint is counted
+STARTED = time.perf_counter()
+
+import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                            QPushButton, QComboBox, QSpinBox, QLabel, QTextEdit, QGridLayout,
-                            QButtonGroup)
-from PyQt5.QtGui import QPainter, QColor, QPen, QImage, QPixmap, QIcon, QDrag
-from PyQt5.QtCore import Qt, QSize, QPoint, QMimeData
+                            QPushButton, QComboBox, QSpinBox, QLabel, QPlainTextEdit, QGridLayout,
+                            QButtonGroup, QLineEdit, QCheckBox, QScrollBar, QListWidget,
+                            QListView, QInputDialog, QFileDialog, QMessageBox, QDialog, QShortcut)
+from PyQt5.QtGui import QPainter, QColor, QPen, QImage, QPixmap, QIcon, QDrag, QKeySequence
+from PyQt5.QtCore import Qt, QSize, QPoint, QRect, QMimeData, QTimer, QThread, pyqtSignal
+from pattern_grid import PatternGrid, union_bounds
+from animation import Timeline
+import raster
+import pov_core
+from glyphs import GLYPHS
+from stroke import StrokeEngine
+from text_layout import TextLayout, TextRenderer
+# codec, hex_import, image_import, library, live_hex, pov_upload, similarity
+# and swing_sim are only imported by the methods that use them, which keeps
+# them out of startup
+
+# Freehand samples arriving within one frame are applied and repainted together
+FRAME_INTERVAL_MS = 16
+
+ONION_SKIN_COLOR = QColor(190, 190, 230)
+
+PROJECT_FILTER = "POV projects (*.pov);;JSON projects (*.json)"
+
+SWING_FRAME_MS = 33
+SWING_WAND_COLOR = QColor(110, 110, 110)
 
 class POVWandDesigner(QMainWindow):
     def __init__(self):
@@ -12,14 +40,16 @@ class POVWandDesigner(QMainWindow):
         self.setWindowTitle("POV Wand Pattern Designer")
         self.setMinimumSize(800, 600)
 
-        # Set the window icon
-        self.setWindowIcon(QIcon('pov_wand.ico'))  # Ensure this file exists in the directory
+        # The icon is decoded after the first frame is on screen
+        QTimer.singleShot(0, lambda: self.setWindowIcon(QIcon('pov_wand.ico')))
 
         # Initial parameters
         self.width = 64
         self.height = 16
-        self.grid = [[False] * self.width for _ in range(self.height)]
-        self.preview_grid = None
+        self.grid = PatternGrid(self.width, self.height)
+        self.timeline = Timeline(self.grid)
+        self.text_renderer = TextRenderer(self.grid)
+        self.overlay = None
         self.current_tool = "draw"
         self.is_mouse_down = False
         self.start_point = None
@@ -39,11 +69,27 @@ class POVWandDesigner(QMainWindow):
         controls_layout.addWidget(QLabel("Design Width:"))
         controls_layout.addWidget(self.width_spin)
 
+        self.long_canvas_check = QCheckBox("Long Canvas")
+        self.long_canvas_check.toggled.connect(self.set_long_canvas)
+        controls_layout.addWidget(self.long_canvas_check)
+
         self.format_combo = QComboBox()
-        self.format_combo.addItems(["Heart Format (64 cols)", "Hanzi Format (16 cols)"])
-        self.format_combo.currentTextChanged.connect(self.update_format)
+        for fmt in pov_core.FORMATS.values():
+            self.format_combo.addItem(fmt.label, fmt.name)
+        self.format_combo.currentIndexChanged.connect(self.update_format)
         controls_layout.addWidget(QLabel("Output Format:"))
         controls_layout.addWidget(self.format_combo)
+
+        self.frames_combo = QComboBox()
+        self.frames_combo.addItems(["Single Frame", "Consecutive Frames", "Marquee Frames"])
+        controls_layout.addWidget(QLabel("Export:"))
+        controls_layout.addWidget(self.frames_combo)
+
+        self.compress_check = QCheckBox("Compressed")
+        controls_layout.addWidget(self.compress_check)
+
+        self.swing_check = QCheckBox("Swing Preview")
+        controls_layout.addWidget(self.swing_check)
         layout.addLayout(controls_layout)
 
         # Tool buttons
@@ -67,37 +113,352 @@ class POVWandDesigner(QMainWindow):
         
         layout.addLayout(tools_layout)
 
+        # Text entry, rendered into the grid as it is typed
+        text_layout = QHBoxLayout()
+        self.text_input = QLineEdit()
+        self.text_input.setPlaceholderText("Type a name or message")
+        self.text_input.textChanged.connect(self.update_text)
+        text_layout.addWidget(QLabel("Text:"))
+        text_layout.addWidget(self.text_input)
+
+        self.align_combo = QComboBox()
+        self.align_combo.addItems(["Center", "Left", "Right"])
+        self.align_combo.currentTextChanged.connect(self.update_text_layout)
+        text_layout.addWidget(QLabel("Align:"))
+        text_layout.addWidget(self.align_combo)
+
+        self.kerning_check = QCheckBox("Kerning")
+        self.kerning_check.toggled.connect(self.update_text_layout)
+        text_layout.addWidget(self.kerning_check)
+        layout.addLayout(text_layout)
+
         # Alphabet keyboard
         self.alphabet_keyboard = AlphabetKeyboard(self)
         layout.addWidget(self.alphabet_keyboard)
 
         # Drawing and preview area
         self.grid_widget = GridWidget(self)
+        self.scrollbar = QScrollBar(Qt.Horizontal)
+        self.scrollbar.valueChanged.connect(self.grid_widget.set_scroll)
+        self.scrollbar.hide()
         self.preview_widget = PreviewWidget(self)
+        self.swing_check.toggled.connect(self.preview_widget.set_swing)
+        canvas_layout = QVBoxLayout()
+        canvas_layout.addWidget(self.grid_widget)
+        canvas_layout.addWidget(self.scrollbar)
         display_layout = QHBoxLayout()
-        display_layout.addWidget(self.grid_widget)
+        display_layout.addLayout(canvas_layout)
         display_layout.addWidget(self.preview_widget)
         layout.addLayout(display_layout)
 
+        # Animation timeline
+        timeline_layout = QHBoxLayout()
+        self.frame_list = QListWidget()
+        self.frame_list.setFlow(QListView.LeftToRight)
+        self.frame_list.setFixedHeight(40)
+        self.frame_list.currentRowChanged.connect(self.select_frame)
+        timeline_layout.addWidget(QLabel("Frames:"))
+        timeline_layout.addWidget(self.frame_list)
+
+        for label, handler in [("Add Frame", self.add_frame), ("Blank Frame", self.add_blank_frame),
+                               ("Delete Frame", self.delete_frame),
+                               ("Move Left", lambda: self.move_frame(-1)),
+                               ("Move Right", lambda: self.move_frame(1))]:
+            btn = QPushButton(label)
+            btn.clicked.connect(handler)
+            timeline_layout.addWidget(btn)
+
+        self.duration_spin = QSpinBox()
+        self.duration_spin.setRange(10, 10000)
+        self.duration_spin.setSingleStep(10)
+        self.duration_spin.setSuffix(" ms")
+        self.duration_spin.valueChanged.connect(self.update_duration)
+        timeline_layout.addWidget(QLabel("Duration:"))
+        timeline_layout.addWidget(self.duration_spin)
+
+        self.onion_check = QCheckBox("Onion Skin")
+        self.onion_check.toggled.connect(self.grid_widget.update)
+        timeline_layout.addWidget(self.onion_check)
+        layout.addLayout(timeline_layout)
+
         # Hex output
+        hex_buttons = QHBoxLayout()
         self.generate_btn = QPushButton("Generate Hex Code")
         self.generate_btn.clicked.connect(self.generate_hex_code)
-        layout.addWidget(self.generate_btn)
+        hex_buttons.addWidget(self.generate_btn, 1)
+        self.live_check = QCheckBox("Live")
+        self.live_check.setToolTip("Update the hex output as you draw")
+        self.live_check.toggled.connect(self.set_live_hex)
+        hex_buttons.addWidget(self.live_check)
+        self.live_hex = None
+        self.upload_btn = QPushButton("Upload...")
+        self.upload_btn.clicked.connect(self.upload_to_wands)
+        hex_buttons.addWidget(self.upload_btn)
+        self.upload_thread = None
+        paste_btn = QPushButton("Paste Hex...")
+        paste_btn.clicked.connect(self.paste_hex)
+        hex_buttons.addWidget(paste_btn)
+        open_btn = QPushButton("Import File...")
+        open_btn.clicked.connect(self.import_hex_file)
+        hex_buttons.addWidget(open_btn)
+        image_btn = QPushButton("Import Image...")
+        image_btn.clicked.connect(self.import_image)
+        hex_buttons.addWidget(image_btn)
+        open_project_btn = QPushButton("Open Project...")
+        open_project_btn.clicked.connect(self.open_project)
+        hex_buttons.addWidget(open_project_btn)
+        save_project_btn = QPushButton("Save Project...")
+        save_project_btn.clicked.connect(self.save_project)
+        hex_buttons.addWidget(save_project_btn)
+        similar_btn = QPushButton("Find Similar...")
+        similar_btn.clicked.connect(self.show_similar_panel)
+        hex_buttons.addWidget(similar_btn)
+        self.similar_panel = None
+        layout.addLayout(hex_buttons)
 
-        self.hex_output = QTextEdit()
+        self.hex_output = QPlainTextEdit()
         self.hex_output.setReadOnly(True)
         layout.addWidget(self.hex_output)
 
         self.update_tool_buttons()
+        self.update_timeline()
+
+        # Instrumentation (profiling.py) is only imported once it is switched on
+        self.profiler = None
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, self.toggle_profiling)
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.toggle_profile_capture)
+        if os.environ.get("POV_PROFILE"):
+            self.toggle_profiling()
+
+    def get_profiler(self):
+        if self.profiler is None:
+            import profiling
+            self.profiler = profiling.Profiler(self)
+        return self.profiler
+
+    def toggle_profiling(self):
+        self.get_profiler().set_enabled(not self.profiler.enabled)
+        self.statusBar().showMessage(f"Profiling {'on' if self.profiler.enabled else 'off'}", 3000)
+
+    def toggle_profile_capture(self):
+        if self.get_profiler().capture is None:
+            self.profiler.start_capture()
+            self.statusBar().showMessage("Profile capture started (Ctrl+Shift+D to save)")
+        else:
+            path = self.profiler.stop_capture()
+            self.statusBar().showMessage(f"Profile written to {path}", 5000)
 
     def update_width(self, value):
-        self.width = value
-        self.grid = [[False] * self.width for _ in range(self.height)]
+        self.resize_canvas(value, self.height)
+
+    def resize_canvas(self, width, height):
+        # Every frame keeps its columns and top rows; the text is laid out again
+        # on the new canvas
+        self.width = width
+        self.height = height
+        self.text_renderer.clear()
+        self.timeline.store(self.grid)
+        self.timeline.resize(self.width, self.height)
+        self.grid = self.timeline.select(self.timeline.current)
+        self.text_renderer = TextRenderer(self.grid, self.text_renderer.layout)
+        self.text_renderer.set_text(self.text_input.text())
+        self.grid.take_dirty()
+        self.grid_widget.setMinimumHeight(self.height * self.grid_widget.cell_size)
+        self.update_scroll_range()
+        self.grid_widget.invalidate_layer()
+        self.preview_widget.update()
+        self.schedule_live_hex()
+
+    def set_long_canvas(self, enabled):
+        self.width_spin.setMaximum(pov_core.MAX_CANVAS_WIDTH if enabled else 64)
+
+    def update_scroll_range(self):
+        page = max(-(-self.grid_widget.width() // self.grid_widget.cell_size), 1)
+        self.scrollbar.setPageStep(page)
+        self.scrollbar.setRange(0, max(0, self.grid.width - page))
+        self.scrollbar.setVisible(self.grid.width > page)
+
+    def show_frame(self, grid):
+        # Switch the editor to another frame's grid; its text is already baked in
+        self.grid = grid
+        self.text_renderer = TextRenderer(self.grid, self.text_renderer.layout)
+        self.text_input.blockSignals(True)
+        self.text_input.clear()
+        self.text_input.blockSignals(False)
+        self.grid.take_dirty()
         self.grid_widget.update()
         self.preview_widget.update()
+        self.update_timeline()
+        self.schedule_live_hex()
+
+    def update_timeline(self):
+        self.frame_list.blockSignals(True)
+        while self.frame_list.count() < len(self.timeline):
+            self.frame_list.addItem(str(self.frame_list.count() + 1))
+        while self.frame_list.count() > len(self.timeline):
+            self.frame_list.takeItem(self.frame_list.count() - 1)
+        self.frame_list.setCurrentRow(self.timeline.current)
+        self.frame_list.blockSignals(False)
+        self.duration_spin.blockSignals(True)
+        self.duration_spin.setValue(self.timeline[self.timeline.current].duration)
+        self.duration_spin.blockSignals(False)
+
+    def select_frame(self, index):
+        if 0 <= index != self.timeline.current:
+            self.timeline.store(self.grid)
+            self.show_frame(self.timeline.select(index))
+
+    def add_frame(self):
+        self.timeline.store(self.grid)
+        self.show_frame(self.timeline.duplicate())
+
+    def add_blank_frame(self):
+        self.timeline.store(self.grid)
+        self.show_frame(self.timeline.insert_blank())
+
+    def delete_frame(self):
+        self.show_frame(self.timeline.remove())
+
+    def update_duration(self, value):
+        self.timeline.set_duration(value)
+        self.schedule_live_hex()
+
+    def move_frame(self, offset):
+        self.timeline.store(self.grid)
+        self.show_frame(self.timeline.move(self.timeline.current + offset))
+
+    def import_grids(self, grids, durations=None):
+        # The first pattern replaces the current frame, the rest follow it as new frames
+        if not grids:
+            QMessageBox.warning(self, "Import", "No hex blocks found.")
+            return
+        # Patterns from another wand are fitted to the canvas height
+        grids = [grid if grid.height == self.height else grid.region(0, 0, self.height, grid.width)
+                 for grid in grids]
+        self.text_renderer.reset()
+        self.grid.set_columns(0, grids[0].resized(self.grid.width).columns())
+        self.timeline.store(self.grid)
+        if durations:
+            self.timeline.set_duration(durations[0])
+        for i, grid in enumerate(grids[1:], 1):
+            self.timeline.insert(grid)
+            if durations:
+                self.timeline.set_duration(durations[i])
+        self.show_frame(self.timeline.select(self.timeline.current))
+
+    def paste_hex(self):
+        text, ok = QInputDialog.getMultiLineText(self, "Paste Hex", "Hex blocks (0xNN, ...):")
+        if not ok:
+            return
+        import hex_import
+        try:
+            grids = hex_import.import_text(text, self.output_format)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Paste Hex", str(e))
+            return
+        self.import_grids(grids)
+
+    def import_hex_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Hex", "",
+                                              "Pattern files (*.txt *.h *.c *.ino *.hex *.bin);;All files (*)")
+        if not path:
+            return
+        import hex_import
+        block_size = pov_core.get_format(self.output_format).block_size
+        try:
+            grids = [hex_import.block_to_grid(block, self.output_format)
+                     for block in hex_import.iter_file(path, block_size)]
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Import", str(e))
+            return
+        self.import_grids(grids)
+
+    def import_image(self):
+        import image_import
+        path, _ = QFileDialog.getOpenFileName(self, "Import Image", "", image_import.IMAGE_FILTER)
+        if not path:
+            return
+        method, ok = QInputDialog.getItem(self, "Import Image", "Conversion to 1 bit:",
+                                          image_import.DITHER_METHODS, 0, False)
+        if not ok:
+            return
+        try:
+            frames = list(image_import.iter_grids(path, method=method, width=self.grid.width,
+                                                  height=self.height))
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Import Image", str(e))
+            return
+        self.import_grids([grid for grid, duration in frames], [duration for grid, duration in frames])
+
+    def show_similar_panel(self):
+        if self.similar_panel is None:
+            self.similar_panel = SimilarPanel(self)
+        self.similar_panel.show()
+        self.similar_panel.raise_()
+
+    def save_project(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Project", "", PROJECT_FILTER)
+        if not path:
+            return
+        self.timeline.store(self.grid)
+        patterns = ((f"frame {i + 1}", grid, duration)
+                    for i, (grid, duration) in enumerate(self.timeline.grids()))
+        import library
+        try:
+            library.save(path, patterns, {"format": self.output_format})
+        except OSError as e:
+            QMessageBox.warning(self, "Save Project", str(e))
+
+    def open_project(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Project", "", PROJECT_FILTER)
+        if path:
+            self.load_project(path)
+
+    def load_project(self, path):
+        import library
+        try:
+            patterns, meta = library.load(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Open Project", str(e))
+            return
+        if not patterns:
+            QMessageBox.warning(self, "Open Project", "The project has no patterns.")
+            return
+        # The format decides the canvas height the frames are fitted to
+        if meta.get("format") in pov_core.FORMATS:
+            self.format_combo.setCurrentIndex(self.format_combo.findData(meta["format"]))
+        width = max(1, min(patterns[0][1].width, pov_core.MAX_CANVAS_WIDTH))
+        self.timeline = Timeline.from_grids(
+            (grid if grid.height == self.height else grid.region(0, 0, self.height, grid.width), duration)
+            for name, grid, duration in patterns)
+        self.timeline.resize(width)
+        self.width = width
+        self.width_spin.blockSignals(True)
+        self.long_canvas_check.setChecked(width > 64)
+        self.width_spin.setValue(width)
+        self.width_spin.blockSignals(False)
+        self.show_frame(self.timeline.select(0))
+        self.update_scroll_range()
+        self.grid_widget.invalidate_layer()
+
+    def text_layout(self):
+        return TextLayout(align=self.align_combo.currentText().lower(),
+                          kerning="auto" if self.kerning_check.isChecked() else None)
+
+    def update_text(self, text):
+        self.text_renderer.set_text(text)
+        self.refresh()
 
-    def update_format(self, text):
-        self.output_format = "heart" if "Heart" in text else "hanzi"
+    def update_text_layout(self, *args):
+        self.text_renderer.set_layout(self.text_layout())
+        self.refresh()
+
+    def update_format(self, index):
+        # The canvas has one row per LED of the selected wand
+        self.output_format = self.format_combo.itemData(index)
+        leds = pov_core.get_format(self.output_format).leds
+        if leds != self.height:
+            self.resize_canvas(self.width, leds)
 
     def set_tool(self, tool):
         self.current_tool = tool
@@ -108,195 +469,150 @@ class POVWandDesigner(QMainWindow):
             btn.setStyleSheet("background-color: #3498DB" if tool == self.current_tool else "")
 
     def clear_grid(self):
-        self.grid = [[False] * self.width for _ in range(self.height)]
+        self.grid.clear()
+        self.text_renderer.reset()
+        self.text_input.clear()
         self.hex_output.clear()
-        self.grid_widget.update()
-        self.preview_widget.update()
+        self.refresh()
+
+    def refresh(self):
+        # Repaint only the cells the model reports as changed since last time
+        rects = self.grid.take_dirty()
+        if rects:
+            self.grid_widget.update_cells(rects)
+            self.preview_widget.invalidate_columns(rects)
+            if self.live_hex is not None:
+                self.live_hex.columns_changed(rects)
+
+    def set_live_hex(self, enabled):
+        if enabled:
+            import live_hex
+            self.live_hex = live_hex.LiveHex(self)
+        elif self.live_hex is not None:
+            self.live_hex.close()
+            self.live_hex = None
+
+    def schedule_live_hex(self):
+        # Frame, width and duration changes reshape the text: rebuild it once
+        if self.live_hex is not None:
+            self.live_hex.schedule()
 
     def draw_line(self, grid, r0, c0, r1, c1, value):
-        dr = abs(r1 - r0)
-        dc = abs(c1 - c0)
-        sr = 1 if r0 < r1 else -1
-        sc = 1 if c0 < c1 else -1
-        err = (dc if dc > dr else -dr) / 2
-
-        while True:
-            if 0 <= r0 < self.height and 0 <= c0 < self.width:
-                grid[r0][c0] = value
-            if r0 == r1 and c0 == c1:
-                break
-            err2 = err
-            if err2 > -dc:
-                err -= dr
-                c0 += sc
-            if err2 < dr:
-                err += dc
-                r0 += sr
+        raster.draw_line(grid, r0, c0, r1, c1, value)
 
     def draw_circle(self, grid, center_row, center_col, end_row, end_col, value):
-        radius = math.sqrt((end_row - center_row) ** 2 + (end_col - center_col) ** 2)
-        radius = round(radius)
-        x = radius
-        y = 0
-        err = 0
-
-        while x >= y:
-            points = [
-                (center_row + y, center_col + x), (center_row + x, center_col + y),
-                (center_row - y, center_col + x), (center_row - x, center_col + y),
-                (center_row - y, center_col - x), (center_row - x, center_col - y),
-                (center_row + y, center_col - x), (center_row + x, center_col - y)
-            ]
-            for r, c in points:
-                if 0 <= r < self.height and 0 <= c < self.width:
-                    grid[r][c] = value
-            if x > y:
-                points = [
-                    (center_row + y + 1, center_col + x), (center_row + x, center_col + y + 1),
-                    (center_row - y - 1, center_col + x), (center_row - x, center_col + y + 1),
-                    (center_row - y - 1, center_col - x), (center_row - x, center_col - y - 1),
-                    (center_row + y + 1, center_col - x), (center_row + x, center_col - y - 1)
-                ]
-                for r, c in points:
-                    if 0 <= r < self.height and 0 <= c < self.width:
-                        grid[r][c] = value
-            y += 1
-            err += 1 + 2 * y
-            if 2 * (err - x) + 1 > 0:
-                x -= 1
-                err += 1 - 2 * x
+        raster.draw_circle(grid, center_row, center_col, end_row, end_col, value)
 
     def fill_circle(self, grid, center_row, center_col, radius, value):
-        for r in range(self.height):
-            for c in range(self.width):
-                distance = math.sqrt((r - center_row) ** 2 + (c - center_col) ** 2)
-                if distance <= radius:
-                    grid[r][c] = value
+        raster.fill_circle(grid, center_row, center_col, radius, value)
 
     def draw_heart(self):
         self.clear_grid()
-        heart_pattern = [
-            "0000011000110000",
-            "0001111111111000",
-            "0011111111111100",
-            "0111111111111110",
-            "0111111111111110",
-            "0111111111111110",
-            "0011111111111100",
-            "0001111111111000",
-            "0000111111110000",
-            "0000011111100000",
-            "0000001111000000",
-            "0000000110000000",
-        ]
-        pattern_width = 16
-        h_offset = (self.width - pattern_width) // 2
-        v_offset = 2
-
-        for row, binary in enumerate(heart_pattern):
-            shifted_row = row + v_offset
-            for col, bit in enumerate(binary):
-                shifted_col = col + h_offset
-                if 0 <= shifted_row < self.height and 0 <= shifted_col < self.width:
-                    self.grid[shifted_row][shifted_col] = (bit == '1')
-
-        self.grid_widget.update()
-        self.preview_widget.update()
+        pov_core.draw_heart(self.grid)
+        self.refresh()
 
     def draw_hi(self):
         self.clear_grid()
-        pattern_width = 13
-        offset = (self.width - pattern_width) // 2
-        hi_pattern = [
-            # Top half
-            [
-                # H left vertical line
-                (2, 1), (2, 2), (2, 3), (2, 4), (2, 5), (2, 6), (2, 7),
-                # H horizontal bar (on row 6)
-                (3, 6), (4, 6), (5, 6),
-                # H right vertical line
-                (6, 1), (6, 2), (6, 3), (6, 4), (6, 5), (6, 6), (6, 7),
-                # I top bar
-                (9, 1), (10, 1), (11, 1), (12, 1), (13, 1),
-                # I vertical bar
-                (11, 2), (11, 3), (11, 4), (11, 5), (11, 6), (11, 7),
-            ],
-            # Bottom half
-            [
-                # H left vertical line
-                (2, 8), (2, 9), (2, 10), (2, 11), (2, 12), (2, 13),
-                # H right vertical line
-                (6, 8), (6, 9), (6, 10), (6, 11), (6, 12), (6, 13),
-                # I vertical bar
-                (11, 8), (11, 9), (11, 10), (11, 11), (11, 12),
-                # I bottom bar
-                (9, 13), (10, 13), (11, 13), (12, 13), (13, 13)
-            ]
-        ]
-        for points in hi_pattern:
-            for col, row in points:
-                shifted_col = col + offset
-                if 0 <= shifted_col < self.width and row < self.height:
-                    self.grid[row][shifted_col] = True
-        self.grid_widget.update()
-        self.preview_widget.update()
+        pov_core.draw_hi(self.grid)
+        self.refresh()
 
     def draw_smiley(self):
         self.clear_grid()
-        center_col = self.width // 2
-        center_row = self.height // 2
-        radius = min(self.width // 4, 7)
+        pov_core.draw_smiley(self.grid)
+        self.refresh()
 
-        self.fill_circle(self.grid, center_row, center_col, radius, True)
+    def generate_hex_code(self):
+        mode = pov_core.FRAME_MODES[self.frames_combo.currentIndex()]
+        if self.compress_check.isChecked():
+            import codec
+            self.timeline.store(self.grid)
+            blocks = (block for grid, duration in self.timeline.grids()
+                      for block in pov_core.frame_blocks(grid, self.output_format, mode))
+            try:
+                text = codec.generate_compressed_hex(blocks, self.output_format)
+            except ValueError as e:
+                # One stream holds at most 65535 frames
+                self.hex_output.clear()
+                self.statusBar().showMessage(f"Cannot compress: {e}", 5000)
+                return
+            self.hex_output.setPlainText(text)
+            return
+        if len(self.timeline) == 1:
+            self.hex_output.setPlainText(pov_core.generate_hex_code(self.grid, self.output_format, mode))
+            return
+        self.timeline.store(self.grid)
+        self.hex_output.setPlainText(pov_core.generate_animation_hex(self.timeline.grids(), self.output_format, mode))
 
-        eye_radius = radius // 4
-        self.fill_circle(self.grid, center_row - radius // 2, center_col - radius // 2, eye_radius, False)
-        self.fill_circle(self.grid, center_row - radius // 2, center_col + radius // 2, eye_radius, False)
+    def export_bytes(self):
+        # The bytes behind generate_hex_code's text, for sending to a device
+        mode = pov_core.FRAME_MODES[self.frames_combo.currentIndex()]
+        self.timeline.store(self.grid)
+        blocks = [block for grid, duration in self.timeline.grids()
+                  for block in pov_core.frame_blocks(grid, self.output_format, mode)]
+        if self.compress_check.isChecked():
+            import codec
+            return codec.format_stream(blocks, self.output_format)
+        return b"".join(blocks)
 
-        mouth_radius = radius // 2
-        for col in range(center_col - mouth_radius, center_col + mouth_radius + 1):
-            row = center_row + radius // 2
-            if 0 <= row < self.height and 0 <= col < self.width:
-                self.grid[row][col] = False
-        for col in [center_col - mouth_radius - 1, center_col + mouth_radius + 1]:
-            row = center_row + radius // 2 - 1
-            if 0 <= row < self.height and 0 <= col < self.width:
-                self.grid[row][col] = False
+    def upload_to_wands(self):
+        if self.upload_thread is not None:
+            return
+        text, ok = QInputDialog.getText(self, "Upload", "Serial ports (separated by spaces):",
+                                        text=os.environ.get("POV_UPLOAD_PORTS", ""))
+        ports = text.split()
+        if not ok or not ports:
+            return
+        try:
+            data = self.export_bytes()
+        except ValueError as e:
+            QMessageBox.warning(self, "Upload", str(e))
+            return
+        self.upload_btn.setEnabled(False)
+        self.statusBar().showMessage(f"Uploading to {len(ports)} wand(s)...")
+        self.upload_thread = UploadThread(ports, data, self)
+        self.upload_thread.done.connect(self.upload_finished)
+        self.upload_thread.start()
 
-        self.draw_circle(self.grid, center_row, center_col, center_row + radius, center_col, True)
+    def upload_finished(self, lines, failed):
+        self.upload_thread.wait()
+        self.upload_thread = None
+        self.upload_btn.setEnabled(True)
+        if failed:
+            QMessageBox.warning(self, "Upload", "\n".join(lines))
+        self.statusBar().showMessage("; ".join(lines), 5000)
 
-        self.grid_widget.update()
-        self.preview_widget.update()
+class UploadThread(QThread):
+    # Runs the asyncio upload off the GUI thread and reports one line per port
+    done = pyqtSignal(list, bool)
 
-    def generate_hex_code(self):
-        bytes = []
-        max_cols = min(self.width, 16 if self.output_format == "hanzi" else 64)
-
-        for col in range(max_cols):
-            top_byte = 0
-            for row in range(8):
-                if col < max_cols and row < self.height and self.grid[row][col]:
-                    top_byte |= (1 << row)
-            bytes.append(top_byte)
-
-            bottom_byte = 0
-            for row in range(8, 16):
-                if col < max_cols and row < self.height and self.grid[row][col]:
-                    bottom_byte |= (1 << (row - 8))
-            bytes.append(bottom_byte)
-
-        while len(bytes) < 128:
-            bytes.append(0)
-
-        formatted_code = ""
-        for line in range(8):
-            line_output = ""
-            for i in range(16):
-                byte_index = line * 16 + i
-                line_output += f"0x{bytes[byte_index]:02X},"
-            formatted_code += line_output + "\n"
-        
-        self.hex_output.setText(formatted_code)
+    def __init__(self, ports, data, parent):
+        super().__init__(parent)
+        self.ports = ports
+        self.data = data
+
+    def run(self):
+        import asyncio
+        import pov_upload
+        results = asyncio.run(pov_upload.upload_many(self.ports, self.data))
+        lines = [str(r) if isinstance(r, Exception) else r.summary() for r in results]
+        self.done.emit(lines, any(isinstance(r, Exception) for r in results))
+
+@lru_cache(maxsize=64)
+def glyph_pixmap(letter, cell_size):
+    # Drag pixmap for a glyph, scaled up for visibility; cached per glyph and scale
+    glyph = GLYPHS[letter]
+    pixmap = QPixmap(glyph.width * cell_size, glyph.height * cell_size)
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    for c, mask in enumerate(glyph.columns):
+        r = 0
+        while mask:
+            if mask & 1:
+                painter.fillRect(c * cell_size, r * cell_size, cell_size, cell_size, Qt.black)
+            mask >>= 1
+            r += 1
+    painter.end()
+    return pixmap
 
 class AlphabetKeyboard(QWidget):
     def __init__(self, parent):
@@ -304,320 +620,26 @@ class AlphabetKeyboard(QWidget):
         self.parent = parent
         layout = QHBoxLayout(self)
         layout.setSpacing(2)
+        self.setStyleSheet("QPushButton { background-color: #D3D3D3; font-size: 14px; }")
+        margins = layout.contentsMargins()
+        self.setMinimumHeight(30 + margins.top() + margins.bottom())
+        self.built = False
+
+    def paintEvent(self, event):
+        # The letter buttons are created once the first frame is on screen
+        if not self.built:
+            self.built = True
+            QTimer.singleShot(0, self.build_buttons)
 
-        # Define the 9x5 letter patterns here for drag preview
-        self.letter_patterns = {
-            'A': [
-                "00100",
-                "01010",
-                "10001",
-                "10001",
-                "11111",
-                "10001",
-                "10001",
-                "10001",
-                "10001"
-            ],
-            'B': [
-                "11100",
-                "10010",
-                "10001",
-                "10001",
-                "11110",
-                "10001",
-                "10001",
-                "10010",
-                "11100"
-            ],
-            'C': [
-                "01110",
-                "10001",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10001",
-                "01110"
-            ],
-            'D': [
-                "11100",
-                "10010",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10010",
-                "11100"
-            ],
-            'E': [
-                "11111",
-                "10000",
-                "10000",
-                "10000",
-                "11110",
-                "10000",
-                "10000",
-                "10000",
-                "11111"
-            ],
-            'F': [
-                "11111",
-                "10000",
-                "10000",
-                "10000",
-                "11110",
-                "10000",
-                "10000",
-                "10000",
-                "10000"
-            ],
-            'G': [
-                "01110",
-                "10001",
-                "10000",
-                "10000",
-                "10011",
-                "10001",
-                "10001",
-                "10001",
-                "01110"
-            ],
-            'H': [
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "11111",
-                "10001",
-                "10001",
-                "10001",
-                "10001"
-            ],
-            'I': [
-                "11111",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "11111"
-            ],
-            'J': [
-                "00111",
-                "00010",
-                "00010",
-                "00010",
-                "00010",
-                "00010",
-                "10010",
-                "10010",
-                "01100"
-            ],
-            'K': [
-                "10001",
-                "10010",
-                "10100",
-                "11000",
-                "11000",
-                "10100",
-                "10010",
-                "10001",
-                "10001"
-            ],
-            'L': [
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "11111"
-            ],
-            'M': [
-                "10001",
-                "11011",
-                "10101",
-                "10101",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001"
-            ],
-            'N': [
-                "10001",
-                "11001",
-                "11001",
-                "10101",
-                "10101",
-                "10011",
-                "10011",
-                "10001",
-                "10001"
-            ],
-            'O': [
-                "01110",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "01110"
-            ],
-            'P': [
-                "11110",
-                "10001",
-                "10001",
-                "10001",
-                "11110",
-                "10000",
-                "10000",
-                "10000",
-                "10000"
-            ],
-            'Q': [
-                "01110",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10101",
-                "10011",
-                "10001",
-                "01111"
-            ],
-            'R': [
-                "11110",
-                "10001",
-                "10001",
-                "10001",
-                "11110",
-                "10010",
-                "10001",
-                "10001",
-                "10001"
-            ],
-            'S': [
-                "01111",
-                "10000",
-                "10000",
-                "10000",
-                "01110",
-                "00001",
-                "00001",
-                "00001",
-                "11110"
-            ],
-            'T': [
-                "11111",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100"
-            ],
-            'U': [
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "01110"
-            ],
-            'V': [
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "01010",
-                "01010",
-                "00100"
-            ],
-            'W': [
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10101",
-                "10101",
-                "10101",
-                "11011",
-                "10001"
-            ],
-            'X': [
-                "10001",
-                "10001",
-                "01010",
-                "01010",
-                "00100",
-                "01010",
-                "01010",
-                "10001",
-                "10001"
-            ],
-            'Y': [
-                "10001",
-                "10001",
-                "10001",
-                "01010",
-                "01010",
-                "00100",
-                "00100",
-                "00100",
-                "00100"
-            ],
-            'Z': [
-                "11111",
-                "00001",
-                "00010",
-                "00100",
-                "01000",
-                "01000",
-                "10000",
-                "10000",
-                "11111"
-            ]
-        }
-
-        # Create buttons for each letter (A-Z)
+    def build_buttons(self):
         for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
             btn = QPushButton(letter)
             btn.setFixedSize(30, 30)
-            btn.setStyleSheet("background-color: #D3D3D3; font-size: 14px;")
             btn.mousePressEvent = lambda event, l=letter: self.start_drag(event, l)
-            layout.addWidget(btn)
+            self.layout().addWidget(btn)
 
     def create_letter_pixmap(self, letter):
-        # Create a pixmap for the letter (9x5 pixels, scaled up for visibility)
-        cell_size = 5  # Smaller cell size for the drag preview
-        pixmap = QPixmap(5 * cell_size, 9 * cell_size)
-        pixmap.fill(Qt.transparent)
-        painter = QPainter(pixmap)
-        
-        pattern = self.letter_patterns[letter]
-        for r, row in enumerate(pattern):
-            for c, bit in enumerate(row):
-                if bit == '1':
-                    painter.fillRect(c * cell_size, r * cell_size, cell_size, cell_size, Qt.black)
-        
-        painter.end()
-        return pixmap
+        return glyph_pixmap(letter, 5)  # Smaller cell size for the drag preview
 
     def start_drag(self, event, letter):
         if event.button() == Qt.LeftButton:
@@ -638,358 +660,176 @@ class GridWidget(QWidget):
         self.cell_size = 20
         self.setMinimumSize(self.parent.width * self.cell_size, self.parent.height * self.cell_size)
         self.setAcceptDrops(True)
+        self.layer = None
+        self.layer_key = None
+
+        # Long canvases are virtualized: only columns from scroll_col to the
+        # right edge of the widget are ever painted
+        self.scroll_col = 0
+
+        self.stroke = StrokeEngine()
+        self.stroke_timer = QTimer(self)
+        self.stroke_timer.setSingleShot(True)
+        self.stroke_timer.setInterval(FRAME_INTERVAL_MS)
+        self.stroke_timer.timeout.connect(self.flush_stroke)
+
+    def resizeEvent(self, event):
+        self.layer = None
+        super().resizeEvent(event)
+        self.parent.update_scroll_range()
+
+    def invalidate_layer(self):
+        self.layer = None
+        self.update()
+
+    def visible_columns(self):
+        last = self.scroll_col + -(-self.width() // self.cell_size)
+        return self.scroll_col, min(last, self.parent.grid.width)
+
+    def set_scroll(self, col):
+        col = max(0, min(col, self.parent.grid.width - 1))
+        if col != self.scroll_col:
+            self.scroll_col = col
+            self.update()
+            self.parent.preview_widget.update()
+
+    def wheelEvent(self, event):
+        delta = event.angleDelta().x() or event.angleDelta().y()
+        self.parent.scrollbar.setValue(self.scroll_col - delta // 40)
+
+    def cell_at(self, pos):
+        return int(pos.y() // self.cell_size), int(pos.x() // self.cell_size) + self.scroll_col
+
+    def static_layer(self):
+        # Gridlines and the bank divider never change while drawing, so they are
+        # rendered once into a transparent viewport-sized pixmap and blitted over
+        # the cells; only a resize or a change in visible column count rebuilds it
+        first, last = self.visible_columns()
+        key = (self.size(), last - first, self.parent.height)
+        if self.layer is None or self.layer_key != key:
+            self.layer_key = key
+            self.layer = QPixmap(self.size())
+            self.layer.fill(Qt.transparent)
+            painter = QPainter(self.layer)
+            columns = last - first
+            grid_width = columns * self.cell_size
+            grid_height = self.parent.height * self.cell_size
+            painter.setPen(Qt.gray)
+            for col in range(columns + 1):
+                painter.drawLine(col * self.cell_size, 0, col * self.cell_size, grid_height)
+            for row in range(self.parent.height + 1):
+                painter.drawLine(0, row * self.cell_size, grid_width, row * self.cell_size)
+            painter.setPen(QPen(Qt.red, 2))
+            for row in range(8, self.parent.height, 8):
+                painter.drawLine(0, row * self.cell_size, grid_width, row * self.cell_size)
+            painter.end()
+        return self.layer
+
+    def cell_rect(self, top, left, bottom, right):
+        # Pixel rectangle for a (top, left, bottom, right) cell range, borders included
+        left -= self.scroll_col
+        right -= self.scroll_col
+        return QRect(left * self.cell_size, top * self.cell_size,
+                     (right - left) * self.cell_size + 1, (bottom - top) * self.cell_size + 1)
 
-        # 9x5 pixel font for letters A-Z (9 tall, 5 wide)
-        self.letter_patterns = {
-            'A': [
-                "00100",
-                "01010",
-                "10001",
-                "10001",
-                "11111",
-                "10001",
-                "10001",
-                "10001",
-                "10001"
-            ],
-            'B': [
-                "11100",
-                "10010",
-                "10001",
-                "10001",
-                "11110",
-                "10001",
-                "10001",
-                "10010",
-                "11100"
-            ],
-            'C': [
-                "01110",
-                "10001",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10001",
-                "01110"
-            ],
-            'D': [
-                "11100",
-                "10010",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10010",
-                "11100"
-            ],
-            'E': [
-                "11111",
-                "10000",
-                "10000",
-                "10000",
-                "11110",
-                "10000",
-                "10000",
-                "10000",
-                "11111"
-            ],
-            'F': [
-                "11111",
-                "10000",
-                "10000",
-                "10000",
-                "11110",
-                "10000",
-                "10000",
-                "10000",
-                "10000"
-            ],
-            'G': [
-                "01110",
-                "10001",
-                "10000",
-                "10000",
-                "10011",
-                "10001",
-                "10001",
-                "10001",
-                "01110"
-            ],
-            'H': [
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "11111",
-                "10001",
-                "10001",
-                "10001",
-                "10001"
-            ],
-            'I': [
-                "11111",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "11111"
-            ],
-            'J': [
-                "00111",
-                "00010",
-                "00010",
-                "00010",
-                "00010",
-                "00010",
-                "10010",
-                "10010",
-                "01100"
-            ],
-            'K': [
-                "10001",
-                "10010",
-                "10100",
-                "11000",
-                "11000",
-                "10100",
-                "10010",
-                "10001",
-                "10001"
-            ],
-            'L': [
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "10000",
-                "11111"
-            ],
-            'M': [
-                "10001",
-                "11011",
-                "10101",
-                "10101",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001"
-            ],
-            'N': [
-                "10001",
-                "11001",
-                "11001",
-                "10101",
-                "10101",
-                "10011",
-                "10011",
-                "10001",
-                "10001"
-            ],
-            'O': [
-                "01110",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "01110"
-            ],
-            'P': [
-                "11110",
-                "10001",
-                "10001",
-                "10001",
-                "11110",
-                "10000",
-                "10000",
-                "10000",
-                "10000"
-            ],
-            'Q': [
-                "01110",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10101",
-                "10011",
-                "10001",
-                "01111"
-            ],
-            'R': [
-                "11110",
-                "10001",
-                "10001",
-                "10001",
-                "11110",
-                "10010",
-                "10001",
-                "10001",
-                "10001"
-            ],
-            'S': [
-                "01111",
-                "10000",
-                "10000",
-                "10000",
-                "01110",
-                "00001",
-                "00001",
-                "00001",
-                "11110"
-            ],
-            'T': [
-                "11111",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100",
-                "00100"
-            ],
-            'U': [
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "01110"
-            ],
-            'V': [
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "01010",
-                "01010",
-                "00100"
-            ],
-            'W': [
-                "10001",
-                "10001",
-                "10001",
-                "10001",
-                "10101",
-                "10101",
-                "10101",
-                "11011",
-                "10001"
-            ],
-            'X': [
-                "10001",
-                "10001",
-                "01010",
-                "01010",
-                "00100",
-                "01010",
-                "01010",
-                "10001",
-                "10001"
-            ],
-            'Y': [
-                "10001",
-                "10001",
-                "10001",
-                "01010",
-                "01010",
-                "00100",
-                "00100",
-                "00100",
-                "00100"
-            ],
-            'Z': [
-                "11111",
-                "00001",
-                "00010",
-                "00100",
-                "01000",
-                "01000",
-                "10000",
-                "10000",
-                "11111"
-            ]
-        }
+    def update_cells(self, rects):
+        for rect in rects:
+            self.update(self.cell_rect(*rect))
 
     def paintEvent(self, event):
         painter = QPainter(self)
-        grid = self.parent.preview_grid or self.parent.grid
-        
-        for row in range(self.parent.height):
-            for col in range(self.parent.width):
-                color = Qt.black if grid[row][col] else Qt.white
-                painter.fillRect(col * self.cell_size, row * self.cell_size,
-                               self.cell_size, self.cell_size, color)
-                painter.setPen(Qt.gray)
-                painter.drawRect(col * self.cell_size, row * self.cell_size,
-                               self.cell_size, self.cell_size)
-        
-        painter.setPen(QPen(Qt.red, 2))
-        painter.drawLine(0, 8 * self.cell_size, self.parent.width * self.cell_size, 8 * self.cell_size)
+        grid = self.parent.grid
+        overlay = self.parent.overlay
+        clip = event.rect()
+        painter.setClipRect(clip)
+
+        first_col = max(clip.left() // self.cell_size, 0) + self.scroll_col
+        last_col = min(clip.right() // self.cell_size + 1 + self.scroll_col, grid.width)
+        first_row = max(clip.top() // self.cell_size, 0)
+        last_row = min(clip.bottom() // self.cell_size + 1, grid.height)
+        visible = self.cell_rect(0, self.scroll_col, grid.height, grid.width).adjusted(0, 0, -1, -1)
+        painter.fillRect(clip.intersected(visible), Qt.white)
+        x0 = -self.scroll_col * self.cell_size
+        onion = self.parent.timeline.previous() if self.parent.onion_check.isChecked() else None
+        for col in range(first_col, last_col):
+            mask = grid.get_column(col)
+            if overlay is not None:
+                mask |= overlay.get_column(col)
+            if onion is not None:
+                self.fill_cells(painter, x0 + col * self.cell_size, onion.get_column(col) & ~mask,
+                                first_row, last_row, ONION_SKIN_COLOR)
+            self.fill_cells(painter, x0 + col * self.cell_size, mask, first_row, last_row, Qt.black)
+
+        painter.drawPixmap(clip.topLeft(), self.static_layer(), clip)
+
+    def fill_cells(self, painter, x, mask, first_row, last_row, color):
+        mask >>= first_row
+        row = first_row
+        while mask and row < last_row:
+            if mask & 1:
+                painter.fillRect(x, row * self.cell_size, self.cell_size, self.cell_size, color)
+            mask >>= 1
+            row += 1
 
     def mousePressEvent(self, event):
         if self.parent.current_tool in ["draw", "erase", "line", "circle"]:
             self.parent.is_mouse_down = True
-            row, col = event.pos().y() // self.cell_size, event.pos().x() // self.cell_size
+            row, col = self.cell_at(event.pos())
             if self.parent.current_tool in ["line", "circle"]:
                 self.parent.start_point = QPoint(int(col), int(row))
             else:
-                self.handle_cell(int(row), int(col))
-            self.update()
+                self.stroke.begin(int(row), int(col), self.parent.current_tool == "draw")
+                self.flush_stroke()
 
     def mouseMoveEvent(self, event):
         if not self.parent.is_mouse_down:
             return
-        row, col = event.pos().y() // self.cell_size, event.pos().x() // self.cell_size
-        if self.parent.current_tool in ["draw", "erase"]:
-            self.handle_cell(int(row), int(col))
+        row, col = self.cell_at(event.pos())
+        if self.stroke.active:
+            self.stroke.add_sample(int(row), int(col))
+            if not self.stroke_timer.isActive():
+                self.stroke_timer.start()
         elif self.parent.start_point:
-            self.parent.preview_grid = [row[:] for row in self.parent.grid]
+            start = self.parent.start_point
             if self.parent.current_tool == "line":
-                self.parent.draw_line(self.parent.preview_grid, self.parent.start_point.y(),
-                                    self.parent.start_point.x(), int(row), int(col), True)
-            elif self.parent.current_tool == "circle":
-                self.parent.draw_circle(self.parent.preview_grid, self.parent.start_point.y(),
-                                      self.parent.start_point.x(), int(row), int(col), True)
-        self.update()
+                rows, cols = raster.line_points(start.y(), start.x(), int(row), int(col))
+            else:
+                rows, cols = raster.circle_points(start.y(), start.x(), int(row), int(col))
+            self.set_overlay(raster.points_overlay(self.parent.grid, rows, cols))
+
+    def set_overlay(self, overlay):
+        # Repaint the union of where the previous rubber band was and where the new one is
+        old = self.parent.overlay.bounds() if self.parent.overlay is not None else None
+        self.parent.overlay = overlay
+        changed = union_bounds(old, overlay.bounds() if overlay is not None else None)
+        if changed is not None:
+            self.update(self.cell_rect(*changed))
 
     def mouseReleaseEvent(self, event):
         if self.parent.is_mouse_down and self.parent.start_point:
-            row, col = event.pos().y() // self.cell_size, event.pos().x() // self.cell_size
+            row, col = self.cell_at(event.pos())
             if self.parent.current_tool == "line":
                 self.parent.draw_line(self.parent.grid, self.parent.start_point.y(),
                                     self.parent.start_point.x(), int(row), int(col), True)
             elif self.parent.current_tool == "circle":
                 self.parent.draw_circle(self.parent.grid, self.parent.start_point.y(),
                                       self.parent.start_point.x(), int(row), int(col), True)
+        if self.stroke.active:
+            self.stroke_timer.stop()
+            stats = self.stroke.end(self.parent.grid)
+            self.parent.statusBar().showMessage(stats.summary(), 5000)
         self.parent.is_mouse_down = False
         self.parent.start_point = None
-        self.parent.preview_grid = None
-        self.update()
-        self.parent.preview_widget.update()
+        self.set_overlay(None)
+        self.parent.refresh()
+
+    def flush_stroke(self):
+        if self.stroke.flush(self.parent.grid):
+            self.parent.refresh()
 
     def handle_cell(self, row, col):
-        if 0 <= row < self.parent.height and 0 <= col < self.parent.width:
-            self.parent.grid[row][col] = self.parent.current_tool == "draw"
-            self.parent.preview_widget.update()
+        self.parent.grid.set(row, col, self.parent.current_tool == "draw")
+        self.parent.refresh()
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasText():
@@ -997,21 +837,117 @@ class GridWidget(QWidget):
 
     def dropEvent(self, event):
         letter = event.mimeData().text()
-        if letter in self.letter_patterns:
-            row = event.pos().y() // self.cell_size
-            col = event.pos().x() // self.cell_size
+        if letter in GLYPHS:
+            row, col = self.cell_at(event.pos())
             self.draw_letter(letter, row, col)
-            self.update()
-            self.parent.preview_widget.update()
+            self.parent.refresh()
 
     def draw_letter(self, letter, start_row, start_col):
-        pattern = self.letter_patterns[letter]
-        for r, row in enumerate(pattern):
-            for c, bit in enumerate(row):
-                grid_row = start_row + r
-                grid_col = start_col + c
-                if 0 <= grid_row < self.parent.height and 0 <= grid_col < self.parent.width:
-                    self.parent.grid[grid_row][grid_col] = (bit == '1')
+        pov_core.draw_letter(self.parent.grid, letter, start_row, start_col)
+
+def pattern_pixmap(grid, scale=3):
+    image = QImage(grid.width, grid.height, QImage.Format_Indexed8)
+    image.setColorTable([QColor(Qt.white).rgb(), QColor(Qt.black).rgb()])
+    bits = image.bits()
+    bits.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(bits, np.uint8).reshape(grid.height, image.bytesPerLine())
+    pixels[:, :grid.width] = raster.unpack_columns(np.asarray(grid.columns()), grid.height)
+    return QPixmap.fromImage(image.scaled(grid.width * scale, grid.height * scale))
+
+class SimilarPanel(QDialog):
+    # Nearest-neighbour and duplicate search over a loaded pattern catalogue
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.setWindowTitle("Find Similar Patterns")
+        self.resize(420, 480)
+        self.index = None
+        self.paths = []
+        layout = QVBoxLayout(self)
+
+        top = QHBoxLayout()
+        load_btn = QPushButton("Load Catalogue...")
+        load_btn.clicked.connect(self.load_catalogue)
+        top.addWidget(load_btn)
+        self.status = QLabel("No catalogue loaded")
+        top.addWidget(self.status, 1)
+        layout.addLayout(top)
+
+        search = QHBoxLayout()
+        self.k_spin = QSpinBox()
+        self.k_spin.setRange(1, 100)
+        self.k_spin.setValue(10)
+        search.addWidget(QLabel("Results:"))
+        search.addWidget(self.k_spin)
+        search_btn = QPushButton("Search Current Frame")
+        search_btn.clicked.connect(self.search)
+        search.addWidget(search_btn)
+        dupes_btn = QPushButton("Duplicates")
+        dupes_btn.clicked.connect(self.show_duplicates)
+        search.addWidget(dupes_btn)
+        layout.addLayout(search)
+
+        self.results = QListWidget()
+        self.results.setIconSize(QSize(64 * 3, 16 * 3))
+        self.results.itemDoubleClicked.connect(self.use_result)
+        layout.addWidget(self.results)
+
+    def load_catalogue(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Load Catalogue", "",
+                                                "Pattern files (*.pov *.txt *.h *.c *.ino *.hex *.bin);;All files (*)")
+        if paths:
+            self.load_paths(paths)
+
+    def load_paths(self, paths):
+        # The catalogue is read as blocks of the designer's output format
+        import similarity
+        output_format = self.parent.output_format
+        try:
+            names, blocks = similarity.load_catalogue(paths, output_format)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Load Catalogue", str(e))
+            return
+        self.paths = paths
+        self.index = similarity.SimilarityIndex(blocks, names, output_format)
+        self.status.setText(f"{len(self.index)} patterns ({self.index.format.label})")
+        self.results.clear()
+
+    def current_index(self):
+        # Switching output formats reads the catalogue again in the new one
+        if self.index is not None and self.index.format.name != self.parent.output_format:
+            self.load_paths(self.paths)
+        return self.index
+
+    def add_result(self, text, index):
+        import hex_import
+        grid = hex_import.block_to_grid(self.index.block(index), self.index.format)
+        self.results.addItem(text)
+        item = self.results.item(self.results.count() - 1)
+        item.setIcon(QIcon(pattern_pixmap(grid)))
+        item.setData(Qt.UserRole, index)
+
+    def search(self):
+        index = self.current_index()
+        if index is None:
+            return
+        block = index.format.encode(self.parent.grid)
+        self.results.clear()
+        for distance, i in index.nearest(block, self.k_spin.value()):
+            self.add_result(f"{self.index.names[i]}  ({distance} bits)", i)
+
+    def show_duplicates(self):
+        index = self.current_index()
+        if index is None:
+            return
+        self.results.clear()
+        for ids in index.duplicates()[:self.k_spin.value()]:
+            self.add_result(" = ".join(index.names[i] for i in ids), ids[0])
+
+    def use_result(self, item):
+        # Double-click loads the pattern into the current frame
+        import hex_import
+        grid = hex_import.block_to_grid(self.index.block(item.data(Qt.UserRole)), self.index.format)
+        self.parent.import_grids([grid])
 
 class PreviewWidget(QWidget):
     def __init__(self, parent):
@@ -1019,21 +955,125 @@ class PreviewWidget(QWidget):
         self.parent = parent
         self.setMinimumSize(200, 200)
 
+        # Persistent 1-byte-per-LED image of the columns visible in the grid
+        # widget, patched column by column from the model
+        self.image = None
+        self.pixels = None
+        self.image_grid = None
+        self.image_window = None
+        self.stale_columns = None
+        self.scaled = None
+
+        # Live swing simulation (swing_sim.py), redrawn on a timer while enabled
+        self.swing = None
+        self.swing_timer = QTimer(self)
+        self.swing_timer.setInterval(SWING_FRAME_MS)
+        self.swing_timer.timeout.connect(self.update)
+
+    def set_swing(self, enabled):
+        if enabled:
+            import swing_sim
+            self.swing = swing_sim.SwingModel()
+            self.swing_colors = [QColor(*color).rgb() for color in swing_sim.palette()]
+            self.swing_started = time.perf_counter()
+            self.swing_timer.start()
+        else:
+            self.swing = None
+            self.swing_timer.stop()
+        self.update()
+
+    def paint_swing(self, painter):
+        # The light of the last few persistence times, then the wand on top
+        import swing_sim
+        now = time.perf_counter() - self.swing_started
+        bits = swing_sim.column_bits(self.parent.grid, self.parent.output_format)
+        levels, view = swing_sim.render(bits, self.swing, self.width(), self.height(), t_end=now,
+                                        duration=4 * self.swing.persistence,
+                                        persistence=self.swing.persistence)
+        indices = swing_sim.quantize(levels)
+        image = QImage(indices.data, view.width, view.height, view.width, QImage.Format_Indexed8)
+        image.setColorTable(self.swing_colors)
+        painter.drawImage(0, 0, image)
+        angle = float(self.swing.angle(now))
+        radii = self.swing.radii(bits.shape[0])[[-1, 0]]
+        xs, ys = view.to_pixels(radii * np.sin(angle), radii * np.cos(angle))
+        painter.setPen(QPen(SWING_WAND_COLOR, 3))
+        painter.drawLine(int(xs[0]), int(ys[0]), int(xs[1]), int(ys[1]))
+
+    def invalidate_columns(self, rects):
+        for top, left, bottom, right in rects:
+            first, last = self.stale_columns or (left, right)
+            self.stale_columns = (min(first, left), max(last, right))
+        self.update()
+
+    def sync_image(self):
+        grid = self.parent.grid
+        first, last = self.parent.grid_widget.visible_columns()
+        last = max(last, first + 1)
+        if self.image_grid is not grid or self.image_window != (first, last):
+            self.image = QImage(last - first, grid.height, QImage.Format_Indexed8)
+            self.image.setColorTable([QColor(Qt.white).rgb(), QColor(Qt.black).rgb()])
+            bits = self.image.bits()
+            bits.setsize(self.image.sizeInBytes())
+            self.pixels = np.frombuffer(bits, np.uint8).reshape(grid.height, self.image.bytesPerLine())
+            self.image_grid = grid
+            self.image_window = (first, last)
+            self.stale_columns = (first, last)
+        if self.stale_columns:
+            lo, hi = max(self.stale_columns[0], first), min(self.stale_columns[1], last)
+            if lo < hi:
+                columns = np.asarray(grid.columns(lo, hi))
+                self.pixels[:, lo - first:hi - first] = raster.unpack_columns(columns, grid.height)
+            self.stale_columns = None
+            self.scaled = None
+
     def paintEvent(self, event):
         painter = QPainter(self)
-        image = QImage(self.parent.width, self.parent.height, QImage.Format_RGB32)
-        image.fill(Qt.white)
-        
-        for row in range(self.parent.height):
-            for col in range(self.parent.width):
-                if self.parent.grid[row][col]:
-                    image.setPixel(col, row, QColor(Qt.black).rgb())
-        
-        scaled = image.scaled(self.width(), self.height(), Qt.KeepAspectRatio)
-        painter.drawPixmap(0, 0, QPixmap.fromImage(scaled))
+        if self.swing is not None:
+            self.paint_swing(painter)
+            return
+        self.sync_image()
+        if self.scaled is None or self.scaled_size != self.size():
+            self.scaled = QPixmap.fromImage(self.image.scaled(self.width(), self.height(), Qt.KeepAspectRatio))
+            self.scaled_size = self.size()
+        painter.drawPixmap(0, 0, self.scaled)
+
+def time_first_paint(app, marks):
+    # Records when the grid's first paint finishes, then quits
+    original = GridWidget.paintEvent
+
+    def paint(widget, event):
+        original(widget, event)
+        GridWidget.paintEvent = original
+        marks.append(("first paint", time.perf_counter()))
+        QTimer.singleShot(0, app.quit)
+    GridWidget.paintEvent = paint
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    import argparse
+    parser = argparse.ArgumentParser(description="POV Wand Pattern Designer")
+    parser.add_argument("--record-trace", metavar="FILE",
+                        help="record grid input events to FILE for input_trace.py replay")
+    parser.add_argument("--time-startup", action="store_true",
+                        help="report import time and time to first paint, then exit")
+    args, qt_args = parser.parse_known_args()
+    marks = [("imports", time.perf_counter())]
+    app = QApplication(sys.argv[:1] + qt_args)
+    marks.append(("QApplication", time.perf_counter()))
     window = POVWandDesigner()
+    marks.append(("window", time.perf_counter()))
+    if args.record_trace:
+        import input_trace
+        recorder = input_trace.TraceRecorder(window, args.record_trace)
+        app.aboutToQuit.connect(recorder.close)
+    if args.time_startup:
+        time_first_paint(app, marks)
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    status = app.exec_()
+    if args.time_startup:
+        previous = STARTED
+        for name, t in marks:
+            print(f"{name:14s} {(t - previous) * 1000:8.1f} ms")
+            previous = t
+        print(f"{'total':14s} {(previous - STARTED) * 1000:8.1f} ms")
+    sys.exit(status)
\ No newline at end of file
@@ -0,0 +1,175 @@
+from array import array
+from itertools import chain
+
+from pattern_grid import PatternGrid, column_typecode
+
+# Frames keep their packed columns in fixed-size chunks. Storing an edited grid
+# back into a frame reuses every chunk that did not change, and a duplicated
+# frame shares all of its chunks, so a long animation built from small edits
+# costs memory in proportion to the edits rather than the frame count.
+CHUNK_COLUMNS = 8
+DEFAULT_DURATION_MS = 100
+
+
+def _fit_chunk(source, size, typecode, mask, cache):
+    masks = [m & mask for m in source[:size]] if source is not None else []
+    if not any(masks):
+        # Every blank chunk of one size is the same array
+        key = ("blank", size)
+        if key not in cache:
+            cache[key] = array(typecode, [0]) * size
+        return cache[key]
+    if source.typecode == typecode and len(source) == size and masks == source.tolist():
+        return source
+    return array(typecode, masks + [0] * (size - len(masks)))
+
+
+class Frame:
+    __slots__ = ("width", "height", "chunks", "duration")
+
+    def __init__(self, width, height, chunks, duration=DEFAULT_DURATION_MS):
+        self.width = width
+        self.height = height
+        self.chunks = tuple(chunks)
+        self.duration = duration
+
+    @classmethod
+    def blank(cls, width, height=16, duration=DEFAULT_DURATION_MS):
+        # Every full chunk of a blank frame is the same zero array
+        zero = array(column_typecode(height), [0]) * CHUNK_COLUMNS
+        full, rest = divmod(width, CHUNK_COLUMNS)
+        chunks = [zero] * full + ([zero[:rest]] if rest else [])
+        return cls(width, height, chunks, duration)
+
+    @classmethod
+    def from_grid(cls, grid, duration=DEFAULT_DURATION_MS, base=None):
+        # Chunks equal to the same chunk of `base` are shared rather than copied
+        cols = grid.columns()
+        if base is not None and base.height != grid.height:
+            base = None
+        chunks = []
+        for i, start in enumerate(range(0, grid.width, CHUNK_COLUMNS)):
+            chunk = cols[start:start + CHUNK_COLUMNS]
+            if base is not None and i < len(base.chunks) and base.chunks[i] == chunk:
+                chunk = base.chunks[i]
+            chunks.append(chunk)
+        return cls(grid.width, grid.height, chunks, duration)
+
+    def copy(self):
+        return Frame(self.width, self.height, self.chunks, self.duration)
+
+    def get_column(self, col):
+        if 0 <= col < self.width:
+            return self.chunks[col // CHUNK_COLUMNS][col % CHUNK_COLUMNS]
+        return 0
+
+    def to_grid(self):
+        return PatternGrid.from_columns(chain.from_iterable(self.chunks), self.height)
+
+    def resized(self, width, height=None, cache=None):
+        # Chunk by chunk, dropping rows past a smaller height. `cache` (shared
+        # by every frame of a timeline) converts each distinct source chunk once,
+        # so chunks shared before the resize stay shared after it.
+        height = height or self.height
+        if width == self.width and height == self.height:
+            return self.copy()
+        cache = {} if cache is None else cache
+        typecode, mask = column_typecode(height), (1 << height) - 1
+        chunks = []
+        for i, start in enumerate(range(0, width, CHUNK_COLUMNS)):
+            size = min(CHUNK_COLUMNS, width - start)
+            source = self.chunks[i] if i < len(self.chunks) else None
+            key = (id(source), size)
+            if key not in cache:
+                cache[key] = (source, _fit_chunk(source, size, typecode, mask, cache))
+            chunks.append(cache[key][1])
+        return Frame(width, height, chunks, self.duration)
+
+
+class Timeline:
+    # Ordered frames plus the index of the one being edited. The editor works
+    # on a PatternGrid from select() and hands it back through store() before
+    # the timeline is navigated or exported.
+
+    def __init__(self, grid, duration=DEFAULT_DURATION_MS):
+        self.frames = [Frame.from_grid(grid, duration)]
+        self.current = 0
+
+    @classmethod
+    def from_grids(cls, pairs):
+        # Timeline of (grid, duration) pairs; every frame takes the first one's width
+        pairs = iter(pairs)
+        grid, duration = next(pairs)
+        timeline = cls(grid, duration)
+        for grid, duration in pairs:
+            timeline.insert(grid)
+            timeline.set_duration(duration)
+        timeline.current = 0
+        return timeline
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def store(self, grid):
+        frame = self.frames[self.current]
+        self.frames[self.current] = Frame.from_grid(grid, frame.duration, frame)
+
+    def select(self, index):
+        self.current = max(0, min(index, len(self.frames) - 1))
+        return self.frames[self.current].to_grid()
+
+    def previous(self):
+        return self.frames[self.current - 1] if self.current > 0 else None
+
+    def duplicate(self):
+        # New frame after the current one, sharing every chunk with it
+        self.frames.insert(self.current + 1, self.frames[self.current].copy())
+        return self.select(self.current + 1)
+
+    def insert(self, grid):
+        # New frame after the current one holding `grid`, fitted to the timeline's width
+        frame = self.frames[self.current]
+        if grid.width != frame.width:
+            grid = grid.resized(frame.width)
+        self.frames.insert(self.current + 1, Frame.from_grid(grid, frame.duration, frame))
+        return self.select(self.current + 1)
+
+    def insert_blank(self):
+        frame = self.frames[self.current]
+        self.frames.insert(self.current + 1, Frame.blank(frame.width, frame.height, frame.duration))
+        return self.select(self.current + 1)
+
+    def remove(self):
+        if len(self.frames) > 1:
+            del self.frames[self.current]
+        return self.select(self.current)
+
+    def move(self, index):
+        frame = self.frames.pop(self.current)
+        self.frames.insert(max(0, min(index, len(self.frames))), frame)
+        return self.select(self.frames.index(frame))
+
+    def set_duration(self, duration, index=None):
+        self.frames[self.current if index is None else index].duration = duration
+
+    def resize(self, width, height=None):
+        cache = {}
+        self.frames = [frame.resized(width, height, cache) for frame in self.frames]
+
+    def grids(self):
+        # (grid, duration) pairs, materialised one frame at a time
+        for frame in self.frames:
+            yield frame.to_grid(), frame.duration
+
+    def memory_stats(self):
+        # (bytes actually held in chunks, bytes that full per-frame copies would take)
+        unique = {id(chunk): chunk for frame in self.frames for chunk in frame.chunks}
+        held = sum(len(chunk) * chunk.itemsize for chunk in unique.values())
+        full = sum(len(chunk) * chunk.itemsize for frame in self.frames for chunk in frame.chunks)
+        return held, full
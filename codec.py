@@ -0,0 +1,224 @@
+from glyphs import GLYPH_WIDTH, GLYPHS
+from pattern_grid import PatternGrid
+import pov_core
+
+# Compressed pattern stream for the wand firmware.
+#
+#   header: b"PV", version, bytes per column, columns per frame, frame count (u16 LE)
+#   frame:  base byte (BASE_BLANK or BASE_PREVIOUS), then ops until the frame's
+#           columns are all accounted for
+#   op:     one byte, top two bits select the op, low six bits hold count - 1
+#           SKIP    keep `count` columns of the base frame
+#           LITERAL `count` columns follow
+#           REPEAT  one column follows, repeated `count` times
+#
+# Every frame is coded against whichever of a blank frame or the previous
+# frame gives the shorter op stream. The decoder below is the reference for
+# the firmware side and works the same way: one column buffer, patched in place.
+
+MAGIC = b"PV"
+VERSION = 1
+HEADER_SIZE = 7
+BASE_BLANK = 0
+BASE_PREVIOUS = 1
+OP_SKIP = 0x00
+OP_LITERAL = 0x40
+OP_REPEAT = 0x80
+MAX_RUN = 64
+
+# Runs of identical columns at least this long are worth a REPEAT op
+MIN_REPEAT = 3
+
+
+def _columns(block, columns, column_bytes):
+    return [bytes(block[i * column_bytes:(i + 1) * column_bytes]) for i in range(columns)]
+
+
+def _run(cols, i, same):
+    j = i + 1
+    while j < len(cols) and j - i < MAX_RUN and same(j):
+        j += 1
+    return j - i
+
+
+def encode_ops(cols, base):
+    out = bytearray()
+    i = 0
+    while i < len(cols):
+        if cols[i] == base[i]:
+            n = _run(cols, i, lambda j: cols[j] == base[j])
+            out.append(OP_SKIP | n - 1)
+        else:
+            n = _run(cols, i, lambda j: cols[j] == cols[i])
+            if n >= MIN_REPEAT:
+                out.append(OP_REPEAT | n - 1)
+                out += cols[i]
+            else:
+                # Extend the literal until a skip or a worthwhile repeat starts
+                n = 1
+                while (i + n < len(cols) and n < MAX_RUN and cols[i + n] != base[i + n]
+                       and _run(cols, i + n, lambda j: cols[j] == cols[i + n]) < MIN_REPEAT):
+                    n += 1
+                out.append(OP_LITERAL | n - 1)
+                for col in cols[i:i + n]:
+                    out += col
+        i += n
+    return out
+
+
+def encode_stream(blocks, columns=64, column_bytes=2):
+    # `blocks` are firmware blocks as produced by pov_core.encode/frame_blocks;
+    # only the first `columns` columns of each are stored
+    if not 1 <= columns <= 255 or not 1 <= column_bytes <= 8:
+        raise ValueError(f"cannot compress {columns} columns of {column_bytes} bytes")
+    blank = [bytes(column_bytes)] * columns
+    previous = None
+    frames = bytearray()
+    count = 0
+    for block in blocks:
+        cols = _columns(block, columns, column_bytes)
+        best = bytes([BASE_BLANK]) + encode_ops(cols, blank)
+        if previous is not None:
+            delta = bytes([BASE_PREVIOUS]) + encode_ops(cols, previous)
+            if len(delta) < len(best):
+                best = delta
+        frames += best
+        previous = cols
+        count += 1
+    if count > 0xFFFF:
+        raise ValueError(f"too many frames ({count}) for one stream")
+    return MAGIC + bytes([VERSION, column_bytes, columns]) + count.to_bytes(2, "little") + frames
+
+
+def is_stream(data, block_size=pov_core.BLOCK_SIZE):
+    # Whether `data` starts with a whole, consistent stream header. Raw pattern
+    # blocks can begin with "PV" too, so the magic alone decides nothing.
+    if len(data) < HEADER_SIZE or data[:2] != MAGIC or data[2] != VERSION:
+        return False
+    column_bytes, columns = data[3], data[4]
+    count = int.from_bytes(data[5:7], "little")
+    # A stream cut short still counts, so decoding reports it as damaged
+    return 1 <= column_bytes <= 8 and 1 <= columns and columns * column_bytes <= block_size and count >= 1
+
+
+def decode_stream(data, block_size=pov_core.BLOCK_SIZE):
+    # Reference decoder: returns every frame as a zero padded firmware block
+    if len(data) < HEADER_SIZE or data[:2] != MAGIC:
+        raise ValueError("not a compressed pattern stream")
+    if data[2] != VERSION:
+        raise ValueError(f"unsupported stream version {data[2]}")
+    column_bytes, columns = data[3], data[4]
+    count = int.from_bytes(data[5:7], "little")
+    size = columns * column_bytes
+    frame = bytearray(size)
+    blocks = []
+    pos = HEADER_SIZE
+    for _ in range(count):
+        if pos >= len(data):
+            raise ValueError("stream ends inside a frame")
+        base = data[pos]
+        pos += 1
+        if base == BASE_BLANK:
+            frame[:] = bytes(size)
+        elif base != BASE_PREVIOUS:
+            raise ValueError(f"bad frame base {base} at offset {pos - 1}")
+        col = 0
+        while col < columns:
+            if pos >= len(data):
+                raise ValueError("stream ends inside a frame")
+            op, n = data[pos] & 0xC0, (data[pos] & 0x3F) + 1
+            pos += 1
+            if col + n > columns:
+                raise ValueError(f"run overflows the frame at offset {pos - 1}")
+            start = col * column_bytes
+            if op == OP_LITERAL:
+                frame[start:start + n * column_bytes] = data[pos:pos + n * column_bytes]
+                pos += n * column_bytes
+            elif op == OP_REPEAT:
+                frame[start:start + n * column_bytes] = data[pos:pos + column_bytes] * n
+                pos += column_bytes
+            elif op != OP_SKIP:
+                raise ValueError(f"bad op 0x{data[pos - 1]:02X} at offset {pos - 1}")
+            if pos > len(data):
+                raise ValueError("stream ends inside a frame")
+            col += n
+        blocks.append(bytes(frame).ljust(block_size, b"\0"))
+    if pos != len(data):
+        raise ValueError(f"{len(data) - pos} trailing bytes after the last frame")
+    return blocks
+
+
+def compression_report(frames, raw_size, compressed_size):
+    ratio = raw_size / compressed_size if compressed_size else 0.0
+    return (f"{frames} frame{'s' if frames != 1 else ''}: {raw_size} -> {compressed_size} bytes "
+            f"({ratio:.1f}x)")
+
+
+def format_stream(blocks, output_format="heart"):
+    # Compress blocks of any registered format, one column (or row) per unit
+    fmt = pov_core.get_format(output_format)
+    return encode_stream(blocks, fmt.units, fmt.unit_bytes)
+
+
+def generate_compressed_hex(blocks, output_format="heart"):
+    blocks = list(blocks)
+    stream = format_stream(blocks, output_format)
+    report = compression_report(len(blocks), len(blocks) * pov_core.get_format(output_format).block_size,
+                                len(stream))
+    return f"// Compressed: {report}\n" + pov_core.format_hex(stream)
+
+
+def round_trip_corpus():
+    # (name, output_format, blocks) for every preset and every letter of the
+    # font, plus multi-frame streams that exercise the delta path
+    for output_format, fmt in pov_core.FORMATS.items():
+        left = max(fmt.columns - GLYPH_WIDTH, 0) // 2
+        for name, draw in pov_core.PRESETS.items():
+            grid = PatternGrid(64, fmt.leds)
+            draw(grid)
+            yield f"preset:{name}", output_format, [pov_core.encode(grid, output_format)]
+        for letter in GLYPHS:
+            grid = PatternGrid(64, fmt.leds)
+            pov_core.draw_letter(grid, letter, 3, left)
+            yield f"letter:{letter}", output_format, [pov_core.encode(grid, output_format)]
+
+        alphabet = PatternGrid(6 * len(GLYPHS), fmt.leds)
+        pov_core.render_text(alphabet, "".join(GLYPHS))
+        yield "marquee:alphabet", output_format, list(
+            pov_core.frame_blocks(alphabet, output_format, "marquee", 3))
+
+        frames, grid = [], PatternGrid(64, fmt.leds)
+        for letter in GLYPHS:
+            pov_core.draw_letter(grid, letter, 3, left)
+            frames.append(pov_core.encode(grid, output_format))
+        grid.fill()
+        frames += [pov_core.encode(grid, output_format),
+                   pov_core.encode(PatternGrid(64, fmt.leds), output_format)]
+        yield "animation:letters", output_format, frames
+
+
+def check_round_trip():
+    # Returns (name, output_format, raw bytes, compressed bytes, ok) per corpus entry
+    results = []
+    for name, output_format, blocks in round_trip_corpus():
+        block_size = pov_core.get_format(output_format).block_size
+        stream = format_stream(blocks, output_format)
+        ok = decode_stream(stream, block_size) == blocks
+        results.append((name, output_format, len(blocks) * block_size, len(stream), ok))
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    failures = 0
+    raw_total = compressed_total = 0
+    for name, output_format, raw, compressed, ok in check_round_trip():
+        raw_total += raw
+        compressed_total += compressed
+        if not ok:
+            failures += 1
+            print(f"FAIL {output_format} {name}")
+    print(f"round trip: {failures} failures, corpus {raw_total} -> {compressed_total} bytes "
+          f"({raw_total / compressed_total:.1f}x)")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,284 @@
+import io
+
+import numpy as np
+
+from pattern_grid import PatternGrid
+
+# Output formats for the wand models we support, and the writers that turn
+# encoded blocks into text or binary files. Nothing in here may import PyQt5.
+#
+# A format is described by one row of FORMAT_SPECS:
+#
+#   leds        LEDs on the wand: 8, 16, 24 or 32 (the pattern's rows, top first)
+#   columns     columns per frame
+#   layout      "column": each column is leds / 8 bytes, top 8 rows first
+#               "row": each row is ceil(columns / 8) bytes, top row first
+#   bit_order   "lsb": bit 0 of each byte is the top row (or leftmost column)
+#               "msb": bit 7 is
+#   block_size  bytes per frame on the device, padded with pad_byte (default:
+#               exactly the frame, no padding)
+#
+# Each spec is compiled once into an OutputFormat whose packer is chosen when
+# it is built, so encoding a frame runs no per-spec checks: column layouts are
+# slices of the grid's own packed columns (plus a 256-entry bit-reversal table
+# for MSB-first wands), row layouts are a single numpy bit transpose.
+
+FORMAT_SPECS = [
+    {"name": "heart", "label": "Heart Format (64 cols)", "leds": 16, "columns": 64, "block_size": 128},
+    {"name": "hanzi", "label": "Hanzi Format (16 cols)", "leds": 16, "columns": 16, "block_size": 128},
+    {"name": "mini8", "label": "Mini 8-LED (32 cols, MSB first)", "leds": 8, "columns": 32,
+     "bit_order": "msb"},
+    {"name": "wide24", "label": "24-LED (96 cols)", "leds": 24, "columns": 96, "block_size": 512},
+    {"name": "wide32", "label": "32-LED (128 cols, MSB first)", "leds": 32, "columns": 128,
+     "bit_order": "msb"},
+    {"name": "matrix16", "label": "16x16 Matrix (rows, MSB first)", "leds": 16, "columns": 16,
+     "layout": "row", "bit_order": "msb"},
+]
+
+LED_COUNTS = (8, 16, 24, 32)
+LAYOUTS = ("column", "row")
+BIT_ORDERS = ("lsb", "msb")
+
+REVERSED_BITS = bytes(int(f"{b:08b}"[::-1], 2) for b in range(256))
+
+
+class OutputFormat:
+    def __init__(self, name, label=None, leds=16, columns=64, layout="column", bit_order="lsb",
+                 block_size=None, pad_byte=0):
+        if leds not in LED_COUNTS:
+            raise ValueError(f"{name}: leds must be one of {', '.join(map(str, LED_COUNTS))}")
+        if layout not in LAYOUTS:
+            raise ValueError(f"{name}: layout must be one of {', '.join(LAYOUTS)}")
+        if bit_order not in BIT_ORDERS:
+            raise ValueError(f"{name}: bit_order must be one of {', '.join(BIT_ORDERS)}")
+        if not 1 <= columns <= 255:
+            raise ValueError(f"{name}: columns must be between 1 and 255")
+        self.name = name
+        self.label = label or name
+        self.leds = leds
+        self.columns = columns
+        self.layout = layout
+        self.bit_order = bit_order
+        # The repeating unit of a frame: a column, or a row for row layouts
+        if layout == "column":
+            self.units, self.unit_bytes = columns, leds // 8
+        else:
+            self.units, self.unit_bytes = leds, (columns + 7) // 8
+        self.frame_size = self.units * self.unit_bytes
+        self.block_size = block_size or self.frame_size
+        if self.block_size < self.frame_size:
+            raise ValueError(f"{name}: block_size {self.block_size} is smaller than a frame "
+                             f"({self.frame_size} bytes)")
+        self.padding = bytes([pad_byte]) * (self.block_size - self.frame_size)
+        self.reverse = REVERSED_BITS if bit_order == "msb" else None
+        self.numpy_order = "big" if bit_order == "msb" else "little"
+        self.encode = self._encode_columns if layout == "column" else self._encode_rows
+        self.frames = self._column_frames if layout == "column" else self._row_frames
+        self.decode = self._decode_columns if layout == "column" else self._decode_rows
+        self.column_spans = self._column_spans if layout == "column" else self._row_spans
+
+    def __repr__(self):
+        return f"OutputFormat({self.name!r})"
+
+    def spec(self):
+        return {"name": self.name, "label": self.label, "leds": self.leds, "columns": self.columns,
+                "layout": self.layout, "bit_order": self.bit_order, "block_size": self.block_size}
+
+    def column_data(self, grid, stop=None):
+        # The grid's columns as leds / 8 little-endian bytes each, LSB = top row;
+        # rows past the wand are dropped and missing rows are blank
+        data = grid.to_bytes(stop)
+        nbytes = (grid.height + 7) // 8
+        if nbytes != self.leds // 8:
+            packed = np.frombuffer(data, np.uint8).reshape(-1, nbytes)
+            fitted = np.zeros((len(packed), self.leds // 8), np.uint8)
+            keep = min(nbytes, self.leds // 8)
+            fitted[:, :keep] = packed[:, :keep]
+            data = fitted.tobytes()
+        return data
+
+    # encode(grid) is one device block for the first `columns` columns;
+    # frames(grid, starts) is one block per window of `columns` columns starting
+    # at each of `starts` (columns off either end of the grid are blank)
+
+    def _encode_columns(self, grid):
+        data = self.column_data(grid, self.columns).ljust(self.frame_size, b"\0")
+        if self.reverse:
+            data = data.translate(self.reverse)
+        return data + self.padding
+
+    def _encode_rows(self, grid):
+        return next(self._row_frames(grid, (0,)))
+
+    def _column_frames(self, grid, starts):
+        # Frames are sliced straight out of the packed byte stream
+        size = self.frame_size
+        data = self.column_data(grid)
+        if self.reverse:
+            data = data.translate(self.reverse)
+        blank = bytes(size)
+        data = blank + data + blank
+        for start in starts:
+            offset = (start + self.columns) * self.unit_bytes
+            yield data[offset:offset + size] + self.padding
+
+    def _row_frames(self, grid, starts):
+        columns = np.frombuffer(self.column_data(grid), np.uint8).reshape(-1, self.leds // 8)
+        bits = np.zeros((self.leds, grid.width + 2 * self.columns), np.uint8)
+        bits[:, self.columns:self.columns + grid.width] = np.unpackbits(
+            columns, axis=1, bitorder="little").T
+        for start in starts:
+            window = bits[:, start + self.columns:start + 2 * self.columns]
+            yield np.packbits(window, axis=1, bitorder=self.numpy_order).tobytes() + self.padding
+
+    # column_spans(grid, starts, left, right) re-encodes just the bytes that
+    # hold canvas columns left..right-1 in the frames at `starts`: (frame index,
+    # offset, bytes) runs to patch into those frames' blocks. The columns are
+    # encoded once and sliced for every frame.
+
+    def _column_spans(self, grid, starts, left, right):
+        left, right = max(left, 0), min(right, grid.width)
+        if left >= right:
+            return
+        data = self.column_data(PatternGrid.from_columns(grid.columns(left, right), grid.height))
+        if self.reverse:
+            data = data.translate(self.reverse)
+        size = self.unit_bytes
+        for i, start in enumerate(starts):
+            lo, hi = max(left, start), min(right, start + self.columns)
+            if lo < hi:
+                yield i, (lo - start) * size, data[(lo - left) * size:(hi - left) * size]
+
+    def _row_spans(self, grid, starts, left, right):
+        left, right = max(left, 0), min(right, grid.width)
+        if left >= right:
+            return
+        # Every row byte is 8 columns of the frame, so frames need up to 7
+        # unchanged columns either side of the range
+        base = left - 7
+        part = PatternGrid.from_columns([grid.get_column(c) for c in range(base, right + 7)], grid.height)
+        columns = np.frombuffer(self.column_data(part), np.uint8).reshape(-1, self.leds // 8)
+        bits = np.unpackbits(columns, axis=1, bitorder="little").T
+        for i, start in enumerate(starts):
+            lo, hi = max(left, start), min(right, start + self.columns)
+            if lo >= hi:
+                continue
+            first, last = (lo - start) // 8, (hi - start + 7) // 8
+            window = bits[:, start + first * 8 - base:min(start + last * 8, start + self.columns) - base]
+            rows = np.packbits(window, axis=1, bitorder=self.numpy_order)
+            for row in range(self.leds):
+                yield i, row * self.unit_bytes + first, rows[row].tobytes()
+
+    def _decode_columns(self, block):
+        data = bytes(block[:self.frame_size]).ljust(self.frame_size, b"\0")
+        if self.reverse:
+            data = data.translate(self.reverse)
+        return PatternGrid.from_bytes(data, self.leds)
+
+    def _decode_rows(self, block):
+        rows = np.frombuffer(bytes(block[:self.frame_size]).ljust(self.frame_size, b"\0"),
+                             np.uint8).reshape(self.leds, self.unit_bytes)
+        bits = np.unpackbits(rows, axis=1, bitorder=self.numpy_order)[:, :self.columns]
+        return PatternGrid.from_bytes(np.packbits(bits.T, axis=1, bitorder="little").tobytes(), self.leds)
+
+
+FORMATS = {}
+
+
+def register(spec):
+    fmt = spec if isinstance(spec, OutputFormat) else OutputFormat(**spec)
+    if fmt.name in FORMATS:
+        raise ValueError(f"output format {fmt.name!r} is already registered")
+    FORMATS[fmt.name] = fmt
+    return fmt
+
+
+def get_format(name):
+    if isinstance(name, OutputFormat):
+        return name
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError(f"unknown output format {name!r} (choose from {', '.join(FORMATS)})") from None
+
+
+for _spec in FORMAT_SPECS:
+    register(_spec)
+
+
+# Writers. Each takes (comment, data) sections and builds its whole output in
+# one buffer: a byte table lookup for the hex text, one preallocated
+# bytearray for binary.
+
+# "0xNN," and "\xNN" for every byte value, indexed by the byte
+_HEX_BYTES = np.array([list(f"0x{b:02X},".encode()) for b in range(256)], dtype=np.uint8)
+_ESCAPED_BYTES = np.array([list(f"\\x{b:02x}".encode()) for b in range(256)], dtype=np.uint8)
+
+
+def _rows(table, data, per_line, prefix=b"", suffix=b"\n"):
+    # One table entry per byte, `per_line` entries per line between prefix and suffix
+    data = np.frombuffer(data, dtype=np.uint8)
+    cell = table.shape[1]
+    full = len(data) // per_line
+    body = len(prefix) + per_line * cell
+    rows = np.empty((full, body + len(suffix)), dtype=np.uint8)
+    rows[:, :len(prefix)] = list(prefix)
+    rows[:, len(prefix):body] = table[data[:full * per_line]].reshape(full, per_line * cell)
+    rows[:, body:] = list(suffix)
+    out = rows.tobytes()
+    if full * per_line < len(data):
+        out += prefix + table[data[full * per_line:]].tobytes() + suffix
+    return out
+
+
+def hex_rows(data, per_line=16):
+    # "0xNN," text, `per_line` bytes per line
+    return _rows(_HEX_BYTES, data, per_line).decode("ascii")
+
+
+def write_hex(sections, name=None):
+    out = io.StringIO()
+    for comment, data in sections:
+        if comment is not None:
+            out.write(f"// {comment}\n")
+        out.write(hex_rows(data))
+    return out.getvalue()
+
+
+def write_c(sections, name="pov_pattern"):
+    sections = list(sections)
+    size = sum(len(data) for comment, data in sections)
+    out = io.StringIO()
+    out.write(f"const uint8_t {name}[{size}] = {{\n")
+    for comment, data in sections:
+        if comment is not None:
+            out.write(f"    // {comment}\n")
+        out.write(_rows(_HEX_BYTES, data, 16, b"    ").decode("ascii"))
+    out.write("};\n")
+    return out.getvalue()
+
+
+def write_python(sections, name="POV_PATTERN"):
+    out = io.StringIO()
+    out.write(f"{name} = (\n")
+    size = 0
+    for comment, data in sections:
+        if comment is not None:
+            out.write(f"    # {comment}\n")
+        out.write(_rows(_ESCAPED_BYTES, data, 16, b'    b"', b'"\n').decode("ascii"))
+        size += len(data)
+    out.write(")\n" if size else '    b""\n)\n')
+    return out.getvalue()
+
+
+def write_binary(sections, name=None):
+    sections = list(sections)
+    out = bytearray(sum(len(data) for comment, data in sections))
+    pos = 0
+    for comment, data in sections:
+        out[pos:pos + len(data)] = data
+        pos += len(data)
+    return bytes(out)
+
+
+WRITERS = {"hex": write_hex, "c": write_c, "python": write_python, "binary": write_binary}
@@ -0,0 +1,320 @@
+# Single glyph registry: the font is decoded once at import into packed
+# column bitmasks (bit N = glyph row N) and stamped into grids column by column.
+
+# 9x5 pixel font for letters A-Z (9 tall, 5 wide)
+LETTER_PATTERNS = {
+    'A': [
+        "00100",
+        "01010",
+        "10001",
+        "10001",
+        "11111",
+        "10001",
+        "10001",
+        "10001",
+        "10001"
+    ],
+    'B': [
+        "11100",
+        "10010",
+        "10001",
+        "10001",
+        "11110",
+        "10001",
+        "10001",
+        "10010",
+        "11100"
+    ],
+    'C': [
+        "01110",
+        "10001",
+        "10000",
+        "10000",
+        "10000",
+        "10000",
+        "10000",
+        "10001",
+        "01110"
+    ],
+    'D': [
+        "11100",
+        "10010",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10010",
+        "11100"
+    ],
+    'E': [
+        "11111",
+        "10000",
+        "10000",
+        "10000",
+        "11110",
+        "10000",
+        "10000",
+        "10000",
+        "11111"
+    ],
+    'F': [
+        "11111",
+        "10000",
+        "10000",
+        "10000",
+        "11110",
+        "10000",
+        "10000",
+        "10000",
+        "10000"
+    ],
+    'G': [
+        "01110",
+        "10001",
+        "10000",
+        "10000",
+        "10011",
+        "10001",
+        "10001",
+        "10001",
+        "01110"
+    ],
+    'H': [
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "11111",
+        "10001",
+        "10001",
+        "10001",
+        "10001"
+    ],
+    'I': [
+        "11111",
+        "00100",
+        "00100",
+        "00100",
+        "00100",
+        "00100",
+        "00100",
+        "00100",
+        "11111"
+    ],
+    'J': [
+        "00111",
+        "00010",
+        "00010",
+        "00010",
+        "00010",
+        "00010",
+        "10010",
+        "10010",
+        "01100"
+    ],
+    'K': [
+        "10001",
+        "10010",
+        "10100",
+        "11000",
+        "11000",
+        "10100",
+        "10010",
+        "10001",
+        "10001"
+    ],
+    'L': [
+        "10000",
+        "10000",
+        "10000",
+        "10000",
+        "10000",
+        "10000",
+        "10000",
+        "10000",
+        "11111"
+    ],
+    'M': [
+        "10001",
+        "11011",
+        "10101",
+        "10101",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001"
+    ],
+    'N': [
+        "10001",
+        "11001",
+        "11001",
+        "10101",
+        "10101",
+        "10011",
+        "10011",
+        "10001",
+        "10001"
+    ],
+    'O': [
+        "01110",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "01110"
+    ],
+    'P': [
+        "11110",
+        "10001",
+        "10001",
+        "10001",
+        "11110",
+        "10000",
+        "10000",
+        "10000",
+        "10000"
+    ],
+    'Q': [
+        "01110",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10101",
+        "10011",
+        "10001",
+        "01111"
+    ],
+    'R': [
+        "11110",
+        "10001",
+        "10001",
+        "10001",
+        "11110",
+        "10010",
+        "10001",
+        "10001",
+        "10001"
+    ],
+    'S': [
+        "01111",
+        "10000",
+        "10000",
+        "10000",
+        "01110",
+        "00001",
+        "00001",
+        "00001",
+        "11110"
+    ],
+    'T': [
+        "11111",
+        "00100",
+        "00100",
+        "00100",
+        "00100",
+        "00100",
+        "00100",
+        "00100",
+        "00100"
+    ],
+    'U': [
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "01110"
+    ],
+    'V': [
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "01010",
+        "01010",
+        "00100"
+    ],
+    'W': [
+        "10001",
+        "10001",
+        "10001",
+        "10001",
+        "10101",
+        "10101",
+        "10101",
+        "11011",
+        "10001"
+    ],
+    'X': [
+        "10001",
+        "10001",
+        "01010",
+        "01010",
+        "00100",
+        "01010",
+        "01010",
+        "10001",
+        "10001"
+    ],
+    'Y': [
+        "10001",
+        "10001",
+        "10001",
+        "01010",
+        "01010",
+        "00100",
+        "00100",
+        "00100",
+        "00100"
+    ],
+    'Z': [
+        "11111",
+        "00001",
+        "00010",
+        "00100",
+        "01000",
+        "01000",
+        "10000",
+        "10000",
+        "11111"
+    ]
+}
+
+
+class Glyph:
+    __slots__ = ("name", "width", "height", "columns")
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.height = len(rows)
+        self.width = len(rows[0])
+        self.columns = tuple(sum(1 << r for r, row in enumerate(rows) if row[c] == "1")
+                             for c in range(self.width))
+
+
+GLYPHS = {name: Glyph(name, rows) for name, rows in LETTER_PATTERNS.items()}
+GLYPH_HEIGHT = 9
+GLYPH_WIDTH = 5
+
+
+def get_glyph(name):
+    return GLYPHS.get(name)
+
+
+def stamp_glyph(grid, name, top, left, replace=True):
+    # Replace clears the glyph's box first (the drag-and-drop behaviour);
+    # otherwise the lit bits are OR-ed into what is already there
+    glyph = GLYPHS[name]
+    grid.blit(top, left, glyph.columns, glyph.height, replace)
+    return glyph.width
@@ -0,0 +1,224 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+import codec
+import library
+import pov_core
+import pov_link
+
+# Reads firmware blocks back out of everything the tools write: "0xNN," text
+# (generate_hex_code, pov-compile, C headers), raw 128-byte blocks, compressed
+# streams, pov-link images and Intel HEX. Files are read in chunks and blocks
+# are yielded as soon as they are complete, so memory stays bounded no matter
+# how large the archive is.
+
+CHUNK_SIZE = 1 << 20
+BINARY_EXTENSIONS = (".bin", ".dat")
+INTEL_HEX_EXTENSIONS = (".hex", ".ihx")
+TEXT_EXTENSIONS = (".h", ".c", ".cpp", ".ino", ".txt")
+
+_HEX_DIGITS = np.full(256, 0xFF, dtype=np.uint8)
+for _i, _c in enumerate(b"0123456789abcdef"):
+    _HEX_DIGITS[_c] = _HEX_DIGITS[bytes([_c]).upper()[0]] = _i
+
+
+def parse_hex_bytes(text):
+    # Every "0xNN" token of `text`, found with whole-array comparisons
+    if isinstance(text, str):
+        text = text.encode("ascii", "replace")
+    buf = np.frombuffer(text, dtype=np.uint8)
+    if len(buf) < 4:
+        return b""
+    hi, lo = _HEX_DIGITS[buf[2:-1]], _HEX_DIGITS[buf[3:]]
+    hit = (buf[:-3] == ord("0")) & (buf[1:-2] | 0x20 == ord("x")) & (hi < 16) & (lo < 16)
+    hit[:-1] &= _HEX_DIGITS[buf[4:]] >= 16
+    index = np.flatnonzero(hit)
+    return (hi[index] << 4 | lo[index]).tobytes()
+
+
+def read_text_chunks(f):
+    # Line-aligned chunks, so no token is ever split between two of them
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield parse_hex_bytes(chunk + f.readline())
+
+
+def read_binary_chunks(f):
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_intel_hex_chunks(f):
+    # Data records in address order; gaps between records read as zeros
+    expected = None
+    upper = 0
+    for line in f:
+        line = line.strip()
+        if not line.startswith(":"):
+            continue
+        record = bytes.fromhex(line[1:])
+        if len(record) < 5 or len(record) != record[0] + 5 or sum(record) & 0xFF:
+            raise ValueError(f"bad Intel HEX record {line!r}")
+        kind, data = record[3], record[4:-1]
+        if kind == 0:
+            address = upper + (record[1] << 8 | record[2])
+            if expected is not None and address > expected:
+                yield bytes(address - expected)
+            expected = address + len(data)
+            yield data
+        elif kind == 4:
+            upper = int.from_bytes(data, "big") << 16
+        elif kind == 1:
+            return
+
+
+def image_blocks(image, block_size=pov_core.BLOCK_SIZE):
+    # Every frame of every entry of a pov-link image, in playlist order, padded
+    # back out to the format's block size
+    for offset, length, frames, duration, flags, columns in pov_link.read_index(image):
+        payload = bytes(image[offset:offset + length])
+        if flags & pov_link.FLAG_COMPRESSED:
+            yield from codec.decode_stream(payload, block_size)
+        else:
+            size = len(payload) // max(frames, 1)
+            for i in range(frames):
+                yield payload[i * size:(i + 1) * size].ljust(block_size, b"\0")
+
+
+def iter_blocks(chunks, block_size=pov_core.BLOCK_SIZE):
+    # Split a byte stream into firmware blocks. Containers (pov-link images and
+    # compressed streams) are read whole and decoded when their header checks
+    # out; anything else that merely starts with their magic is raw blocks.
+    chunks = iter(chunks)
+    pending = bytearray()
+    for chunk in chunks:
+        pending += chunk
+        if len(pending) >= 4:
+            break
+    if pending.startswith(pov_link.IMAGE_MAGIC) or pending.startswith(codec.MAGIC):
+        for chunk in chunks:
+            pending += chunk
+        data = bytes(pending)
+        if pov_link.is_image(data):
+            yield from image_blocks(data, block_size)
+            return
+        if codec.is_stream(data, block_size):
+            yield from codec.decode_stream(data, block_size)
+            return
+    block = block_size
+    while True:
+        whole = len(pending) // block * block
+        for start in range(0, whole, block):
+            yield bytes(pending[start:start + block])
+        del pending[:whole]
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        pending += chunk
+    if pending:
+        yield bytes(pending).ljust(block, b"\0")
+
+
+def block_to_grid(block, output_format="heart"):
+    # Undo the format's packing; the grid has one row per LED
+    return pov_core.get_format(output_format).decode(block)
+
+
+def import_text(text, output_format="heart"):
+    block_size = pov_core.get_format(output_format).block_size
+    return [block_to_grid(block, output_format) for block in iter_blocks([parse_hex_bytes(text)], block_size)]
+
+
+def iter_file(path, block_size=pov_core.BLOCK_SIZE):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in BINARY_EXTENSIONS:
+        with open(path, "rb") as f:
+            yield from iter_blocks(read_binary_chunks(f), block_size)
+        return
+    with open(path, errors="replace") as f:
+        first = f.read(1)
+        f.seek(0)
+        if ext in INTEL_HEX_EXTENSIONS and first == ":":
+            yield from iter_blocks(read_intel_hex_chunks(f), block_size)
+        else:
+            yield from iter_blocks(read_text_chunks(f), block_size)
+
+
+def iter_paths(paths, block_size=pov_core.BLOCK_SIZE):
+    # (path, index, block) for every block under `paths`. Directories are walked
+    # in sorted order and only files with a known extension are read from them.
+    known = BINARY_EXTENSIONS + INTEL_HEX_EXTENSIONS + TEXT_EXTENSIONS
+    for path in paths:
+        if path == "-":
+            for i, block in enumerate(iter_blocks(read_text_chunks(sys.stdin), block_size)):
+                yield path, i, block
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(known):
+                        full = os.path.join(root, name)
+                        for i, block in enumerate(iter_file(full, block_size)):
+                            yield full, i, block
+        else:
+            for i, block in enumerate(iter_file(path, block_size)):
+                yield path, i, block
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-import",
+        description="Read hex text, binary blocks, compressed streams and flash images back into patterns.")
+    parser.add_argument("paths", nargs="+", help="files or directories to import ('-' for stdin)")
+    parser.add_argument("-f", "--format", choices=sorted(pov_core.FORMATS), default="heart",
+                        help="block layout (default: heart)")
+    parser.add_argument("-o", "--output-dir",
+                        help="write every pattern to this directory as a text pattern file")
+    parser.add_argument("-l", "--library",
+                        help="collect every pattern into this binary pattern library (.pov)")
+    parser.add_argument("--show", action="store_true", help="print each pattern as text")
+    args = parser.parse_args(argv)
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    count = failures = 0
+    sources = set()
+
+    def patterns():
+        nonlocal count
+        for path, index, block in iter_paths(args.paths, pov_core.get_format(args.format).block_size):
+            grid = block_to_grid(block, args.format)
+            count += 1
+            sources.add(path)
+            stem = os.path.splitext(os.path.basename(path))[0] if path != "-" else "stdin"
+            if args.output_dir:
+                pov_core.save_pattern_file(grid, os.path.join(args.output_dir, f"{stem}_{index:04d}.txt"))
+            if args.show:
+                print(f"// {path} #{index}")
+                for row in grid.to_rows():
+                    print("".join("#" if bit else "." for bit in row))
+            yield f"{stem}_{index:04d}", grid, library.DEFAULT_DURATION_MS
+
+    try:
+        if args.library:
+            library.save_library(args.library, patterns(), {"format": args.format})
+        else:
+            for _ in patterns():
+                pass
+    except (OSError, ValueError) as e:
+        failures += 1
+        print(f"pov-import: {e}", file=sys.stderr)
+    print(f"pov-import: {count} patterns from {len(sources)} sources", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+from PyQt5.QtGui import QImage, QImageReader
+
+import library
+from pattern_grid import PatternGrid
+import pov_compile
+import pov_core
+import raster
+
+# Turns logos and animated GIFs into patterns. Each frame is decoded with
+# QImageReader (no QApplication needed), converted to ink levels (dark pixels
+# light LEDs), area-resampled to at most the output format's LED count and
+# quantized to 1 bit by thresholding, ordered (Bayer) dithering or
+# Floyd-Steinberg error diffusion.
+# GIF frames are streamed one at a time, so only a single decoded frame is
+# ever held in memory.
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
+IMAGE_FILTER = "Images (*.png *.jpg *.jpeg *.gif *.bmp);;All files (*)"
+DITHER_METHODS = ("floyd-steinberg", "ordered", "threshold")
+MIN_FRAME_MS = 10
+
+
+def _bayer(size):
+    matrix = np.zeros((1, 1))
+    while matrix.shape[0] < size:
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return (matrix + 0.5) / matrix.size
+
+
+BAYER_8 = _bayer(8)
+
+
+def read_frames(path):
+    # (QImage, delay in ms) for every frame; still images have one frame
+    reader = QImageReader(path)
+    if not reader.canRead():
+        raise ValueError(f"{path}: {reader.errorString()}")
+    count = 0
+    while True:
+        image = reader.read()
+        if image.isNull():
+            if not count:
+                raise ValueError(f"{path}: {reader.errorString()}")
+            return
+        count += 1
+        yield image, reader.nextImageDelay()
+
+
+def image_levels(image):
+    # Ink level per pixel in [0, 1]: 1 for black, 0 for white or transparent
+    image = image.convertToFormat(QImage.Format_ARGB32)
+    height, width = image.height(), image.width()
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(bits, np.uint8).reshape(height, image.bytesPerLine())[:, :width * 4]
+    bgra = pixels.reshape(height, width, 4).astype(np.float32) / 255
+    luma = bgra[..., 2] * 0.299 + bgra[..., 1] * 0.587 + bgra[..., 0] * 0.114
+    return (1 - luma) * bgra[..., 3]
+
+
+def _resample_axis(levels, size, axis):
+    # Area average along one axis: integrate with a prefix sum, then take the
+    # difference of the integral at each output cell's (fractional) edges
+    src = levels.shape[axis]
+    prefix = np.concatenate([np.zeros_like(np.take(levels, [0], axis)),
+                             np.cumsum(levels, axis=axis, dtype=np.float64)], axis=axis)
+    edges = np.arange(size + 1) * (src / size)
+    whole = np.minimum(edges.astype(np.intp), src - 1)
+    frac = (edges - whole).reshape([-1 if a == axis else 1 for a in range(levels.ndim)])
+    lower, upper = np.take(prefix, whole, axis), np.take(prefix, whole + 1, axis)
+    integral = lower + (upper - lower) * frac
+    return np.diff(integral, axis=axis) / (src / size)
+
+
+def resample(levels, rows, columns):
+    return _resample_axis(_resample_axis(levels, rows, 0), columns, 1)
+
+
+def fit_size(height, width, rows=16, max_columns=None):
+    # Output (rows, columns) with the image's aspect ratio: full height unless
+    # that would be wider than max_columns
+    max_columns = min(max_columns or pov_core.MAX_CANVAS_WIDTH, pov_core.MAX_CANVAS_WIDTH)
+    columns = max(1, round(width * rows / height))
+    if columns > max_columns:
+        rows, columns = max(1, min(rows, round(height * max_columns / width))), max_columns
+    return rows, columns
+
+
+def threshold(levels, level=0.5):
+    return levels >= level
+
+
+def ordered_dither(levels):
+    height, width = levels.shape
+    return levels > BAYER_8[np.arange(height)[:, None] % 8, np.arange(width)[None, :] % 8]
+
+
+def floyd_steinberg(levels):
+    # Error diffusion in the usual raster order. Pixel (y, x) only waits on
+    # pixels with a smaller x + 2y, so each of those diagonals is quantized in
+    # one vector step (one pixel per row) instead of pixel by pixel.
+    height, width = levels.shape
+    stride = width + 2
+    work = np.zeros((height + 1, stride))
+    work[:height, 1:-1] = levels
+    out = np.zeros(work.shape, dtype=bool)
+    flat, flat_out = work.reshape(-1), out.reshape(-1)
+    for t in range(width + 2 * (height - 1)):
+        ys = np.arange(max(0, (t - width + 2) // 2), min(height - 1, t // 2) + 1)
+        index = ys * stride + t - 2 * ys + 1
+        old = flat[index]
+        new = old >= 0.5
+        flat_out[index] = new
+        error = old - new
+        flat[index + 1] += error * (7 / 16)
+        flat[index + stride - 1] += error * (3 / 16)
+        flat[index + stride] += error * (5 / 16)
+        flat[index + stride + 1] += error * (1 / 16)
+    return out[:height, 1:-1]
+
+
+DITHERS = {"floyd-steinberg": floyd_steinberg, "ordered": ordered_dither, "threshold": threshold}
+
+
+def image_to_grid(image, columns=None, method="floyd-steinberg", invert=False, width=None, height=16):
+    # `columns` forces the resampled width; otherwise the aspect ratio is kept.
+    # The result is centered on a canvas `width` columns wide (default: the
+    # image's own width).
+    levels = image_levels(image)
+    if invert:
+        levels = 1 - levels
+    rows, cols = fit_size(image.height(), image.width(), height, columns or width)
+    if columns:
+        cols = min(columns, width or pov_core.MAX_CANVAS_WIDTH)
+    bits = DITHERS[method](resample(levels, rows, cols))
+    grid = PatternGrid(width or cols, height)
+    raster.apply_mask(grid, bits, True, (height - rows) // 2, ((width or cols) - cols) // 2)
+    grid.take_dirty()
+    return grid
+
+
+def iter_grids(path, columns=None, method="floyd-steinberg", invert=False, width=None, height=16):
+    # (grid, duration) per frame, decoded and converted one frame at a time
+    for image, delay in read_frames(path):
+        duration = max(delay, MIN_FRAME_MS) if delay > 0 else library.DEFAULT_DURATION_MS
+        yield image_to_grid(image, columns, method, invert, width, height), duration
+
+
+def iter_image_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _convert_job(job):
+    path, options = job
+    try:
+        return path, list(iter_grids(path, *options)), None
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-image",
+        description="Convert images and animated GIFs into patterns.")
+    parser.add_argument("paths", nargs="+", help="image files or directories of images")
+    parser.add_argument("-d", "--dither", choices=DITHER_METHODS, default="floyd-steinberg",
+                        help="1-bit conversion (default: floyd-steinberg)")
+    parser.add_argument("-c", "--columns", type=int,
+                        help="resample to exactly this many columns (default: keep the aspect ratio)")
+    parser.add_argument("-w", "--width", type=int,
+                        help="center each pattern on a canvas this wide (default: the image width)")
+    parser.add_argument("-f", "--format", choices=sorted(pov_core.FORMATS), default="heart",
+                        help="output layout; sets the number of rows (default: heart)")
+    parser.add_argument("--invert", action="store_true", help="light the bright pixels instead of the dark ones")
+    parser.add_argument("-o", "--output-dir",
+                        help="write every pattern to this directory as a text pattern file")
+    parser.add_argument("-l", "--library",
+                        help="collect every pattern into this binary pattern library (.pov)")
+    parser.add_argument("--show", action="store_true", help="print each pattern as text")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="convert images in this many worker processes (0: one per CPU)")
+    args = parser.parse_args(argv)
+
+    for name in ("columns", "width"):
+        value = getattr(args, name)
+        if value is not None and not 1 <= value <= pov_core.MAX_CANVAS_WIDTH:
+            print(f"pov-image: --{name} must be between 1 and {pov_core.MAX_CANVAS_WIDTH}", file=sys.stderr)
+            return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    options = (args.columns, args.dither, args.invert, args.width, pov_core.get_format(args.format).leds)
+    jobs = ((path, options) for path in iter_image_paths(args.paths))
+    count = images = failures = 0
+
+    def patterns(results):
+        nonlocal count, images, failures
+        for path, grids, error in results:
+            if error is not None:
+                failures += 1
+                print(f"pov-image: {error}", file=sys.stderr)
+                continue
+            images += 1
+            stem = os.path.splitext(os.path.basename(path))[0]
+            for index, (grid, duration) in enumerate(grids):
+                count += 1
+                if args.output_dir:
+                    pov_core.save_pattern_file(grid, os.path.join(args.output_dir, f"{stem}_{index:04d}.txt"))
+                if args.show:
+                    print(f"// {path} #{index} ({duration} ms)")
+                    for row in grid.to_rows():
+                        print("".join("#" if bit else "." for bit in row))
+                yield f"{stem}_{index:04d}", grid, duration
+
+    executor = None
+    try:
+        if args.jobs == 1:
+            results = map(_convert_job, jobs)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            workers = args.jobs or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(workers)
+            results = pov_compile.imap_ordered(executor, _convert_job, jobs, workers * 4)
+        if args.library:
+            library.save_library(args.library, patterns(results), {"format": args.format})
+        else:
+            for _ in patterns(results):
+                pass
+    except OSError as e:
+        failures += 1
+        print(f"pov-image: {e}", file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    print(f"pov-image: {count} patterns from {images} images", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
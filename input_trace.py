@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from PyQt5.QtCore import QEvent, QMimeData, QObject, QPointF, Qt
+from PyQt5.QtGui import QDropEvent, QMouseEvent
+
+# Editing-session traces for the grid widget. A trace is JSON lines: a header
+# with the canvas setup, then one record per input event with a timestamp in
+# seconds from the start of the session:
+#
+#   {"type": "header", "version": 1, "width": 64, "cell_size": 20}
+#   {"t": 0.52, "type": "press", "x": 143, "y": 61, "tool": "draw"}
+#   {"t": 0.53, "type": "move", "x": 150, "y": 62, "tool": "draw"}
+#   {"t": 0.61, "type": "release", "x": 152, "y": 62, "tool": "draw"}
+#   {"t": 1.20, "type": "drop", "x": 200, "y": 60, "text": "A"}
+#   {"t": 1.50, "type": "scroll", "col": 12}
+#   {"t": 1.70, "type": "width", "width": 128}
+#
+# Recording hooks a live designer (python POV_Pattern.py --record-trace FILE).
+# Replaying runs the same handlers under the offscreen platform and times each
+# event: the handler itself, the stroke flush when a frame boundary passes,
+# and the repaint that follows.
+
+TRACE_VERSION = 1
+FRAME_SECONDS = 0.016
+
+MOUSE_EVENTS = {QEvent.MouseButtonPress: "press", QEvent.MouseMove: "move",
+                QEvent.MouseButtonRelease: "release"}
+
+
+class TraceRecorder(QObject):
+    # Event filter on the grid widget that appends every input event to a trace file
+
+    def __init__(self, designer, path):
+        super().__init__(designer)
+        self.designer = designer
+        self.file = open(path, "w", buffering=1)
+        self.started = time.perf_counter()
+        self.write({"type": "header", "version": TRACE_VERSION, "width": designer.grid.width,
+                    "cell_size": designer.grid_widget.cell_size})
+        designer.grid_widget.installEventFilter(self)
+        designer.scrollbar.valueChanged.connect(lambda col: self.record("scroll", col=col))
+        designer.width_spin.valueChanged.connect(lambda width: self.record("width", width=width))
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+
+    def record(self, kind, **fields):
+        self.write({"t": round(time.perf_counter() - self.started, 6), "type": kind, **fields})
+
+    def eventFilter(self, obj, event):
+        kind = MOUSE_EVENTS.get(event.type())
+        if kind is not None:
+            self.record(kind, x=event.x(), y=event.y(), tool=self.designer.current_tool)
+        elif event.type() == QEvent.Drop:
+            self.record("drop", x=event.pos().x(), y=event.pos().y(), text=event.mimeData().text())
+        return False
+
+    def close(self):
+        self.file.close()
+
+
+def read_trace(path):
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records or records[0].get("type") != "header":
+        raise ValueError(f"{path}: not an input trace")
+    if records[0].get("version") != TRACE_VERSION:
+        raise ValueError(f"{path}: unsupported trace version {records[0].get('version')}")
+    return records[0], records[1:]
+
+
+def synthesize_trace(path, strokes=50, width=64, cell_size=20, seed=0):
+    # Scribbles, lines, circles and letter drops at a steady 120 Hz pointer rate
+    rng = random.Random(seed)
+    records = [{"type": "header", "version": TRACE_VERSION, "width": width, "cell_size": cell_size}]
+    t = 0.0
+    span = min(width, 64) * cell_size
+    for _ in range(strokes):
+        t += rng.uniform(0.2, 0.6)
+        tool = rng.choice(["draw", "draw", "erase", "line", "circle", "drop"])
+        x, y = rng.uniform(0, span), rng.uniform(0, 16 * cell_size)
+        if tool == "drop":
+            records.append({"t": round(t, 6), "type": "drop", "x": x, "y": y,
+                            "text": rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ")})
+            continue
+        records.append({"t": round(t, 6), "type": "press", "x": x, "y": y, "tool": tool})
+        for _ in range(rng.randint(5, 60)):
+            t += 1 / 120
+            x = min(max(x + rng.uniform(-15, 15), 0), span - 1)
+            y = min(max(y + rng.uniform(-10, 10), 0), 16 * cell_size - 1)
+            records.append({"t": round(t, 6), "type": "move", "x": x, "y": y, "tool": tool})
+        records.append({"t": round(t, 6), "type": "release", "x": x, "y": y, "tool": tool})
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def _mouse_event(kind, record):
+    event_type = {"press": QEvent.MouseButtonPress, "move": QEvent.MouseMove,
+                  "release": QEvent.MouseButtonRelease}[kind]
+    buttons = Qt.NoButton if kind == "release" else Qt.LeftButton
+    button = Qt.NoButton if kind == "move" else Qt.LeftButton
+    return QMouseEvent(event_type, QPointF(record["x"], record["y"]), button, buttons, Qt.NoModifier)
+
+
+def _drop_event(record):
+    # QDropEvent does not own its mime data, so the caller keeps both alive
+    mime = QMimeData()
+    mime.setText(record["text"])
+    return QDropEvent(QPointF(record["x"], record["y"]), Qt.CopyAction, mime, Qt.LeftButton, Qt.NoModifier), mime
+
+
+def replay(header, events, realtime=False, app=None):
+    # Returns one (type, handler seconds, flush seconds, repaint seconds) per event
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = app or QApplication.instance() or QApplication(sys.argv[:1])
+    import POV_Pattern
+
+    designer = POV_Pattern.POVWandDesigner()
+    designer.resize(1400, 900)
+    designer.show()
+    width = header.get("width", 64)
+    designer.long_canvas_check.setChecked(width > 64)
+    designer.width_spin.setValue(width)
+    app.processEvents()
+    widget = designer.grid_widget
+    handlers = {"press": widget.mousePressEvent, "move": widget.mouseMoveEvent,
+                "release": widget.mouseReleaseEvent}
+
+    timings = []
+    started = time.perf_counter()
+    frame_end = None
+    for record in events:
+        kind = record["type"]
+        if realtime:
+            delay = record["t"] - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        # Freehand samples are applied once per frame; without a real clock the
+        # frame boundary is taken from the trace timestamps
+        flush = 0.0
+        if not realtime and widget.stroke_timer.isActive() and record["t"] >= frame_end:
+            widget.stroke_timer.stop()
+            t0 = time.perf_counter()
+            widget.flush_stroke()
+            flush = time.perf_counter() - t0
+
+        if "tool" in record:
+            designer.current_tool = record["tool"]
+        t0 = time.perf_counter()
+        if kind in handlers:
+            handlers[kind](_mouse_event(kind, record))
+        elif kind == "drop":
+            event, mime = _drop_event(record)
+            widget.dropEvent(event)
+        elif kind == "scroll":
+            designer.scrollbar.setValue(record["col"])
+        elif kind == "width":
+            designer.long_canvas_check.setChecked(record["width"] > 64)
+            designer.width_spin.setValue(record["width"])
+        else:
+            continue
+        handler = time.perf_counter() - t0
+        if not realtime and widget.stroke_timer.isActive() and (frame_end is None or record["t"] >= frame_end):
+            frame_end = record["t"] + FRAME_SECONDS
+
+        t0 = time.perf_counter()
+        app.processEvents()
+        repaint = time.perf_counter() - t0
+        timings.append((kind, handler, flush, repaint))
+    designer.close()
+    return timings
+
+
+def summarize(timings):
+    # Per event type and overall: count, mean handler/flush/repaint and p50/p99 latency (ms)
+    report = {}
+    groups = {"all": timings}
+    for kind in sorted({t[0] for t in timings}):
+        groups[kind] = [t for t in timings if t[0] == kind]
+    for name, rows in groups.items():
+        if not rows:
+            continue
+        handler, flush, repaint = (np.array([row[i] for row in rows]) * 1000 for i in (1, 2, 3))
+        latency = handler + flush + repaint
+        report[name] = {"events": len(rows), "handler_ms": float(handler.mean()),
+                        "flush_ms": float(flush.mean()), "repaint_ms": float(repaint.mean()),
+                        "p50_ms": float(np.percentile(latency, 50)),
+                        "p99_ms": float(np.percentile(latency, 99)),
+                        "max_ms": float(latency.max())}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-trace",
+        description="Replay recorded editing sessions headlessly and report input latency. "
+                    "Record with: python POV_Pattern.py --record-trace FILE")
+    sub = parser.add_subparsers(dest="command", required=True)
+    replay_parser = sub.add_parser("replay", help="replay a trace and report latency")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument("--realtime", action="store_true",
+                               help="honour the recorded timing instead of replaying as fast as possible")
+    replay_parser.add_argument("-o", "--output", help="write the report as JSON to this file")
+    synth_parser = sub.add_parser("synthesize", help="write a synthetic trace")
+    synth_parser.add_argument("trace")
+    synth_parser.add_argument("--strokes", type=int, default=50)
+    synth_parser.add_argument("--width", type=int, default=64)
+    synth_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "synthesize":
+        synthesize_trace(args.trace, args.strokes, args.width, seed=args.seed)
+        return 0
+
+    try:
+        header, events = read_trace(args.trace)
+    except (OSError, ValueError) as e:
+        print(f"pov-trace: {e}", file=sys.stderr)
+        return 1
+    report = summarize(replay(header, events, args.realtime))
+    print(f"{'event':10s} {'count':>6s}  mean handler / flush / repaint (ms)   latency p50 / p99 (ms)")
+    for name, row in report.items():
+        print(f"{name:10s} {row['events']:6d}  {row['handler_ms']:8.3f} {row['flush_ms']:8.3f} "
+              f"{row['repaint_ms']:8.3f}          {row['p50_ms']:8.3f} {row['p99_ms']:8.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
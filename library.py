@@ -0,0 +1,184 @@
+import json
+import mmap
+import os
+import struct
+
+from pattern_grid import PatternGrid
+
+# Pattern library / project container.
+#
+#   header  magic "POVL", version, flags, pattern count, index offset,
+#           metadata offset and length
+#   data    each pattern's packed columns (PatternGrid.to_bytes), back to back
+#   names   UTF-8 pattern names, back to back
+#   meta    JSON object with project settings (output format, ...)
+#   index   one fixed-size record per pattern: data offset, name offset, data
+#           length, width, name length, height, flags, duration (ms)
+#
+# The index sits at the end so a library can be written in one pass. Readers
+# mmap the file and unpack one index record per pattern they actually touch.
+#
+# The JSON variant holds the same patterns as rows of "0"/"1" strings.
+
+LIBRARY_MAGIC = b"POVL"
+LIBRARY_VERSION = 1
+HEADER = struct.Struct("<4sHHQQQI")
+INDEX_ENTRY = struct.Struct("<QQIHHBBH")
+JSON_VERSION = 1
+DEFAULT_DURATION_MS = 100
+
+
+def save_library(path, patterns, meta=None):
+    # `patterns` yields (name, grid, duration) and is consumed as it is written
+    records = []
+    names = bytearray()
+    with open(path, "wb") as f:
+        f.write(bytes(HEADER.size))
+        offset = HEADER.size
+        for name, grid, duration in patterns:
+            data = grid.to_bytes()
+            name = name.encode()
+            records.append((offset, len(names), len(data), grid.width, len(name), grid.height, 0, duration))
+            names += name
+            f.write(data)
+            offset += len(data)
+        names_offset = offset
+        f.write(names)
+        meta_offset = names_offset + len(names)
+        meta = json.dumps(meta or {}).encode()
+        f.write(meta)
+        index_offset = meta_offset + len(meta)
+        index = bytearray(len(records) * INDEX_ENTRY.size)
+        for i, (data_offset, name_offset, *rest) in enumerate(records):
+            INDEX_ENTRY.pack_into(index, i * INDEX_ENTRY.size, data_offset, names_offset + name_offset, *rest)
+        f.write(index)
+        f.seek(0)
+        f.write(HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, 0, len(records), index_offset,
+                            meta_offset, len(meta)))
+
+
+class PatternLibrary:
+    # Read-only view of a library file. Opening maps the file and reads the
+    # header; a pattern is only decoded when it is indexed.
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path}: not a pattern library")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        magic, version, flags, count, index_offset, meta_offset, meta_length = HEADER.unpack_from(self._map, 0)
+        if magic != LIBRARY_MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a pattern library")
+        if version != LIBRARY_VERSION:
+            self.close()
+            raise ValueError(f"{path}: unsupported library version {version}")
+        if index_offset + count * INDEX_ENTRY.size > size or meta_offset + meta_length > size:
+            self.close()
+            raise ValueError(f"{path}: truncated library")
+        self.count = count
+        self._index_offset = index_offset
+        self._meta = (meta_offset, meta_length)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, index):
+        # (data offset, name offset, data length, width, name length, height, flags, duration)
+        if not 0 <= index < self.count:
+            raise IndexError(f"pattern {index} out of range")
+        entry = INDEX_ENTRY.unpack_from(self._map, self._index_offset + index * INDEX_ENTRY.size)
+        data_offset, name_offset, data_length, _, name_length, _, _, _ = entry
+        if data_offset + data_length > self._index_offset or name_offset + name_length > self._index_offset:
+            raise ValueError(f"{self.path}: pattern {index} is damaged")
+        return entry
+
+    def name(self, index):
+        _, name_offset, _, _, name_length, _, _, _ = self.entry(index)
+        return self._map[name_offset:name_offset + name_length].decode()
+
+    def duration(self, index):
+        return self.entry(index)[7]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        offset, _, length, width, _, height, _, _ = self.entry(index)
+        grid = PatternGrid.from_bytes(self._map[offset:offset + length], height)
+        if grid.width != width:
+            raise ValueError(f"{self.path}: pattern {index} is damaged")
+        return grid
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.name(i), self[i], self.duration(i)
+
+    @property
+    def meta(self):
+        offset, length = self._meta
+        return json.loads(self._map[offset:offset + length].decode() or "{}")
+
+
+def save_json(path, patterns, meta=None):
+    doc = dict(meta or {})
+    doc["version"] = JSON_VERSION
+    doc["patterns"] = [{"name": name, "duration": duration, "width": grid.width,
+                        "rows": ["".join("1" if bit else "0" for bit in row) for row in grid.to_rows()]}
+                       for name, grid, duration in patterns]
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=1)
+        f.write("\n")
+
+
+def load_json(path):
+    with open(path) as f:
+        doc = json.load(f)
+    if not isinstance(doc, dict) or doc.get("version") != JSON_VERSION:
+        raise ValueError(f"{path}: not a version {JSON_VERSION} pattern project")
+    patterns = []
+    for i, item in enumerate(doc.pop("patterns", [])):
+        rows = item.get("rows") or []
+        grid = PatternGrid.from_rows(rows)
+        width = item.get("width", grid.width)
+        if width != grid.width:
+            grid = grid.resized(width)
+        patterns.append((item.get("name", f"pattern {i}"), grid, item.get("duration", DEFAULT_DURATION_MS)))
+    doc.pop("version")
+    return patterns, doc
+
+
+def is_json_path(path):
+    return path.lower().endswith(".json")
+
+
+def save(path, patterns, meta=None):
+    if is_json_path(path):
+        save_json(path, patterns, meta)
+    else:
+        save_library(path, patterns, meta)
+
+
+def load(path):
+    # Every pattern of a project as (name, grid, duration), plus its metadata
+    if is_json_path(path):
+        return load_json(path)
+    with PatternLibrary(path) as lib:
+        return list(lib), lib.meta
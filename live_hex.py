@@ -0,0 +1,112 @@
+from bisect import bisect_left, bisect_right
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QTextCursor
+
+from encoders import write_hex
+import pov_core
+
+# Live hex output for the designer. The hex text is generated once; after
+# that every refresh re-encodes only the bytes of the columns the model
+# reports as dirty (OutputFormat.column_spans) and overwrites just those
+# "0xNN," cells in the QTextDocument. Every byte has a fixed-width cell, so
+# patches never move the rest of the text and the position of any byte is
+# arithmetic on its block's start.
+#
+# Anything that changes the shape of the text (another frame, width, format,
+# export mode, durations) schedules one full rebuild instead. Compressed
+# output cannot be patched in place and is rebuilt at most every REBUILD_MS.
+
+REBUILD_MS = 100
+LINE_BYTES = 16
+CELL = len("0xNN,")
+LINE = LINE_BYTES * CELL + 1
+HEX_CELLS = [f"0x{b:02X}," for b in range(256)]
+
+
+class LiveHex(QObject):
+    def __init__(self, designer):
+        super().__init__(designer)
+        self.designer = designer
+        self.document = designer.hex_output.document()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(REBUILD_MS)
+        self.timer.timeout.connect(self.rebuild)
+        self.signals = [designer.format_combo.currentIndexChanged, designer.frames_combo.currentIndexChanged,
+                        designer.compress_check.toggled]
+        for signal in self.signals:
+            signal.connect(self.schedule)
+        self.rebuild()
+
+    def close(self):
+        self.timer.stop()
+        for signal in self.signals:
+            signal.disconnect(self.schedule)
+
+    def schedule(self, *args):
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def rebuild(self):
+        designer = self.designer
+        self.timer.stop()
+        self.grid = None
+        if designer.compress_check.isChecked():
+            designer.generate_hex_code()
+            return
+        self.format = pov_core.get_format(designer.output_format)
+        mode = pov_core.FRAME_MODES[designer.frames_combo.currentIndex()]
+        self.starts = pov_core.frame_starts(designer.grid.width, self.format, mode)
+        if len(designer.timeline) == 1:
+            sections = pov_core.hex_sections(designer.grid, self.format, mode)
+            first = 0
+        else:
+            designer.timeline.store(designer.grid)
+            sections = pov_core.animation_sections(designer.timeline.grids(), self.format, mode)
+            first = designer.timeline.current * (len(self.starts) + 1) + 1
+
+        # Document position of every block of the current frame, and a copy of
+        # its bytes to diff patches against
+        position = 0
+        positions = []
+        for comment, data in sections:
+            if comment is not None:
+                position += len(f"// {comment}\n")
+            positions.append(position)
+            position += len(data) * CELL + -(-len(data) // LINE_BYTES)
+        self.blocks = [(positions[first + i], bytearray(sections[first + i][1])) for i in range(len(self.starts))]
+        designer.hex_output.setPlainText(write_hex(sections))
+        self.grid = designer.grid
+        self.length = self.document.characterCount()
+
+    def columns_changed(self, rects):
+        # `rects` are the dirty rectangles the designer just repainted
+        if (self.timer.isActive() or self.grid is not self.designer.grid
+                or self.document.characterCount() != self.length):
+            self.schedule()
+            return
+        columns = self.format.columns
+        cursor = QTextCursor(self.document)
+        cursor.beginEditBlock()
+        for top, left, bottom, right in rects:
+            # Only frames whose window overlaps the rectangle hold its columns
+            first = bisect_right(self.starts, left - columns)
+            starts = self.starts[first:bisect_left(self.starts, right)]
+            for i, offset, data in self.format.column_spans(self.grid, starts, left, right):
+                position, block = self.blocks[first + i]
+                if block[offset:offset + len(data)] != data:
+                    block[offset:offset + len(data)] = data
+                    self.patch(cursor, position, offset, data)
+        cursor.endEditBlock()
+
+    def patch(self, cursor, position, offset, data):
+        # Overwrite the cells of `data`, one text line at a time
+        base, end = offset, offset + len(data)
+        while offset < end:
+            stop = min(end, (offset // LINE_BYTES + 1) * LINE_BYTES)
+            at = position + offset // LINE_BYTES * LINE + offset % LINE_BYTES * CELL
+            cursor.setPosition(at)
+            cursor.setPosition(at + (stop - offset) * CELL, QTextCursor.KeepAnchor)
+            cursor.insertText("".join(map(HEX_CELLS.__getitem__, data[offset - base:stop - base])))
+            offset = stop
@@ -0,0 +1,268 @@
+import sys
+from array import array
+
+
+def column_typecode(height):
+    # Smallest unsigned array type that holds one column of `height` LEDs
+    for code in "BHILQ":
+        if array(code).itemsize * 8 >= height:
+            return code
+    raise ValueError(f"height {height} does not fit in a packed column")
+
+
+MAX_DIRTY_RECTS = 32
+
+
+def shift_mask(mask, rows):
+    return mask << rows if rows >= 0 else mask >> -rows
+
+
+class PatternGrid:
+    # Column-major bit-packed pattern: bit `row` of column `col` is LED `row`.
+    # With 16 rows the little-endian column array is exactly the firmware
+    # layout (top byte = rows 0-7, bottom byte = rows 8-15).
+
+    def __init__(self, width, height=16):
+        if width < 0 or not 1 <= height <= 64:
+            raise ValueError(f"invalid grid size {width}x{height}")
+        self.width = width
+        self.height = height
+        self.full_mask = (1 << height) - 1
+        self._cols = array(column_typecode(height), [0]) * width
+        self._shared = False
+        self._dirty = []
+
+    @classmethod
+    def from_columns(cls, masks, height=16):
+        masks = list(masks)
+        grid = cls(len(masks), height)
+        grid._cols = array(grid._cols.typecode, (m & grid.full_mask for m in masks))
+        return grid
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = [[v in (True, 1, "1") for v in row] for row in rows]
+        grid = cls(max((len(row) for row in rows), default=0), max(len(rows), 1))
+        for r, row in enumerate(rows):
+            for c, bit in enumerate(row):
+                if bit:
+                    grid._cols[c] |= 1 << r
+        return grid
+
+    @classmethod
+    def from_bytes(cls, data, height=16):
+        # Inverse of to_bytes(): ceil(height / 8) little-endian bytes per column
+        nbytes = (height + 7) // 8
+        grid = cls(len(data) // nbytes, height)
+        data = data[:grid.width * nbytes]
+        if grid._cols.itemsize == nbytes:
+            grid._cols = array(grid._cols.typecode)
+            grid._cols.frombytes(data)
+            if sys.byteorder == "big" and nbytes > 1:
+                grid._cols.byteswap()
+            if height % 8:
+                for col, mask in enumerate(grid._cols):
+                    grid._cols[col] = mask & grid.full_mask
+        else:
+            grid._cols = array(grid._cols.typecode, (
+                int.from_bytes(data[i:i + nbytes], "little") & grid.full_mask
+                for i in range(0, len(data), nbytes)))
+        return grid
+
+    def _own(self):
+        # Copy-on-write: detach from a shared snapshot before the first mutation
+        if self._shared:
+            self._cols = array(self._cols.typecode, self._cols)
+            self._shared = False
+
+    def snapshot(self):
+        snap = PatternGrid.__new__(PatternGrid)
+        snap.width = self.width
+        snap.height = self.height
+        snap.full_mask = self.full_mask
+        snap._cols = self._cols
+        snap._shared = self._shared = True
+        snap._dirty = []
+        return snap
+
+    copy = snapshot
+
+    def __eq__(self, other):
+        if not isinstance(other, PatternGrid):
+            return NotImplemented
+        return self.height == other.height and self._cols == other._cols
+
+    def __repr__(self):
+        return f"PatternGrid({self.width}x{self.height})"
+
+    def mark_dirty(self, top, left, bottom, right):
+        # Dirty rectangles are (top, left, bottom, right) in cells, exclusive
+        # bottom/right. Touching rectangles merge, and past MAX_DIRTY_RECTS
+        # everything collapses into one bounding box.
+        top, left = max(top, 0), max(left, 0)
+        bottom, right = min(bottom, self.height), min(right, self.width)
+        if top >= bottom or left >= right:
+            return
+        if self._dirty:
+            t, l, b, r = self._dirty[-1]
+            if top <= b and left <= r and bottom >= t and right >= l:
+                self._dirty[-1] = (min(t, top), min(l, left), max(b, bottom), max(r, right))
+                return
+            if len(self._dirty) >= MAX_DIRTY_RECTS:
+                rects = self._dirty + [(top, left, bottom, right)]
+                self._dirty = [(min(d[0] for d in rects), min(d[1] for d in rects),
+                                max(d[2] for d in rects), max(d[3] for d in rects))]
+                return
+        self._dirty.append((top, left, bottom, right))
+
+    def mark_all_dirty(self):
+        self._dirty = [(0, 0, self.height, self.width)] if self.width else []
+
+    def take_dirty(self):
+        rects, self._dirty = self._dirty, []
+        return rects
+
+    def _mark_changed(self, col, changed):
+        # `changed` is old ^ new for one column
+        if changed:
+            self.mark_dirty((changed & -changed).bit_length() - 1, col, changed.bit_length(), col + 1)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.height and 0 <= col < self.width
+
+    def get(self, row, col):
+        if not self.in_bounds(row, col):
+            return False
+        return bool(self._cols[col] >> row & 1)
+
+    def set(self, row, col, value):
+        if not self.in_bounds(row, col):
+            return False
+        old = self._cols[col]
+        new = old | (1 << row) if value else old & ~(1 << row)
+        if new == old:
+            return False
+        self._own()
+        self._cols[col] = new
+        self.mark_dirty(row, col, row + 1, col + 1)
+        return True
+
+    @property
+    def columns_itemsize(self):
+        return self._cols.itemsize
+
+    def writable_columns(self):
+        # Buffer over the packed columns for in-place bulk writers (see raster.py);
+        # writers must report what they touched through mark_dirty()
+        self._own()
+        return memoryview(self._cols)
+
+    def get_column(self, col):
+        return self._cols[col] if 0 <= col < self.width else 0
+
+    def set_column(self, col, mask):
+        if 0 <= col < self.width:
+            mask &= self.full_mask
+            if self._cols[col] != mask:
+                self._own()
+                self._mark_changed(col, self._cols[col] ^ mask)
+                self._cols[col] = mask
+
+    def columns(self, start=0, stop=None):
+        return self._cols[start:self.width if stop is None else stop]
+
+    def set_columns(self, start, masks):
+        masks = array(self._cols.typecode, (m & self.full_mask for m in masks))
+        lo, hi = max(start, 0), min(start + len(masks), self.width)
+        if lo < hi:
+            self._own()
+            changed = 0
+            for col in range(lo, hi):
+                changed |= self._cols[col] ^ masks[col - start]
+            self._cols[lo:hi] = masks[lo - start:hi - start]
+            if changed:
+                self.mark_dirty((changed & -changed).bit_length() - 1, lo, changed.bit_length(), hi)
+
+    def blit(self, top, left, masks, height, replace=True):
+        # Stamp packed columns (bit 0 = first row) at (top, left); `replace`
+        # clears the stamp's box first, otherwise the bits are OR-ed in.
+        box = shift_mask((1 << height) - 1, top) & self.full_mask
+        self._own()
+        for i, mask in enumerate(masks):
+            col = left + i
+            if 0 <= col < self.width:
+                bits = shift_mask(mask, top) & box
+                old = self._cols[col]
+                self._cols[col] = (old & ~box | bits) if replace else (old | bits)
+                self._mark_changed(col, old ^ self._cols[col])
+
+    def fill(self, value=True):
+        self._cols = array(self._cols.typecode, [self.full_mask if value else 0]) * self.width
+        self._shared = False
+        self.mark_all_dirty()
+
+    def clear(self):
+        self.fill(False)
+
+    def row(self, row):
+        return [bool(m >> row & 1) for m in self._cols]
+
+    def column(self, col):
+        mask = self.get_column(col)
+        return [bool(mask >> r & 1) for r in range(self.height)]
+
+    def region(self, top, left, height, width):
+        masks = [shift_mask(self.get_column(c), -top) for c in range(left, left + width)]
+        return PatternGrid.from_columns(masks, height)
+
+    def resized(self, width):
+        grid = PatternGrid(width, self.height)
+        grid._cols[:min(width, self.width)] = self._cols[:min(width, self.width)]
+        return grid
+
+    def to_rows(self):
+        return [self.row(r) for r in range(self.height)]
+
+    def is_empty(self):
+        return not any(self._cols)
+
+    def to_bytes(self, max_cols=None):
+        # Each column as ceil(height / 8) little-endian bytes, LSB = top row
+        cols = self._cols[:self.width if max_cols is None else min(max_cols, self.width)]
+        nbytes = (self.height + 7) // 8
+        if cols.itemsize == nbytes:
+            if sys.byteorder == "big" and nbytes > 1:
+                cols = array(cols.typecode, cols)
+                cols.byteswap()
+            return cols.tobytes()
+        return b"".join(m.to_bytes(nbytes, "little") for m in cols)
+
+
+class Overlay:
+    # Transient cells composited over a grid at paint time (rubber-band shapes).
+    # Only the span of columns the shape covers is stored.
+
+    def __init__(self, left=0, masks=()):
+        self.left = left
+        self.masks = list(masks)
+
+    def get_column(self, col):
+        i = col - self.left
+        return self.masks[i] if 0 <= i < len(self.masks) else 0
+
+    def bounds(self):
+        rows = 0
+        for mask in self.masks:
+            rows |= mask
+        if not rows:
+            return None
+        return ((rows & -rows).bit_length() - 1, self.left,
+                rows.bit_length(), self.left + len(self.masks))
+
+
+def union_bounds(*rects):
+    rects = [rect for rect in rects if rect is not None]
+    if not rects:
+        return None
+    return (min(r[0] for r in rects), min(r[1] for r in rects),
+            max(r[2] for r in rects), max(r[3] for r in rects))
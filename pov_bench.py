@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+import numpy as np
+
+import codec
+from pattern_grid import PatternGrid
+import pov_core
+import raster
+
+# Benchmark suite. Each benchmark is a setup function that returns the
+# callable to time; Qt benchmarks render offscreen. Results are written as
+# JSON and can be compared against a saved baseline.
+#
+#   python pov_bench.py -o baseline.json
+#   python pov_bench.py --compare baseline.json
+
+WIDTHS = (1, 8, 16, 32, 64)
+LONG_WIDTHS = (256, 1024, 4096)
+DEFAULT_THRESHOLD = 0.10
+
+BENCHMARKS = {}
+
+
+def benchmark(name, qt=False):
+    def register(setup):
+        BENCHMARKS[name] = (setup, qt)
+        return setup
+    return register
+
+
+def _heart_grid(width):
+    grid = PatternGrid(width)
+    pov_core.draw_heart(grid)
+    return grid
+
+
+for _width in WIDTHS + LONG_WIDTHS:
+    @benchmark(f"raster.draw_line[w={_width}]")
+    def _draw_line(width=_width):
+        grid = PatternGrid(width)
+        return lambda: raster.draw_line(grid, 0, 0, 15, width - 1)
+
+    @benchmark(f"raster.draw_circle[w={_width}]")
+    def _draw_circle(width=_width):
+        grid = PatternGrid(width)
+        return lambda: raster.draw_circle(grid, 8, width // 2, 1, width // 2)
+
+    @benchmark(f"raster.fill_circle[w={_width}]")
+    def _fill_circle(width=_width):
+        grid = PatternGrid(width)
+        return lambda: raster.fill_circle(grid, 8, width // 2, 7)
+
+    @benchmark(f"pov_core.generate_hex_code[w={_width}]")
+    def _generate_hex_code(width=_width):
+        grid = _heart_grid(width)
+        return lambda: pov_core.generate_hex_code(grid)
+
+for _name in pov_core.PRESETS:
+    @benchmark(f"pov_core.draw_{_name}")
+    def _draw_preset(name=_name):
+        grid = PatternGrid(64)
+        return lambda: pov_core.PRESETS[name](grid)
+
+
+@benchmark("pov_core.frame_blocks[marquee,w=1024]")
+def _marquee():
+    grid = PatternGrid(1024)
+    pov_core.render_text(grid, "THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG " * 3)
+    return lambda: sum(1 for _ in pov_core.frame_blocks(grid, "heart", "marquee", 4))
+
+
+@benchmark("pov_core.render_text")
+def _render_text():
+    grid = PatternGrid(64)
+    return lambda: pov_core.render_text(grid, "ALICE")
+
+
+@benchmark("codec.round_trip[alphabet marquee]")
+def _codec():
+    grid = PatternGrid(156)
+    pov_core.render_text(grid, "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+    blocks = list(pov_core.frame_blocks(grid, "heart", "marquee", 2))
+    return lambda: codec.decode_stream(codec.encode_stream(blocks))
+
+
+# Qt benchmarks share one designer window per canvas width
+
+_app = None
+_designers = {}
+
+
+def _designer(width):
+    global _app
+    if _app is None:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        _app = QApplication.instance() or QApplication(sys.argv[:1])
+    if width not in _designers:
+        import POV_Pattern
+        designer = POV_Pattern.POVWandDesigner()
+        designer.resize(1400, 900)
+        designer.show()
+        designer.long_canvas_check.setChecked(width > 64)
+        designer.width_spin.setValue(width)
+        designer.draw_heart()
+        _app.processEvents()
+        _designers[width] = designer
+    return _designers[width]
+
+
+for _width in WIDTHS + LONG_WIDTHS:
+    @benchmark(f"designer.draw_line[w={_width}]", qt=True)
+    def _designer_line(width=_width):
+        designer = _designer(width)
+        return lambda: designer.draw_line(designer.grid, 0, 0, 15, width - 1, True)
+
+    @benchmark(f"designer.draw_circle[w={_width}]", qt=True)
+    def _designer_circle(width=_width):
+        designer = _designer(width)
+        return lambda: designer.draw_circle(designer.grid, 8, width // 2, 1, width // 2, True)
+
+    @benchmark(f"designer.fill_circle[w={_width}]", qt=True)
+    def _designer_fill(width=_width):
+        designer = _designer(width)
+        return lambda: designer.fill_circle(designer.grid, 8, width // 2, 7, True)
+
+    @benchmark(f"GridWidget.draw_letter[w={_width}]", qt=True)
+    def _draw_letter(width=_width):
+        designer = _designer(width)
+        return lambda: designer.grid_widget.draw_letter("A", 3, max(width // 2 - 2, 0))
+
+    @benchmark(f"GridWidget.paintEvent[full,w={_width}]", qt=True)
+    def _grid_paint(width=_width):
+        widget = _designer(width).grid_widget
+        return widget.grab
+
+    @benchmark(f"GridWidget.paintEvent[cell,w={_width}]", qt=True)
+    def _grid_paint_cell(width=_width):
+        widget = _designer(width).grid_widget
+        rect = widget.cell_rect(4, widget.scroll_col, 5, widget.scroll_col + 1)
+        return lambda: widget.grab(rect)
+
+    @benchmark(f"PreviewWidget.paintEvent[w={_width}]", qt=True)
+    def _preview_paint(width=_width):
+        designer = _designer(width)
+        widget = designer.preview_widget
+
+        def run():
+            widget.invalidate_columns([(0, 0, designer.grid.height, designer.grid.width)])
+            widget.grab()
+        return run
+
+
+def measure(fn, repeat=5, min_time=0.05):
+    # Per-call seconds over `repeat` runs, each looping until it lasts `min_time`
+    timer = timeit.Timer(fn)
+    loops = 1
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.1))
+    times = [elapsed / loops] + [t / loops for t in timer.repeat(repeat - 1, loops)]
+    return {"median": statistics.median(times), "min": min(times), "loops": loops, "repeat": repeat}
+
+
+def run(names, repeat=5, min_time=0.05, progress=None):
+    results = {}
+    for name in names:
+        setup, qt = BENCHMARKS[name]
+        results[name] = measure(setup(), repeat, min_time)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    # (name, baseline median, current median, ratio, verdict) for benchmarks in both
+    rows = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["median"], result["median"]
+        ratio = after / before if before else float("inf")
+        if ratio > 1 + threshold:
+            verdict = "slower"
+        elif ratio < 1 / (1 + threshold):
+            verdict = "faster"
+        else:
+            verdict = ""
+        rows.append((name, before, after, ratio, verdict))
+    return rows
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-bench",
+        description="Benchmark the rasterizers, encoders and offscreen painting.")
+    parser.add_argument("-k", "--filter", action="append", default=[],
+                        help="only run benchmarks whose name contains this text (repeatable)")
+    parser.add_argument("--no-qt", action="store_true", help="skip the Qt benchmarks")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="timed runs per benchmark (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="minimum seconds per timed run (default: 0.05)")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare against a saved JSON result and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"relative slowdown counted as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    names = [name for name, (setup, qt) in BENCHMARKS.items()
+             if not (qt and args.no_qt) and (not args.filter or any(f in name for f in args.filter))]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    def progress(name, result):
+        print(f"{name:48s} {format_time(result['median']):>10s}", file=sys.stderr)
+
+    results = run(names, args.repeat, args.min_time, progress)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=1)
+            f.write("\n")
+
+    if baseline is None:
+        return 0
+    rows = compare(baseline, results, args.threshold)
+    for name, before, after, ratio, verdict in rows:
+        print(f"{name:48s} {format_time(before):>10s} {format_time(after):>10s} {ratio:6.2f}x  {verdict}")
+    regressions = [row for row in rows if row[4] == "slower"]
+    print(f"pov-bench: {len(rows)} compared, {len(regressions)} slower, "
+          f"{sum(row[4] == 'faster' for row in rows)} faster", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
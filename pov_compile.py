@@ -0,0 +1,187 @@
+import argparse
+import os
+import sys
+from collections import deque
+
+from pattern_grid import PatternGrid
+import codec
+import encoders
+import pov_core
+from text_layout import ALIGNMENTS, VERTICAL_ALIGNMENTS, TextLayout
+
+
+def build_pattern(spec, width=64, layout=None, height=16):
+    # "text:NAME", "preset:heart", "file:path" or a bare value: existing files
+    # and preset names win, anything else is rendered as text
+    kind, sep, value = spec.partition(":")
+    if not sep or kind not in ("text", "preset", "file"):
+        value = spec
+        if os.path.isfile(spec):
+            kind = "file"
+        elif spec.lower() in pov_core.PRESETS:
+            kind = "preset"
+        else:
+            kind = "text"
+
+    if kind == "file":
+        return pov_core.load_pattern_file(value)
+    grid = PatternGrid(width, height)
+    if kind == "preset":
+        if value.lower() not in pov_core.PRESETS:
+            raise ValueError(f"unknown preset {value!r} (choose from {', '.join(pov_core.PRESETS)})")
+        pov_core.PRESETS[value.lower()](grid)
+    else:
+        pov_core.render_text(grid, value, layout)
+    return grid
+
+
+def compile_spec(spec, width=64, output_format="heart", layout=None, frames="single", step=1):
+    # Returns (blocks, error); long canvases compile to one block per frame
+    try:
+        grid = build_pattern(spec, width, layout, pov_core.get_format(output_format).leds)
+        return list(pov_core.frame_blocks(grid, output_format, frames, step)), None
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+
+def _compile_job(job):
+    return (job[0],) + compile_spec(*job)
+
+
+def imap_ordered(executor, fn, items, window):
+    # Like executor.map, but keeps at most `window` jobs in flight so an
+    # unbounded input stream is never materialised
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def read_specs(inputs, input_files):
+    yield from inputs
+    for path in input_files:
+        f = sys.stdin if path == "-" else open(path)
+        try:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-compile",
+        description="Compile text, presets and pattern files to POV wand hex blocks.")
+    parser.add_argument("inputs", nargs="*",
+                        help="text:STRING, preset:NAME, file:PATH, or a bare string/preset/path")
+    parser.add_argument("-i", "--inputs-from", action="append", default=[], metavar="FILE",
+                        help="read one input per line from FILE ('-' for stdin)")
+    parser.add_argument("-f", "--format", choices=sorted(pov_core.FORMATS), default="heart",
+                        help="output layout (default: heart)")
+    parser.add_argument("-w", "--width", type=int, default=64,
+                        help=f"design width for text and presets, up to {pov_core.MAX_CANVAS_WIDTH} (default: 64)")
+    parser.add_argument("--frames", choices=pov_core.FRAME_MODES, default="single",
+                        help="export the first frame only, consecutive frames, "
+                             "or a marquee scrolling across the canvas (default: single)")
+    parser.add_argument("--step", type=int, default=1,
+                        help="columns between marquee frames (default: 1)")
+    parser.add_argument("--align", choices=ALIGNMENTS, default="center",
+                        help="horizontal text alignment (default: center)")
+    parser.add_argument("--valign", choices=VERTICAL_ALIGNMENTS, default="middle",
+                        help="vertical text placement (default: middle)")
+    parser.add_argument("--spacing", type=int, default=1,
+                        help="blank columns between letters (default: 1)")
+    parser.add_argument("--kerning", action="store_true", help="tighten letter pairs that fit together")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("-t", "--output-type", choices=sorted(encoders.WRITERS), default="hex",
+                        help="hex text, one C array, one Python bytes literal or raw blocks (default: hex)")
+    parser.add_argument("--binary", action="store_true", help="same as --output-type binary")
+    parser.add_argument("--symbol", default="pov_patterns", help="array name for c and python output")
+    parser.add_argument("--compress", action="store_true",
+                        help="write every block into one RLE/delta compressed stream "
+                             "and report the size on stderr")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="compile with N worker processes (0 = one per CPU)")
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.width <= pov_core.MAX_CANVAS_WIDTH:
+        parser.error(f"--width must be between 1 and {pov_core.MAX_CANVAS_WIDTH}")
+    if args.step < 1:
+        parser.error("--step must be at least 1")
+    if args.binary:
+        args.output_type = "binary"
+    binary = args.output_type == "binary"
+    write = encoders.WRITERS[args.output_type]
+    specs = read_specs(args.inputs, args.inputs_from)
+    layout = TextLayout(spacing=args.spacing, kerning="auto" if args.kerning else None,
+                        align=args.align, valign=args.valign)
+    jobs = ((spec, args.width, args.format, layout, args.frames, args.step) for spec in specs)
+
+    if args.output == "-":
+        out = sys.stdout.buffer if binary else sys.stdout
+    else:
+        try:
+            out = open(args.output, "wb" if binary else "w")
+        except OSError as e:
+            print(f"pov-compile: {e}", file=sys.stderr)
+            return 1
+
+    # Hex text and binary are written spec by spec; a C or Python array is
+    # written once, after the last spec
+    streaming = args.output_type in ("hex", "binary")
+    failures = 0
+    compressed = []
+    sections = []
+    executor = None
+    try:
+        if args.jobs == 1:
+            results = map(_compile_job, jobs)
+        else:
+            # Imported here: the process pool machinery is slow to import and
+            # most callers of this module never need it
+            from concurrent.futures import ProcessPoolExecutor
+            workers = args.jobs or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(workers)
+            results = imap_ordered(executor, _compile_job, jobs, workers * 8)
+        for spec, blocks, error in results:
+            if error is not None:
+                failures += 1
+                print(f"pov-compile: {spec}: {error}", file=sys.stderr)
+                continue
+            if args.compress:
+                compressed += blocks
+                continue
+            spec_sections = [(spec if len(blocks) == 1 else f"{spec} frame {i}", data)
+                             for i, data in enumerate(blocks)]
+            if streaming:
+                out.write(write(spec_sections))
+            else:
+                sections += spec_sections
+        if args.compress and compressed:
+            stream = codec.format_stream(compressed, args.format)
+            sections = [(None, stream)]
+            report = codec.compression_report(
+                len(compressed), len(compressed) * pov_core.get_format(args.format).block_size, len(stream))
+            print(f"pov-compile: {report}", file=sys.stderr)
+        if sections:
+            out.write(write(sections, args.symbol))
+    except OSError as e:
+        # An unreadable --inputs-from file or a failed write
+        failures += 1
+        print(f"pov-compile: {e}", file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if out not in (sys.stdout, sys.stdout.buffer):
+            out.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+from encoders import FORMATS, get_format, hex_rows, write_hex
+from glyphs import stamp_glyph
+from pattern_grid import PatternGrid
+import raster
+import text_layout
+
+# Pattern and firmware-encoding core shared by the designer window and the
+# headless tools. Nothing in here may import PyQt5.
+
+# Output formats live in encoders.FORMATS; BLOCK_SIZE is the heart/hanzi block,
+# the default for raw block files
+BLOCK_SIZE = 128
+
+# Long canvases are exported frame by frame: "single" keeps the first frame
+# only, "split" cuts consecutive frames, "marquee" slides a window across
+MAX_CANVAS_WIDTH = 4096
+FRAME_MODES = ("single", "split", "marquee")
+
+HEART_PATTERN = raster.decode_pattern([
+    "0000011000110000",
+    "0001111111111000",
+    "0011111111111100",
+    "0111111111111110",
+    "0111111111111110",
+    "0111111111111110",
+    "0011111111111100",
+    "0001111111111000",
+    "0000111111110000",
+    "0000011111100000",
+    "0000001111000000",
+    "0000000110000000",
+])
+
+HI_PATTERN = raster.decode_points([
+    # Top half
+    # H left vertical line
+    (2, 1), (2, 2), (2, 3), (2, 4), (2, 5), (2, 6), (2, 7),
+    # H horizontal bar (on row 6)
+    (3, 6), (4, 6), (5, 6),
+    # H right vertical line
+    (6, 1), (6, 2), (6, 3), (6, 4), (6, 5), (6, 6), (6, 7),
+    # I top bar
+    (9, 1), (10, 1), (11, 1), (12, 1), (13, 1),
+    # I vertical bar
+    (11, 2), (11, 3), (11, 4), (11, 5), (11, 6), (11, 7),
+    # Bottom half
+    # H left vertical line
+    (2, 8), (2, 9), (2, 10), (2, 11), (2, 12), (2, 13),
+    # H right vertical line
+    (6, 8), (6, 9), (6, 10), (6, 11), (6, 12), (6, 13),
+    # I vertical bar
+    (11, 8), (11, 9), (11, 10), (11, 11), (11, 12),
+    # I bottom bar
+    (9, 13), (10, 13), (11, 13), (12, 13), (13, 13)
+], 14, 14)
+
+
+
+def draw_heart(grid):
+    h_offset = (grid.width - HEART_PATTERN.shape[1]) // 2
+    v_offset = 2
+    raster.stamp(grid, HEART_PATTERN, v_offset, h_offset)
+
+
+def draw_hi(grid):
+    pattern_width = 13
+    offset = (grid.width - pattern_width) // 2
+    raster.stamp(grid, HI_PATTERN, 0, offset, replace=False)
+
+
+def draw_smiley(grid):
+    center_col = grid.width // 2
+    center_row = grid.height // 2
+    radius = min(grid.width // 4, 7)
+
+    raster.fill_circle(grid, center_row, center_col, radius, True)
+
+    eye_radius = radius // 4
+    raster.fill_circle(grid, center_row - radius // 2, center_col - radius // 2, eye_radius, False)
+    raster.fill_circle(grid, center_row - radius // 2, center_col + radius // 2, eye_radius, False)
+
+    mouth_radius = radius // 2
+    mouth_row = center_row + radius // 2
+    raster.draw_line(grid, mouth_row, center_col - mouth_radius,
+                     mouth_row, center_col + mouth_radius, False)
+    raster.apply_points(grid, [mouth_row - 1] * 2,
+                        [center_col - mouth_radius - 1, center_col + mouth_radius + 1], False)
+
+    raster.draw_circle(grid, center_row, center_col, center_row + radius, center_col, True)
+
+
+PRESETS = {"heart": draw_heart, "hi": draw_hi, "smiley": draw_smiley}
+
+
+def draw_letter(grid, letter, start_row, start_col):
+    stamp_glyph(grid, letter, start_row, start_col)
+
+
+def render_text(grid, text, layout=None):
+    return text_layout.render_text(grid, text, layout)
+
+
+def encode(grid, output_format="heart"):
+    # One firmware block in the format's layout (see encoders.FORMAT_SPECS)
+    return get_format(output_format).encode(grid)
+
+
+def frame_starts(width, output_format="heart", mode="single", step=1):
+    # First canvas column of each exported frame (negative: starts off the left edge)
+    columns = get_format(output_format).columns
+    if mode == "single":
+        return range(1)
+    if mode == "split":
+        return range(0, max(width, 1), columns)
+    if mode == "marquee":
+        return range(step - columns, width, step)
+    raise ValueError(f"unknown frame mode {mode!r}")
+
+
+def frame_blocks(grid, output_format="heart", mode="single", step=1):
+    fmt = get_format(output_format)
+    starts = frame_starts(grid.width, fmt, mode, step)
+    if mode == "single":
+        yield fmt.encode(grid)
+        return
+    yield from fmt.frames(grid, starts)
+
+
+def format_hex(data):
+    return hex_rows(data)
+
+
+def hex_sections(grid, output_format="heart", mode="single", step=1):
+    # (comment, block) pairs in the generate_hex_code layout
+    if mode == "single":
+        return [(None, encode(grid, output_format))]
+    return [(f"Frame {i}", block) for i, block in enumerate(frame_blocks(grid, output_format, mode, step))]
+
+
+def generate_hex_code(grid, output_format="heart", mode="single", step=1):
+    return write_hex(hex_sections(grid, output_format, mode, step))
+
+
+def animation_sections(frames, output_format="heart", mode="single", step=1):
+    # `frames` yields (grid, duration_ms) pairs; every frame uses the
+    # generate_hex_code layout under a header carrying its duration
+    sections = []
+    for i, (grid, duration) in enumerate(frames):
+        sections.append((f"Animation frame {i}: {duration} ms", b""))
+        sections += hex_sections(grid, output_format, mode, step)
+    return sections
+
+
+def generate_animation_hex(frames, output_format="heart", mode="single", step=1):
+    return write_hex(animation_sections(frames, output_format, mode, step))
+
+
+def load_pattern_file(path):
+    # Plain-text pattern: one line per LED row, '1' or '#' for a lit cell
+    with open(path) as f:
+        rows = [line.rstrip("\n") for line in f if line.strip()]
+    return PatternGrid.from_rows([[ch in "1#" for ch in row] for row in rows])
+
+
+def save_pattern_file(grid, path):
+    with open(path, "w") as f:
+        for row in grid.to_rows():
+            f.write("".join("1" if bit else "0" for bit in row) + "\n")
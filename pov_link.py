@@ -0,0 +1,284 @@
+import argparse
+import os
+import re
+import struct
+import sys
+
+import numpy as np
+
+import codec
+import encoders
+import pov_compile
+import pov_core
+from text_layout import TextLayout
+
+# Flash image holding many patterns and animations:
+#
+#   header  magic "POVI", version, flags, entry count, image size, index offset
+#   index   one record per entry, in playlist order: payload offset and length,
+#           frame count, frame duration (ms), flags, columns (rows, for row
+#           layouts) per frame
+#   payload each entry's frames (the format's frame size each) or its
+#           compressed stream, starting on an `align` boundary
+#
+# The image is laid out first and then written into one preallocated buffer.
+
+IMAGE_MAGIC = b"POVI"
+IMAGE_VERSION = 1
+HEADER = struct.Struct("<4sBBHII")
+INDEX_ENTRY = struct.Struct("<IIHHBBH")
+FLAG_COMPRESSED = 0x01
+DEFAULT_DURATION_MS = 100
+
+
+class Entry:
+    __slots__ = ("name", "payload", "frames", "duration", "flags", "columns")
+
+    def __init__(self, name, payload, frames, duration=DEFAULT_DURATION_MS, flags=0, columns=64):
+        self.name = name
+        self.payload = payload
+        self.frames = frames
+        self.duration = duration
+        self.flags = flags
+        self.columns = columns
+
+    @classmethod
+    def from_blocks(cls, name, blocks, output_format="heart", duration=DEFAULT_DURATION_MS,
+                    compress=False):
+        # Firmware blocks are trimmed to the format's frame; the padding up to
+        # its block size is not stored
+        blocks = list(blocks)
+        fmt = pov_core.get_format(output_format)
+        if compress:
+            return cls(name, codec.format_stream(blocks, fmt), len(blocks),
+                       duration, FLAG_COMPRESSED, fmt.units)
+        return cls(name, b"".join(block[:fmt.frame_size] for block in blocks), len(blocks),
+                   duration, 0, fmt.units)
+
+
+def align_up(value, align):
+    return -(-value // align) * align
+
+
+def entry_offsets(entries, align=4):
+    # Payload offsets and the total image size
+    offsets = []
+    end = pos = align_up(HEADER.size + len(entries) * INDEX_ENTRY.size, align)
+    for entry in entries:
+        offsets.append(pos)
+        end = pos + len(entry.payload)
+        pos = align_up(end, align)
+    return offsets, end
+
+
+def link(entries, align=4, budget=None):
+    if align < 1 or align & (align - 1):
+        raise ValueError(f"alignment must be a power of two, not {align}")
+    if len(entries) > 0xFFFF:
+        raise ValueError(f"too many entries ({len(entries)}) for one image")
+    offsets, size = entry_offsets(entries, align)
+    if budget is not None and size > budget:
+        raise ValueError(f"image needs {size} bytes, {size - budget} over the {budget} byte flash budget")
+
+    image = bytearray(size)
+    view = memoryview(image)
+    HEADER.pack_into(image, 0, IMAGE_MAGIC, IMAGE_VERSION, 0, len(entries), size, HEADER.size)
+    for i, (entry, offset) in enumerate(zip(entries, offsets)):
+        if entry.frames > 0xFFFF or entry.duration > 0xFFFF:
+            raise ValueError(f"{entry.name}: frame count or duration out of range")
+        INDEX_ENTRY.pack_into(image, HEADER.size + i * INDEX_ENTRY.size, offset, len(entry.payload),
+                              entry.frames, entry.duration, entry.flags, entry.columns, 0)
+        view[offset:offset + len(entry.payload)] = entry.payload
+    return image
+
+
+def read_index(image):
+    # (offset, length, frames, duration, flags, columns) per entry, as the firmware sees them
+    magic, version, flags, count, size, index = HEADER.unpack_from(image, 0)
+    if magic != IMAGE_MAGIC:
+        raise ValueError("not a POV flash image")
+    if version != IMAGE_VERSION:
+        raise ValueError(f"unsupported image version {version}")
+    if size != len(image):
+        raise ValueError(f"image is {len(image)} bytes, header says {size}")
+    return [INDEX_ENTRY.unpack_from(image, index + i * INDEX_ENTRY.size)[:6] for i in range(count)]
+
+
+def is_image(data):
+    # Whether `data` is a whole image with a consistent header and index. Raw
+    # pattern blocks can begin with "POVI" too, so the magic alone decides nothing.
+    if len(data) < HEADER.size:
+        return False
+    magic, version, flags, count, size, index = HEADER.unpack_from(data, 0)
+    if magic != IMAGE_MAGIC or version != IMAGE_VERSION or size != len(data):
+        return False
+    if index < HEADER.size or index + count * INDEX_ENTRY.size > size:
+        return False
+    for i in range(count):
+        offset, length = INDEX_ENTRY.unpack_from(data, index + i * INDEX_ENTRY.size)[:2]
+        if offset < index + count * INDEX_ENTRY.size or offset + length > size:
+            return False
+    return True
+
+
+def c_identifier(name, used):
+    ident = re.sub(r"[^A-Z0-9]+", "_", name.upper()).strip("_") or "PATTERN"
+    if ident[0].isdigit():
+        ident = "_" + ident
+    base, n = ident, 2
+    while ident in used:
+        ident = f"{base}_{n}"
+        n += 1
+    used.add(ident)
+    return ident
+
+
+def to_c_header(image, entries, symbol="pov_image"):
+    guard = f"{symbol.upper()}_H"
+    used = set()
+    lines = [f"// POV flash image: {len(entries)} entries, {len(image)} bytes",
+             f"#ifndef {guard}", f"#define {guard}", "", "#include <stdint.h>",
+             "#ifndef PROGMEM", "#define PROGMEM", "#endif", "",
+             f"#define {symbol.upper()}_ENTRIES {len(entries)}"]
+    lines += [f"#define POV_PATTERN_{c_identifier(entry.name, used)} {i}" for i, entry in enumerate(entries)]
+    lines += ["", f"const uint8_t {symbol}[{len(image)}] PROGMEM = {{"]
+    return "\n".join(lines) + "\n" + encoders.hex_rows(image) + "};\n\n#endif\n"
+
+
+def _hex_records(records):
+    # ":<hex>\n" for each row of a (records, bytes) array that ends in a zero checksum slot
+    records[:, -1] = -records[:, :-1].sum(axis=1, dtype=np.uint32) & 0xFF
+    text = np.frombuffer(records.tobytes().hex().upper().encode(), dtype=np.uint8)
+    lines = np.empty((len(records), records.shape[1] * 2 + 2), dtype=np.uint8)
+    lines[:, 0] = ord(":")
+    lines[:, 1:-1] = text.reshape(len(records), -1)
+    lines[:, -1] = ord("\n")
+    return lines.tobytes().decode("ascii")
+
+
+def _hex_record(kind, address, data):
+    record = np.zeros((1, len(data) + 5), dtype=np.uint8)
+    record[0, :4] = len(data), address >> 8 & 0xFF, address & 0xFF, kind
+    record[0, 4:-1] = list(data)
+    return _hex_records(record)
+
+
+def to_intel_hex(image, base=0):
+    # 16-byte data records, with an extended linear address record at the
+    # start of every 64 KiB segment; each segment is formatted in one pass
+    out = []
+    data = np.frombuffer(image, dtype=np.uint8)
+    pos = 0
+    while pos < len(data):
+        address = base + pos
+        out.append(_hex_record(4, 0, (address >> 16).to_bytes(2, "big")))
+        end = min(len(data), pos + 0x10000 - (address & 0xFFFF))
+        full = pos + (end - pos) // 16 * 16
+        if full > pos:
+            offsets = np.arange(address, address + full - pos, 16, dtype=np.uint32)
+            records = np.zeros((len(offsets), 21), dtype=np.uint8)
+            records[:, 0] = 16
+            records[:, 1] = offsets >> 8 & 0xFF
+            records[:, 2] = offsets & 0xFF
+            records[:, 4:20] = data[pos:full].reshape(-1, 16)
+            out.append(_hex_records(records))
+        if full < end:
+            out.append(_hex_record(0, base + full, data[full:end]))
+        pos = end
+    out.append(":00000001FF\n")
+    return "".join(out)
+
+
+def parse_size(text):
+    match = re.fullmatch(r"(\d+)([kKmM]?)", text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}")
+    return int(match[1]) * {"": 1, "k": 1024, "m": 1024 * 1024}[match[2].lower()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-link",
+        description="Link many patterns and animations into one POV wand flash image.")
+    parser.add_argument("inputs", nargs="*",
+                        help="text:STRING, preset:NAME, file:PATH, or a bare string/preset/path")
+    parser.add_argument("-i", "--inputs-from", action="append", default=[], metavar="FILE",
+                        help="read one input per line from FILE ('-' for stdin)")
+    parser.add_argument("-o", "--output", required=True,
+                        help="image file; .h writes a C header, .hex Intel HEX, anything else raw binary")
+    parser.add_argument("-f", "--format", choices=sorted(pov_core.FORMATS), default="heart",
+                        help="frame layout (default: heart)")
+    parser.add_argument("-w", "--width", type=int, default=64,
+                        help=f"design width for text and presets, up to {pov_core.MAX_CANVAS_WIDTH} (default: 64)")
+    parser.add_argument("--frames", choices=pov_core.FRAME_MODES, default="single",
+                        help="frames per entry: first frame, consecutive frames or a marquee (default: single)")
+    parser.add_argument("--step", type=int, default=1, help="columns between marquee frames (default: 1)")
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION_MS,
+                        help=f"frame duration in ms (default: {DEFAULT_DURATION_MS})")
+    parser.add_argument("--compress", action="store_true", help="store entries as compressed streams")
+    parser.add_argument("--align", type=int, default=4, help="payload alignment in bytes (default: 4)")
+    parser.add_argument("--budget", type=parse_size,
+                        help="fail if the image is larger than this many bytes (e.g. 28k)")
+    parser.add_argument("--base", type=lambda v: int(v, 0), default=0,
+                        help="load address for Intel HEX output (default: 0)")
+    parser.add_argument("--symbol", default="pov_image", help="array name for C header output")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="compile with N worker processes (0 = one per CPU)")
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.width <= pov_core.MAX_CANVAS_WIDTH:
+        parser.error(f"--width must be between 1 and {pov_core.MAX_CANVAS_WIDTH}")
+    if args.step < 1:
+        parser.error("--step must be at least 1")
+    if not 1 <= args.duration <= 0xFFFF:
+        parser.error("--duration must be between 1 and 65535")
+    layout = TextLayout()
+    jobs = ((spec, args.width, args.format, layout, args.frames, args.step)
+            for spec in pov_compile.read_specs(args.inputs, args.inputs_from))
+
+    entries = []
+    failures = 0
+    executor = None
+    try:
+        if args.jobs == 1:
+            results = map(pov_compile._compile_job, jobs)
+        else:
+            # Deferred so that importing pov_link (hex_import does) stays cheap
+            from concurrent.futures import ProcessPoolExecutor
+            workers = args.jobs or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(workers)
+            results = pov_compile.imap_ordered(executor, pov_compile._compile_job, jobs, workers * 8)
+        for spec, blocks, error in results:
+            if error is not None:
+                failures += 1
+                print(f"pov-link: {spec}: {error}", file=sys.stderr)
+            else:
+                entries.append(Entry.from_blocks(spec, blocks, args.format, args.duration, args.compress))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    if failures:
+        return 1
+
+    try:
+        image = link(entries, args.align, args.budget)
+    except ValueError as e:
+        print(f"pov-link: {e}", file=sys.stderr)
+        return 1
+
+    ext = os.path.splitext(args.output)[1].lower()
+    if ext == ".h":
+        with open(args.output, "w") as f:
+            f.write(to_c_header(image, entries, args.symbol))
+    elif ext in (".hex", ".ihx"):
+        with open(args.output, "w") as f:
+            f.write(to_intel_hex(image, args.base))
+    else:
+        with open(args.output, "wb") as f:
+            f.write(image)
+    print(f"pov-link: {len(entries)} entries, {len(image)} bytes", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
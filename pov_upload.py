@@ -0,0 +1,438 @@
+import argparse
+import asyncio
+import errno
+import os
+import random
+import struct
+import sys
+import termios
+import time
+import tty
+import zlib
+
+import codec
+import pov_compile
+import pov_core
+
+# Streams encoded patterns to wands over serial ports (POSIX termios, driven
+# by the asyncio event loop, so many ports can be programmed at once).
+#
+# Every packet is
+#
+#   magic 0xA5, kind, sequence (u16), payload length (u16), payload, CRC-32
+#
+# and the upload runs BEGIN (total length, CRC-32 of the image, chunk size),
+# DATA chunk 0..n-1, END. The device answers every packet with ACK or NAK
+# (payload: the kind being answered). Up to `window` DATA chunks are in flight
+# at once; a NAK or a missing ACK resends just that chunk, up to `retries`
+# times. END is only acknowledged once the whole image checks out.
+#
+# WandEmulator is a device on a pseudo-terminal: it speaks the protocol,
+# optionally at a simulated baud rate and with injected line noise, so the
+# upload path can be exercised without hardware.
+
+MAGIC = 0xA5
+HEADER = struct.Struct("<BBHH")
+CRC = struct.Struct("<I")
+BEGIN_PAYLOAD = struct.Struct("<III")
+BEGIN, DATA, END, ACK, NAK = 1, 2, 3, 4, 5
+MAX_PAYLOAD = 4096
+MAX_CHUNKS = 1 << 16
+
+DEFAULT_BAUD = 115200
+DEFAULT_CHUNK = 256
+DEFAULT_WINDOW = 8
+DEFAULT_RETRIES = 5
+DEFAULT_TIMEOUT = 0.5
+
+
+class UploadError(Exception):
+    pass
+
+
+def packet(kind, seq, payload=b""):
+    head = HEADER.pack(MAGIC, kind, seq, len(payload))
+    return head + payload + CRC.pack(zlib.crc32(head + payload))
+
+
+def parse_packets(buffer):
+    # Pops complete packets off the front of `buffer` as (kind, seq, payload);
+    # a packet whose CRC fails comes out with kind None so it can be NAKed
+    while True:
+        start = buffer.find(bytes([MAGIC]))
+        if start < 0:
+            buffer.clear()
+            return
+        del buffer[:start]
+        if len(buffer) < HEADER.size:
+            return
+        _, kind, seq, length = HEADER.unpack_from(buffer)
+        if length > MAX_PAYLOAD:
+            del buffer[:1]
+            continue
+        end = HEADER.size + length + CRC.size
+        if len(buffer) < end:
+            return
+        body = bytes(buffer[:end - CRC.size])
+        if CRC.unpack_from(buffer, end - CRC.size)[0] != zlib.crc32(body):
+            del buffer[:1]
+            yield None, seq, b""
+            continue
+        del buffer[:end]
+        yield kind, seq, body[HEADER.size:]
+
+
+def configure_port(fd, baud):
+    # Raw 8N1 at `baud`; pseudo-terminals accept and ignore the speed
+    tty.setraw(fd)
+    attrs = termios.tcgetattr(fd)
+    speed = getattr(termios, f"B{baud}", None)
+    if speed is None:
+        raise ValueError(f"unsupported baud rate {baud}")
+    attrs[4] = attrs[5] = speed
+    attrs[2] = (attrs[2] & ~(termios.PARENB | termios.CSTOPB | termios.CSIZE)) | termios.CS8 | termios.CLOCAL | termios.CREAD
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+
+class SerialLink:
+    # Non-blocking packet I/O on a file descriptor through the running loop
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.loop = asyncio.get_running_loop()
+        self.buffer = bytearray()
+        self.packets = []
+        self.arrived = asyncio.Event()
+        self.closed = False
+        self.loop.add_reader(fd, self._readable)
+
+    @classmethod
+    def open(cls, path, baud=DEFAULT_BAUD):
+        fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            configure_port(fd, baud)
+        except (OSError, termios.error, ValueError):
+            os.close(fd)
+            raise
+        return cls(fd)
+
+    def _readable(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno != errno.EIO:
+                raise
+            data = b""
+        if not data:
+            # The other end went away (EIO is how a pty reports it)
+            self.closed = True
+            self.loop.remove_reader(self.fd)
+        self.received(data)
+        self.arrived.set()
+
+    def received(self, data):
+        self.buffer += data
+        self.packets.extend(parse_packets(self.buffer))
+
+    async def read_packet(self, timeout=None):
+        # Next (kind, seq, payload), or None on timeout
+        while not self.packets:
+            if self.closed:
+                raise UploadError("device disconnected")
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.packets.pop(0)
+
+    async def write(self, data):
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self.fd, view):]
+            except BlockingIOError:
+                writable = self.loop.create_future()
+                self.loop.add_writer(self.fd, writable.set_result, None)
+                try:
+                    await writable
+                finally:
+                    self.loop.remove_writer(self.fd)
+
+    def close(self):
+        if not self.closed:
+            self.loop.remove_reader(self.fd)
+        self.closed = True
+        os.close(self.fd)
+
+
+class UploadResult:
+    def __init__(self, port, size, seconds, resent):
+        self.port = port
+        self.size = size
+        self.seconds = seconds
+        self.resent = resent
+
+    def summary(self):
+        rate = self.size / self.seconds / 1024 if self.seconds else 0.0
+        return (f"{self.port}: {self.size} bytes in {self.seconds:.2f} s ({rate:.1f} KiB/s), "
+                f"{self.resent} chunks resent")
+
+
+async def _exchange(link, kind, seq, payload, retries, timeout):
+    # Send one control packet and wait for its ACK
+    for attempt in range(retries + 1):
+        await link.write(packet(kind, seq, payload))
+        deadline = time.monotonic() + timeout
+        while (left := deadline - time.monotonic()) > 0:
+            reply = await link.read_packet(left)
+            if reply is None:
+                break
+            reply_kind, reply_seq, reply_payload = reply
+            if reply_payload[:1] == bytes([kind]) and reply_seq == seq:
+                if reply_kind == ACK:
+                    return
+                if reply_kind == NAK:
+                    break
+    raise UploadError(f"no acknowledgement for {('BEGIN', 'DATA', 'END')[kind - 1]}")
+
+
+async def send_image(link, data, chunk_size=DEFAULT_CHUNK, window=DEFAULT_WINDOW,
+                     retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT, progress=None):
+    # Returns the number of chunks that had to be resent
+    if not 0 < chunk_size <= MAX_PAYLOAD:
+        raise ValueError(f"chunk size must be between 1 and {MAX_PAYLOAD}")
+    count = -(-len(data) // chunk_size)
+    if count > MAX_CHUNKS:
+        raise ValueError(f"image too large for {chunk_size}-byte chunks")
+    view = memoryview(data)
+    await _exchange(link, BEGIN, 0, BEGIN_PAYLOAD.pack(len(data), zlib.crc32(data), chunk_size),
+                    retries, timeout)
+
+    deadlines = {}
+    attempts = [0] * count
+    next_seq = done = resent = 0
+
+    async def send(seq):
+        if attempts[seq] > retries:
+            raise UploadError(f"chunk {seq} failed {retries + 1} times")
+        attempts[seq] += 1
+        await link.write(packet(DATA, seq, view[seq * chunk_size:(seq + 1) * chunk_size]))
+        deadlines[seq] = time.monotonic() + timeout
+
+    while done < count:
+        while next_seq < count and len(deadlines) < window:
+            await send(next_seq)
+            next_seq += 1
+        reply = await link.read_packet(max(min(deadlines.values()) - time.monotonic(), 0))
+        if reply is None:
+            now = time.monotonic()
+            for seq in [seq for seq, deadline in deadlines.items() if deadline <= now]:
+                resent += 1
+                await send(seq)
+            continue
+        kind, seq, payload = reply
+        if payload[:1] != bytes([DATA]) or seq not in deadlines:
+            continue
+        if kind == ACK:
+            del deadlines[seq]
+            done += 1
+            if progress:
+                progress(done, count)
+        elif kind == NAK:
+            resent += 1
+            await send(seq)
+
+    await _exchange(link, END, 0, b"", retries, timeout)
+    return resent
+
+
+async def upload(port, data, baud=DEFAULT_BAUD, **options):
+    started = time.monotonic()
+    link = SerialLink.open(port, baud)
+    try:
+        resent = await send_image(link, data, **options)
+    except UploadError as e:
+        raise UploadError(f"{port}: {e}") from None
+    finally:
+        link.close()
+    return UploadResult(port, len(data), time.monotonic() - started, resent)
+
+
+async def upload_many(ports, data, baud=DEFAULT_BAUD, **options):
+    # One UploadResult or exception per port, all ports running concurrently
+    return await asyncio.gather(*(upload(port, data, baud, **options) for port in ports),
+                                return_exceptions=True)
+
+
+class WandEmulator:
+    # A wand on the far side of a pseudo-terminal. `port` is the path to open;
+    # `image` holds the last image that passed its END check.
+
+    def __init__(self, baud=None, error_rate=0.0, drop_rate=0.0, seed=None):
+        self.baud = baud
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.image = None
+        self.corrupted = self.dropped = 0
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.link = None
+        self.task = None
+
+    async def start(self):
+        os.set_blocking(self.master, False)
+        self.link = SerialLink(self.master)
+        if self.error_rate:
+            # Line noise: flip one bit in a fraction of incoming reads
+            receive = self.link.received
+
+            def noisy(data):
+                if data and self.random.random() < self.error_rate:
+                    data = bytearray(data)
+                    data[self.random.randrange(len(data))] ^= 1 << self.random.randrange(8)
+                    self.corrupted += 1
+                receive(bytes(data))
+            self.link.received = noisy
+        self.task = asyncio.ensure_future(self.serve())
+        return self
+
+    async def reply(self, kind, seq, answered):
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            self.dropped += 1
+            return
+        await self.link.write(packet(kind, seq, bytes([answered])))
+
+    async def serve(self):
+        image = received = chunk_size = expected_crc = None
+        while True:
+            try:
+                kind, seq, payload = await self.link.read_packet()
+            except UploadError:
+                return
+            if self.baud:
+                await asyncio.sleep((len(payload) + HEADER.size + CRC.size) * 10 / self.baud)
+            if kind is None:
+                await self.reply(NAK, seq, DATA)
+            elif kind == BEGIN and len(payload) == BEGIN_PAYLOAD.size:
+                size, expected_crc, chunk_size = BEGIN_PAYLOAD.unpack(payload)
+                image, received = bytearray(size), set()
+                await self.reply(ACK, seq, BEGIN)
+            elif kind == DATA and image is not None and seq * chunk_size < len(image):
+                image[seq * chunk_size:seq * chunk_size + len(payload)] = payload
+                received.add(seq)
+                await self.reply(ACK, seq, DATA)
+            elif kind == END and image is not None:
+                complete = len(received) == -(-len(image) // chunk_size) and zlib.crc32(image) == expected_crc
+                if complete:
+                    self.image = bytes(image)
+                await self.reply(ACK if complete else NAK, seq, END)
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.link is not None:
+            self.link.close()
+        os.close(self.slave)
+
+
+def build_payload(specs, width=64, output_format="heart", frames="single", step=1, compress=False):
+    # The bytes generate_hex_code shows for each spec, back to back (or one
+    # compressed stream for all of them)
+    blocks = []
+    for spec in specs:
+        spec_blocks, error = pov_compile.compile_spec(spec, width, output_format, None, frames, step)
+        if error is not None:
+            raise ValueError(f"{spec}: {error}")
+        blocks.extend(spec_blocks)
+    if compress:
+        return codec.format_stream(blocks, output_format)
+    return b"".join(blocks)
+
+
+async def _self_test(count, data, baud, error_rate, drop_rate, options):
+    emulators = [await WandEmulator(baud, error_rate, drop_rate, seed=i).start() for i in range(count)]
+    try:
+        results = await upload_many([e.port for e in emulators], data, **options)
+        for index, emulator in enumerate(emulators):
+            if not isinstance(results[index], Exception) and emulator.image != data:
+                results[index] = UploadError(f"{emulator.port}: image mismatch")
+        return results
+    finally:
+        for emulator in emulators:
+            emulator.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-upload",
+        description="Upload patterns to one or more wands over serial ports.")
+    parser.add_argument("inputs", nargs="*",
+                        help="text:STRING, preset:NAME, file:PATH, or a bare string/preset/path")
+    parser.add_argument("-p", "--port", action="append", default=[],
+                        help="serial device to program (repeatable; all ports run concurrently)")
+    parser.add_argument("--raw", metavar="FILE", help="upload this file's bytes as-is (e.g. a pov-link image)")
+    parser.add_argument("--emulate", type=int, metavar="N",
+                        help="upload to N emulated wands on pseudo-terminals instead of real ports")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="with --emulate: fraction of reads hit by a bit error")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="with --emulate: fraction of acknowledgements lost")
+    parser.add_argument("--emulated-baud", type=int,
+                        help="with --emulate: throttle the emulated wands to this line rate")
+    parser.add_argument("-f", "--format", choices=sorted(pov_core.FORMATS), default="heart",
+                        help="output layout (default: heart)")
+    parser.add_argument("-w", "--width", type=int, default=64, help="design width (default: 64)")
+    parser.add_argument("--frames", choices=pov_core.FRAME_MODES, default="single",
+                        help="frames to export from long canvases (default: single)")
+    parser.add_argument("--step", type=int, default=1, help="columns between marquee frames (default: 1)")
+    parser.add_argument("--compress", action="store_true", help="upload one compressed stream")
+    parser.add_argument("-b", "--baud", type=int, default=DEFAULT_BAUD,
+                        help=f"line rate (default: {DEFAULT_BAUD})")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK,
+                        help=f"bytes per DATA packet (default: {DEFAULT_CHUNK})")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help=f"unacknowledged chunks in flight (default: {DEFAULT_WINDOW})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"resends per packet before giving up (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds to wait for an acknowledgement (default: {DEFAULT_TIMEOUT})")
+    args = parser.parse_args(argv)
+
+    if not args.port and not args.emulate:
+        parser.error("give at least one --port, or --emulate N")
+    if bool(args.inputs) == bool(args.raw):
+        parser.error("give either patterns to compile or --raw FILE")
+    try:
+        if args.raw:
+            with open(args.raw, "rb") as f:
+                data = f.read()
+        else:
+            data = build_payload(args.inputs, args.width, args.format, args.frames, args.step, args.compress)
+    except (OSError, ValueError) as e:
+        print(f"pov-upload: {e}", file=sys.stderr)
+        return 1
+
+    options = {"chunk_size": args.chunk, "window": args.window, "retries": args.retries,
+               "timeout": args.timeout}
+    if args.emulate:
+        results = asyncio.run(_self_test(args.emulate, data, args.emulated_baud, args.error_rate,
+                                         args.drop_rate, options))
+    else:
+        results = asyncio.run(upload_many(args.port, data, args.baud, **options))
+    failures = 0
+    for result in results:
+        if isinstance(result, Exception):
+            failures += 1
+            print(f"pov-upload: {result}", file=sys.stderr)
+        else:
+            print(result.summary())
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
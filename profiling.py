@@ -0,0 +1,206 @@
+import cProfile
+import functools
+import sys
+import time
+
+from PyQt5.QtCore import QRect, Qt, QTimer
+from PyQt5.QtGui import QColor, QFont, QPainter
+
+import codec
+from pattern_grid import PatternGrid
+import pov_core
+import raster
+from text_layout import TextRenderer
+
+# Opt-in instrumentation for the designer (POV_PROFILE=1, or Ctrl+Shift+P at
+# runtime). Nothing here is referenced while it is off: enabling swaps timing
+# wrappers in for the instrumented methods and functions, disabling puts the
+# originals back, so the normal code paths carry no checks at all.
+#
+# A frame is one GridWidget repaint. Per frame the overlay shows the frame
+# rate, the paint time, the cells filled and the model mutations (dirty
+# rectangles reported by PatternGrid) since the previous frame.
+#
+# Ctrl+Shift+D starts a cProfile capture and pressing it again writes the
+# capture to a .prof file (pstats, snakeviz) and prints the per-hook timings
+# to stderr. The capture is separate from the overlay so that cProfile's own
+# overhead does not show up in the frame times.
+
+OVERLAY_REFRESH_MS = 250
+OVERLAY_SIZE = (230, 54)
+OVERLAY_BACKGROUND = QColor(0, 0, 0, 170)
+OVERLAY_TEXT = QColor(120, 255, 120)
+
+
+class HookStats:
+    __slots__ = ("calls", "total", "worst")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.worst = max(self.worst, seconds)
+
+
+class Profiler:
+    def __init__(self, designer):
+        self.designer = designer
+        self.grid_widget = designer.grid_widget
+        self.enabled = False
+        self.patches = []
+        self.hooks = {}
+        self.capture = None
+        self.timer = QTimer(designer)
+        self.timer.setInterval(OVERLAY_REFRESH_MS)
+        self.timer.timeout.connect(lambda: self.grid_widget.update(self.overlay_rect()))
+        self.reset()
+
+    def reset(self):
+        self.hooks.clear()
+        self.frames = []
+        self.last_paint = 0.0
+        self.cells = self.frame_cells = 0
+        self.mutations = self.frame_mutations = 0
+
+    # Patching
+
+    def patch(self, owner, name, wrapper):
+        original = getattr(owner, name)
+        self.patches.append((owner, name, original))
+        setattr(owner, name, functools.wraps(original)(wrapper(original)))
+
+    def timed(self, label):
+        stats = self.hooks.setdefault(label, HookStats())
+
+        def wrapper(original):
+            def call(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    stats.add(time.perf_counter() - t0)
+            return call
+        return wrapper
+
+    def install(self):
+        grid_cls, preview_cls = type(self.grid_widget), type(self.designer.preview_widget)
+        self.patch(grid_cls, "paintEvent", self.grid_paint)
+        self.patch(grid_cls, "fill_cells", self.count_cells)
+        self.patch(preview_cls, "paintEvent", self.timed("PreviewWidget.paintEvent"))
+        for name in ("mousePressEvent", "mouseMoveEvent", "mouseReleaseEvent", "dropEvent"):
+            self.patch(grid_cls, name, self.timed(f"GridWidget.{name}"))
+        for name in ("generate_hex_code", "generate_animation_hex"):
+            self.patch(pov_core, name, self.timed(f"pov_core.{name}"))
+        self.patch(codec, "generate_compressed_hex", self.timed("codec.generate_compressed_hex"))
+        self.patch(raster, "stamp", self.timed("raster.stamp"))
+        self.patch(pov_core, "stamp_glyph", self.timed("glyphs.stamp_glyph"))
+        self.patch(TextRenderer, "set_text", self.timed("TextRenderer.set_text"))
+        self.patch(PatternGrid, "mark_dirty", self.count_mutations)
+        self.patch(PatternGrid, "mark_all_dirty", self.count_mutations)
+
+    def uninstall(self):
+        for owner, name, original in reversed(self.patches):
+            setattr(owner, name, original)
+        self.patches.clear()
+
+    def grid_paint(self, original):
+        stats = self.hooks.setdefault("GridWidget.paintEvent", HookStats())
+        profiler = self
+
+        def paint(widget, event):
+            t0 = time.perf_counter()
+            original(widget, event)
+            elapsed = time.perf_counter() - t0
+            stats.add(elapsed)
+            overlay = profiler.overlay_rect()
+            if not overlay.contains(event.rect()):
+                # Repaints of the overlay alone are not frames of the editor
+                profiler.end_frame(t0, elapsed)
+            if event.rect().intersects(overlay):
+                profiler.draw_overlay(widget, overlay)
+        return paint
+
+    def count_cells(self, original):
+        profiler = self
+
+        def fill(widget, painter, x, mask, first_row, last_row, color):
+            profiler.cells += bin((mask >> first_row) & ((1 << max(last_row - first_row, 0)) - 1)).count("1")
+            return original(widget, painter, x, mask, first_row, last_row, color)
+        return fill
+
+    def count_mutations(self, original):
+        profiler = self
+
+        def mark(grid, *args):
+            profiler.mutations += 1
+            return original(grid, *args)
+        return mark
+
+    # Frames and overlay
+
+    def end_frame(self, start, elapsed):
+        self.frames.append(start)
+        self.frames = [t for t in self.frames if t > start - 1.0]
+        self.last_paint = elapsed
+        self.frame_cells, self.cells = self.cells, 0
+        self.frame_mutations, self.mutations = self.mutations, 0
+
+    def overlay_rect(self):
+        width, height = OVERLAY_SIZE
+        return QRect(self.grid_widget.width() - width - 4, 4, width, height)
+
+    def draw_overlay(self, widget, rect):
+        painter = QPainter(widget)
+        painter.fillRect(rect, OVERLAY_BACKGROUND)
+        painter.setPen(OVERLAY_TEXT)
+        painter.setFont(QFont("monospace", 8))
+        lines = [f"{len(self.frames):3d} fps   paint {self.last_paint * 1000:6.2f} ms",
+                 f"cells {self.frame_cells:5d}   mutations {self.frame_mutations:4d}",
+                 f"preview {self.mean_ms('PreviewWidget.paintEvent'):6.2f} ms"]
+        painter.drawText(rect.adjusted(6, 4, -6, -4), Qt.AlignLeft | Qt.AlignTop, "\n".join(lines))
+        painter.end()
+
+    def mean_ms(self, label):
+        stats = self.hooks.get(label)
+        return stats.total / stats.calls * 1000 if stats and stats.calls else 0.0
+
+    # Switching and dumps
+
+    def set_enabled(self, enabled):
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled:
+            self.reset()
+            self.install()
+            self.timer.start()
+        else:
+            self.timer.stop()
+            self.uninstall()
+        self.grid_widget.update()
+
+    def report(self):
+        lines = [f"{'hook':36s} {'calls':>7s} {'mean ms':>9s} {'max ms':>9s} {'total ms':>10s}"]
+        for label, stats in sorted(self.hooks.items()):
+            if stats.calls:
+                lines.append(f"{label:36s} {stats.calls:7d} {stats.total / stats.calls * 1000:9.3f} "
+                             f"{stats.worst * 1000:9.3f} {stats.total * 1000:10.1f}")
+        return "\n".join(lines)
+
+    def start_capture(self):
+        self.capture = cProfile.Profile()
+        self.capture.enable()
+
+    def stop_capture(self, path=None):
+        # Writes the capture and returns its path
+        self.capture.disable()
+        path = path or time.strftime("pov-profile-%Y%m%d-%H%M%S.prof")
+        self.capture.dump_stats(path)
+        self.capture = None
+        if self.enabled:
+            print(self.report(), file=sys.stderr)
+        return path
@@ -0,0 +1,202 @@
+import math
+
+import numpy as np
+
+from pattern_grid import Overlay, PatternGrid
+
+# Every primitive draws into one of:
+#   - a 2-D bool array indexed [row, col]
+#   - a 1-D unsigned array of packed columns (bit N = row N)
+#   - a PatternGrid, written in place through its packed column buffer
+
+
+def _target(target):
+    if isinstance(target, PatternGrid):
+        cols = np.frombuffer(target.writable_columns(), dtype=np.dtype(f"u{target.columns_itemsize}"))
+        return cols, target.height
+    target = np.asarray(target)
+    if target.ndim == 1:
+        return target, target.dtype.itemsize * 8
+    return target, None
+
+
+def _shape(cols, height):
+    return (height, cols.shape[0]) if height is not None else cols.shape
+
+
+def _window(size, center, radius):
+    return max(0, math.ceil(center - radius)), min(size, math.floor(center + radius) + 1)
+
+
+def decode_pattern(rows):
+    return np.array([[bit == "1" for bit in row] for row in rows], dtype=bool)
+
+
+def decode_points(points, height, width):
+    # `points` are (col, row) pairs as used by the hand-written preset tables
+    pattern = np.zeros((height, width), dtype=bool)
+    cols, rows = np.array(points).T
+    pattern[rows, cols] = True
+    return pattern
+
+
+def pack_columns(mask, dtype=np.uint16):
+    weights = np.left_shift(np.uint64(1), np.arange(mask.shape[0], dtype=np.uint64))
+    return (mask.astype(np.uint64) * weights[:, None]).sum(axis=0, dtype=np.uint64).astype(dtype)
+
+
+def unpack_columns(cols, height):
+    shifts = np.arange(height, dtype=np.uint64)[:, None]
+    return (np.right_shift(cols.astype(np.uint64)[None, :], shifts) & np.uint64(1)).astype(bool)
+
+
+def apply_mask(target, mask, value, top=0, left=0):
+    # Set (or clear) every cell of `mask`, placed with its corner at (top, left)
+    cols, height = _target(target)
+    rows_total, cols_total = _shape(cols, height)
+    r0, c0 = max(top, 0), max(left, 0)
+    r1, c1 = min(top + mask.shape[0], rows_total), min(left + mask.shape[1], cols_total)
+    if r0 >= r1 or c0 >= c1:
+        return target
+    mask = mask[r0 - top:r1 - top, c0 - left:c1 - left]
+    if isinstance(target, PatternGrid):
+        target.mark_dirty(r0, c0, r1, c1)
+    if height is None:
+        cols[r0:r1, c0:c1][mask] = value
+    else:
+        bits = pack_columns(mask, np.uint64) << np.uint64(r0)
+        bits = bits.astype(cols.dtype)
+        if value:
+            cols[c0:c1] |= bits
+        else:
+            cols[c0:c1] &= ~bits
+    return target
+
+
+def apply_points(target, rows, cols, value):
+    grid, height = _target(target)
+    rows_total, cols_total = _shape(grid, height)
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    keep = (rows >= 0) & (rows < rows_total) & (cols >= 0) & (cols < cols_total)
+    rows, cols = rows[keep], cols[keep]
+    if isinstance(target, PatternGrid) and rows.size:
+        target.mark_dirty(int(rows.min()), int(cols.min()), int(rows.max()) + 1, int(cols.max()) + 1)
+    if height is None:
+        grid[rows, cols] = value
+    else:
+        bits = np.left_shift(1, rows).astype(grid.dtype)
+        if value:
+            np.bitwise_or.at(grid, cols, bits)
+        else:
+            np.bitwise_and.at(grid, cols, ~bits)
+    return target
+
+
+def points_overlay(grid, rows, cols):
+    # Clip points to `grid` and pack them into a sparse Overlay
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    keep = (rows >= 0) & (rows < grid.height) & (cols >= 0) & (cols < grid.width)
+    rows, cols = rows[keep], cols[keep]
+    if not cols.size:
+        return Overlay()
+    left = int(cols.min())
+    masks = np.zeros(int(cols.max()) - left + 1, dtype=np.uint64)
+    np.bitwise_or.at(masks, cols - left, np.left_shift(np.uint64(1), rows.astype(np.uint64)))
+    return Overlay(left, masks.tolist())
+
+
+def stamp(target, pattern, top, left, replace=True):
+    # Replace mode copies the whole pattern box, zeros included
+    if replace:
+        apply_mask(target, np.ones_like(pattern), False, top, left)
+    return apply_mask(target, pattern, True, top, left)
+
+
+def line_points(r0, c0, r1, c1):
+    # Closed form of the Bresenham walk in POVWandDesigner.draw_line
+    dr, dc = abs(r1 - r0), abs(c1 - c0)
+    sr = 1 if r0 < r1 else -1
+    sc = 1 if c0 < c1 else -1
+    steps = np.arange(max(dr, dc) + 1)
+    if dc > dr:
+        return r0 + sr * ((steps * dr + (dc - 1) // 2) // dc), c0 + sc * steps
+    minor = (steps * dc + (dr - 1) // 2) // dr if dr else np.zeros_like(steps)
+    return r0 + sr * steps, c0 + sc * minor
+
+
+def draw_line(target, r0, c0, r1, c1, value=True):
+    rows, cols = line_points(r0, c0, r1, c1)
+    return apply_points(target, rows, cols, value)
+
+
+def circle_points(center_row, center_col, end_row, end_col):
+    # Midpoint circle of POVWandDesigner.draw_circle: walk one octant (O(radius)),
+    # then mirror it into all eight octants in one vectorized step
+    radius = round(math.sqrt((end_row - center_row) ** 2 + (end_col - center_col) ** 2))
+    xs, ys = [], []
+    x, y, err = radius, 0, 0
+    while x >= y:
+        xs.append(x)
+        ys.append(y)
+        y += 1
+        err += 1 + 2 * y
+        if 2 * (err - x) + 1 > 0:
+            x -= 1
+            err += 1 - 2 * x
+    x, y = np.array(xs), np.array(ys)
+    # The gap-filling second ring uses y + 1 wherever x > y
+    ring = x > y
+    x, y = np.concatenate([x, x[ring]]), np.concatenate([y, y[ring] + 1])
+    rows = np.concatenate([y, x, -y, -x, -y, -x, y, x]) + center_row
+    cols = np.concatenate([x, y, x, y, -x, -y, -x, -y]) + center_col
+    return rows, cols
+
+
+def draw_circle(target, center_row, center_col, end_row, end_col, value=True):
+    rows, cols = circle_points(center_row, center_col, end_row, end_col)
+    return apply_points(target, rows, cols, value)
+
+
+def circle_mask(shape, center_row, center_col, radius, top=0, left=0):
+    rows, cols = np.ogrid[top:top + shape[0], left:left + shape[1]]
+    return np.sqrt((rows - center_row) ** 2 + (cols - center_col) ** 2) <= radius
+
+
+def ellipse_mask(shape, center_row, center_col, radius_row, radius_col, top=0, left=0):
+    rows, cols = np.ogrid[top:top + shape[0], left:left + shape[1]]
+    return (((rows - center_row) * radius_col) ** 2 + ((cols - center_col) * radius_row) ** 2
+            <= (radius_row * radius_col) ** 2)
+
+
+def outline(mask):
+    # Cells of `mask` with at least one 4-neighbour outside it
+    padded = np.pad(mask, 1)
+    interior = (padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:])
+    return mask & ~interior
+
+
+def _bounds(target, center_row, center_col, radius_row, radius_col):
+    rows_total, cols_total = _shape(*_target(target))
+    r0, r1 = _window(rows_total, center_row, radius_row)
+    c0, c1 = _window(cols_total, center_col, radius_col)
+    return r0, c0, max(r1 - r0, 0), max(c1 - c0, 0)
+
+
+def fill_circle(target, center_row, center_col, radius, value=True):
+    top, left, height, width = _bounds(target, center_row, center_col, radius, radius)
+    mask = circle_mask((height, width), center_row, center_col, radius, top, left)
+    return apply_mask(target, mask, value, top, left)
+
+
+def fill_ellipse(target, center_row, center_col, radius_row, radius_col, value=True):
+    top, left, height, width = _bounds(target, center_row, center_col, radius_row, radius_col)
+    mask = ellipse_mask((height, width), center_row, center_col, radius_row, radius_col, top, left)
+    return apply_mask(target, mask, value, top, left)
+
+
+def draw_ellipse(target, center_row, center_col, radius_row, radius_col, value=True):
+    # Rasterize one cell past the clip box so clipped edges are not outlined
+    top, left, height, width = _bounds(target, center_row, center_col, radius_row, radius_col)
+    mask = ellipse_mask((height + 2, width + 2), center_row, center_col,
+                        radius_row, radius_col, top - 1, left - 1)
+    return apply_mask(target, outline(mask)[1:-1, 1:-1], value, top, left)
@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+import hex_import
+import library
+import pov_compile
+import pov_core
+
+# Exact and near-duplicate search over the firmware blocks of one output
+# format (encoders.FORMATS), compared over the format's frame.
+#
+# Exact duplicates are grouped by a content hash. Nearest neighbours use
+# multi-index hashing with one table per column (row, for row layouts), each
+# column held as one little-endian word: if two patterns differ in at most R
+# bits over a set S of columns with R < len(S), they must agree exactly on at
+# least one column of S. A query takes S to be the columns whose value
+# is rare in the catalogue, collects the patterns sharing any of those column
+# values, and ranks them by Hamming distance. When that cannot prove the
+# answer (the k-th distance is not below len(S)), the query falls back to a
+# vectorized scan of the whole catalogue.
+
+# Word size for each unit size; 3-byte units are widened with a zero byte
+WORD_SIZES = {1: 1, 2: 2, 3: 4, 4: 4}
+
+# Columns whose value is shared by more than this fraction of the catalogue
+# are not worth probing (the blank column, typically)
+RARE_FRACTION = 0.01
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def content_hash(block):
+    return hashlib.blake2b(bytes(block), digest_size=16).digest()
+
+
+def hamming(a, b):
+    return int(_POPCOUNT[np.bitwise_xor(np.frombuffer(a, np.uint8), np.frombuffer(b, np.uint8))].sum())
+
+
+class SimilarityIndex:
+    def __init__(self, blocks, names=None, output_format="heart"):
+        # `blocks` are firmware blocks of `output_format`; the padding after
+        # each frame is not compared
+        self.format = pov_core.get_format(output_format)
+        self.word_size = WORD_SIZES[self.format.unit_bytes]
+        columns = self.format.units
+        self.columns = self._words(b"".join(self._frame(block) for block in blocks)).reshape(-1, columns)
+        self.names = list(names) if names is not None else [f"#{i}" for i in range(len(self.columns))]
+        if len(self.names) != len(self.columns):
+            raise ValueError("one name per pattern is required")
+        self._hashes = None
+
+        # Per column: pattern ids sorted by column value, the distinct values,
+        # and where each value's run of ids starts
+        self._order = np.argsort(self.columns, axis=0, kind="stable").T
+        self._values, self._starts = [], []
+        for col in range(columns):
+            ordered = self.columns[self._order[col], col]
+            first = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]]) if len(ordered) else np.zeros(0, int)
+            self._values.append(ordered[first])
+            self._starts.append(np.r_[first, len(ordered)])
+
+    def __len__(self):
+        return len(self.columns)
+
+    def _frame(self, block):
+        return bytes(block[:self.format.frame_size]).ljust(self.format.frame_size, b"\0")
+
+    def _words(self, data):
+        units = np.frombuffer(data, np.uint8).reshape(-1, self.format.unit_bytes)
+        if self.word_size != self.format.unit_bytes:
+            words = np.zeros((len(units), self.word_size), np.uint8)
+            words[:, :self.format.unit_bytes] = units
+            units = words
+        return units.view(f"<u{self.word_size}").reshape(-1)
+
+    def query(self, block):
+        return self._words(self._frame(block))
+
+    def block(self, index):
+        units = self.columns[index].view(np.uint8).reshape(-1, self.word_size)[:, :self.format.unit_bytes]
+        return units.tobytes() + self.format.padding
+
+    def duplicates(self):
+        # Groups of pattern ids with identical content, largest group first
+        if self._hashes is None:
+            self._hashes = {}
+            for i, row in enumerate(self.columns):
+                self._hashes.setdefault(content_hash(row.tobytes()), []).append(i)
+        groups = [ids for ids in self._hashes.values() if len(ids) > 1]
+        return sorted(groups, key=lambda ids: (-len(ids), ids[0]))
+
+    def distances(self, block, ids=None):
+        query = self.query(block)
+        rows = self.columns if ids is None else self.columns[ids]
+        return _POPCOUNT[np.bitwise_xor(rows, query).view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+    def _bucket(self, col, value):
+        i = np.searchsorted(self._values[col], value)
+        if i < len(self._values[col]) and self._values[col][i] == value:
+            return self._order[col][self._starts[col][i]:self._starts[col][i + 1]]
+        return self._order[col][:0]
+
+    def candidates(self, block):
+        # (pattern ids sharing a rare column value with the query, guaranteed radius)
+        query = self.query(block)
+        limit = max(int(len(self) * RARE_FRACTION), 1)
+        buckets = []
+        for col, value in enumerate(query):
+            bucket = self._bucket(col, value)
+            if len(bucket) <= limit:
+                buckets.append(bucket)
+        if not buckets:
+            return np.zeros(0, dtype=np.intp), -1
+        return np.unique(np.concatenate(buckets)), len(buckets) - 1
+
+    def nearest(self, block, k=5, radius=None):
+        # [(distance, id)] for the k closest patterns (all within `radius` if given)
+        if not len(self):
+            return []
+        ids, guaranteed = self.candidates(block)
+        dist = self.distances(block, ids)
+        if radius is None or radius > guaranteed:
+            # The candidates only prove the answer if the k-th of them is close enough
+            top = np.sort(dist)[:k]
+            if len(top) < k or top[-1] > guaranteed:
+                ids = np.arange(len(self))
+                dist = self.distances(block)
+        if radius is not None:
+            keep = dist <= radius
+            ids, dist = ids[keep], dist[keep]
+        order = np.lexsort((ids, dist))[:k]
+        return [(int(dist[i]), int(ids[i])) for i in order]
+
+
+def load_catalogue(paths, output_format="heart"):
+    # (names, blocks) from pattern libraries (.pov) and anything hex_import
+    # reads, as blocks of `output_format`
+    fmt = pov_core.get_format(output_format)
+    names, blocks = [], []
+    for path in paths:
+        if path.lower().endswith(".pov") and os.path.isfile(path):
+            with library.PatternLibrary(path) as lib:
+                for i in range(len(lib)):
+                    names.append(lib.name(i))
+                    blocks.append(fmt.encode(lib[i]))
+        else:
+            for source, index, block in hex_import.iter_paths([path], fmt.block_size):
+                names.append(f"{source}#{index}")
+                blocks.append(block)
+    return names, blocks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-similar",
+        description="Find duplicate and similar patterns in a pattern catalogue.")
+    parser.add_argument("catalogue", nargs="+",
+                        help="pattern libraries (.pov), hex files or directories")
+    parser.add_argument("-q", "--query", action="append", default=[],
+                        help="pattern to look up: a pov-compile input or #N for catalogue entry N")
+    parser.add_argument("-f", "--format", choices=sorted(pov_core.FORMATS), default="heart",
+                        help="block layout of the catalogue and queries (default: heart)")
+    parser.add_argument("-k", type=int, default=5, help="number of neighbours to report (default: 5)")
+    parser.add_argument("-r", "--radius", type=int, help="only report patterns within this many bits")
+    parser.add_argument("--dupes", action="store_true", help="list groups of identical patterns")
+    args = parser.parse_args(argv)
+
+    try:
+        names, blocks = load_catalogue(args.catalogue, args.format)
+    except (OSError, ValueError) as e:
+        print(f"pov-similar: {e}", file=sys.stderr)
+        return 1
+    index = SimilarityIndex(blocks, names, args.format)
+    del blocks
+    print(f"pov-similar: {len(index)} patterns", file=sys.stderr)
+
+    if args.dupes:
+        groups = index.duplicates()
+        for ids in groups:
+            print(" = ".join(index.names[i] for i in ids))
+        print(f"pov-similar: {len(groups)} duplicate groups, "
+              f"{sum(len(ids) - 1 for ids in groups)} redundant patterns", file=sys.stderr)
+
+    failures = 0
+    for spec in args.query:
+        if spec.startswith("#") and spec[1:].isdigit():
+            if int(spec[1:]) >= len(index):
+                failures += 1
+                print(f"pov-similar: {spec}: no such catalogue entry", file=sys.stderr)
+                continue
+            block = index.block(int(spec[1:]))
+        else:
+            blocks, error = pov_compile.compile_spec(spec, index.format.columns, args.format)
+            if error is not None:
+                failures += 1
+                print(f"pov-similar: {spec}: {error}", file=sys.stderr)
+                continue
+            block = blocks[0]
+        print(f"// {spec}")
+        for distance, i in index.nearest(block, args.k, args.radius):
+            print(f"{distance:4d}  {index.names[i]}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
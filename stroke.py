@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+
+import raster
+
+
+class StrokeStats:
+    def __init__(self):
+        self.samples = 0
+        self.frames = 0
+        self.model_time = 0.0
+        self.longest_frame = 0.0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def summary(self):
+        return (f"Stroke: {self.samples} samples in {self.frames} frames, "
+                f"{self.model_time * 1000:.2f} ms in model, "
+                f"longest frame {self.longest_frame * 1000:.2f} ms, "
+                f"{self.duration * 1000:.0f} ms total")
+
+
+class StrokeEngine:
+    # Freehand draw/erase: samples queue up between frames, and each flush
+    # joins them to the previous point with Bresenham lines in one mutation
+
+    def __init__(self):
+        self.value = True
+        self.last = None
+        self.pending = []
+        self.stats = None
+
+    @property
+    def active(self):
+        return self.stats is not None
+
+    def begin(self, row, col, value):
+        self.value = value
+        self.last = None
+        self.pending = [(row, col)]
+        self.stats = StrokeStats()
+        self.stats.samples = 1
+
+    def add_sample(self, row, col):
+        if self.active:
+            self.pending.append((row, col))
+            self.stats.samples += 1
+
+    def flush(self, grid):
+        if not self.pending:
+            return False
+        start = time.perf_counter()
+        points = self.pending if self.last is None else [self.last] + self.pending
+        if len(points) == 1:
+            rows, cols = [points[0][0]], [points[0][1]]
+        else:
+            segments = [raster.line_points(r0, c0, r1, c1)
+                        for (r0, c0), (r1, c1) in zip(points, points[1:])]
+            rows = np.concatenate([segment[0] for segment in segments])
+            cols = np.concatenate([segment[1] for segment in segments])
+        raster.apply_points(grid, rows, cols, self.value)
+        self.last = self.pending[-1]
+        self.pending = []
+        elapsed = time.perf_counter() - start
+        self.stats.frames += 1
+        self.stats.model_time += elapsed
+        self.stats.longest_frame = max(self.stats.longest_frame, elapsed)
+        return True
+
+    def end(self, grid):
+        self.flush(grid)
+        stats, self.stats = self.stats, None
+        if stats is not None:
+            stats.duration = time.perf_counter() - stats.started
+        self.last = None
+        return stats
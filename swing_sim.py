@@ -0,0 +1,303 @@
+import argparse
+import itertools
+import math
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+import pov_compile
+import pov_core
+
+# What a pattern looks like on a swinging wand. The wand pivots below its
+# LEDs and swings like a pendulum, angle(t) = -A cos(2 pi f t), so it is
+# fastest upright and stops at either end. The firmware shows one column at a
+# time for a fixed period; by default the columns fill the middle `window` of
+# each stroke. On the return stroke the columns run in reverse (so text still
+# reads left to right), in the same order (mirrored), or stay dark.
+#
+# An exposure is the light every lit LED leaves along its path over a span of
+# time: LED positions are computed for all time steps at once, splatted into
+# the image with np.bincount and blurred to the LED size. Light is weighted by
+# exp(-age / persistence) to model the eye, or uniformly for a long-exposure
+# photograph. Slow parts of the swing receive more light per pixel, so the
+# ends of a stroke come out brighter and columns bunch up, as they do on the
+# real thing.
+
+RETURN_MODES = ("reverse", "same", "blank")
+PALETTE_LEVELS = 128
+DEFAULT_COLOR = (255, 48, 32)
+DEFAULT_GAIN = 1.5
+
+
+class SwingModel:
+    # Lengths in metres, times in seconds, angles in degrees
+
+    def __init__(self, frequency=2.0, amplitude=55.0, radius=0.25, pitch=0.006, window=0.7,
+                 column_ms=None, duty=1.0, return_mode="reverse", persistence=0.1, led_size=0.005):
+        if return_mode not in RETURN_MODES:
+            raise ValueError(f"unknown return mode {return_mode!r}")
+        if frequency <= 0 or not 0 < amplitude <= 180 or not 0 < window <= 1 or not 0 < duty <= 1:
+            raise ValueError("frequency, amplitude, window and duty must be positive "
+                             "(amplitude up to 180, window and duty up to 1)")
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.radius = radius
+        self.pitch = pitch
+        self.window = window
+        self.column_ms = column_ms
+        self.duty = duty
+        self.return_mode = return_mode
+        self.persistence = persistence
+        self.led_size = led_size
+
+    @property
+    def period(self):
+        return 1 / self.frequency
+
+    def angle(self, times):
+        return -math.radians(self.amplitude) * np.cos(2 * np.pi * self.frequency * np.asarray(times))
+
+    def radii(self, height=16):
+        # Row 0 (the top of the pattern) is the LED farthest from the pivot
+        return self.radius + (height - 1 - np.arange(height)) * self.pitch
+
+    def column_period(self, columns):
+        if self.column_ms:
+            return self.column_ms / 1000
+        return self.window * self.period / 2 / columns
+
+    def shown_columns(self, times, columns):
+        # Index of the column lit at each time, -1 while the LEDs are dark
+        stroke_time = self.period / 2
+        column_time = self.column_period(columns)
+        start = (stroke_time - columns * column_time) / 2
+        times = np.mod(times, self.period)
+        returning = times >= stroke_time
+        offset = np.mod(times, stroke_time) - start
+        index = np.floor(offset / column_time).astype(np.intp)
+        on = (index >= 0) & (index < columns) & (offset - index * column_time < self.duty * column_time)
+        if self.return_mode == "reverse":
+            index = np.where(returning, columns - 1 - index, index)
+        elif self.return_mode == "blank":
+            on &= ~returning
+        return np.where(on, index, -1)
+
+    def bounds(self, height=16):
+        # (left, right, bottom, top) of everything the LEDs can reach, plus a margin
+        amplitude = math.radians(min(self.amplitude, 180))
+        inner, outer = self.radius, self.radius + (height - 1) * self.pitch
+        reach = outer * math.sin(min(amplitude, math.pi / 2))
+        bottom = min(inner * math.cos(amplitude), outer * math.cos(amplitude))
+        margin = self.led_size * 2
+        return -reach - margin, reach + margin, bottom - margin, outer + margin
+
+
+class Viewport:
+    # Maps wand coordinates (metres, y up) into a width x height pixel image
+
+    def __init__(self, bounds, width, height=None):
+        left, right, bottom, top = bounds
+        if height is None:
+            height = max(1, round(width * (top - bottom) / (right - left)))
+        self.width, self.height = width, height
+        self.scale = min(width / (right - left), height / (top - bottom))
+        self.x0 = width / 2 - (left + right) / 2 * self.scale
+        self.y0 = height / 2 + (bottom + top) / 2 * self.scale
+
+    def to_pixels(self, x, y):
+        return self.x0 + np.asarray(x) * self.scale, self.y0 - np.asarray(y) * self.scale
+
+
+def column_bits(grid, output_format="heart"):
+    # (leds, columns) bool array of what the firmware actually receives: the
+    # encoded block decoded again, so it has the format's rows and columns
+    fmt = pov_core.get_format(output_format)
+    shown = fmt.decode(fmt.encode(grid))
+    masks = np.array(shown.columns(), dtype=np.uint64)
+    return ((masks[None, :] >> np.arange(shown.height, dtype=np.uint64)[:, None]) & 1).astype(bool)
+
+
+def _blur(image, sigma):
+    radius = max(1, math.ceil(sigma * 3))
+    taps = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    taps /= taps.sum()
+    for axis in (0, 1):
+        padded = np.pad(image, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)])
+        size = image.shape[axis]
+        image = sum(w * np.take(padded, np.arange(i, i + size), axis) for i, w in enumerate(taps))
+    return image
+
+
+def render(bits, model, width=480, height=None, t_end=None, duration=None, persistence=None,
+           gain=DEFAULT_GAIN):
+    # Returns (levels, viewport): light in [0, 1] per pixel, gathered over the
+    # `duration` seconds up to `t_end` (default: one whole swing)
+    rows, columns = bits.shape
+    view = Viewport(model.bounds(rows), width, height)
+    duration = model.period if duration is None else duration
+    t_end = duration if t_end is None else t_end
+
+    # Time steps short enough that the fastest LED moves under a pixel per step
+    radii = model.radii(rows)
+    speed = radii[0] * math.radians(model.amplitude) * 2 * math.pi * model.frequency * view.scale
+    dt = min(model.column_period(columns) * model.duty / 4, 0.75 / max(speed, 1e-9))
+    steps = max(1, math.ceil(duration / dt))
+    times = t_end - duration + (np.arange(steps) + 0.5) * (duration / steps)
+    shown = model.shown_columns(times, columns)
+    lit_steps = shown >= 0
+    times, shown = times[lit_steps], shown[lit_steps]
+
+    weight = np.full(len(times), duration / steps)
+    if persistence:
+        weight *= np.exp(-(t_end - times) / persistence)
+    lit = bits[:, shown].T
+    angle = model.angle(times)[:, None]
+    px, py = view.to_pixels(radii * np.sin(angle), radii * np.cos(angle))
+    px, py, weight = px[lit], py[lit], np.broadcast_to(weight[:, None], lit.shape)[lit]
+
+    # Bilinear splat of every lit LED sample
+    acc = np.zeros(view.width * view.height)
+    ix, iy = np.floor(px).astype(np.intp), np.floor(py).astype(np.intp)
+    fx, fy = px - ix, py - iy
+    for dx, dy, w in ((0, 0, (1 - fx) * (1 - fy)), (1, 0, fx * (1 - fy)),
+                      (0, 1, (1 - fx) * fy), (1, 1, fx * fy)):
+        x, y = ix + dx, iy + dy
+        inside = (x >= 0) & (x < view.width) & (y >= 0) & (y < view.height)
+        acc += np.bincount(y[inside] * view.width + x[inside], (weight * w)[inside], acc.size)
+
+    sigma = max(model.led_size * view.scale / 2, 0.7)
+    acc = _blur(acc.reshape(view.height, view.width), sigma)
+
+    # A streak drawn at the speed of the middle LED upright reaches 1 - exp(-gain)
+    middle = radii.mean() * math.radians(model.amplitude) * 2 * math.pi * model.frequency * view.scale
+    reference = 1 / max(middle, 1e-9) / (math.sqrt(2 * math.pi) * sigma)
+    return (1 - np.exp(-gain * acc / reference)).astype(np.float32), view
+
+
+def palette(color=DEFAULT_COLOR, levels=PALETTE_LEVELS):
+    ramp = np.linspace(0, 1, levels)[:, None]
+    return (ramp * np.array(color)[None, :]).round().astype(np.uint8)
+
+
+def quantize(levels, count=PALETTE_LEVELS):
+    return np.minimum((levels * count).astype(np.uint8), count - 1)
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_png(path, indices, colors):
+    # 8-bit palette PNG; every row uses filter type 0
+    height, width = indices.shape
+    raw = np.hstack([np.zeros((height, 1), np.uint8), indices]).tobytes()
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)))
+        f.write(_png_chunk(b"PLTE", colors.tobytes()))
+        f.write(_png_chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(_png_chunk(b"IEND", b""))
+
+
+def _gif_image_data(indices):
+    # LZW without compression: 7-bit pixels as 8-bit codes, with a clear code
+    # before the code table would need wider codes
+    clear, end, run = 128, 129, 126
+    pixels = indices.reshape(-1)
+    count = -(-len(pixels) // run)
+    codes = np.full(count * (run + 1) + 1, end, dtype=np.uint8)
+    body = codes[:-1].reshape(count, run + 1)
+    body[:, 0] = clear
+    padded = np.full(count * run, end, dtype=np.uint8)
+    padded[:len(pixels)] = pixels
+    body[:, 1:] = padded.reshape(count, run)
+    data = codes[codes != end].tobytes() + bytes([end])
+    blocks = b"".join(bytes([len(data[i:i + 255])]) + data[i:i + 255] for i in range(0, len(data), 255))
+    return bytes([7]) + blocks + b"\0"
+
+
+def write_gif(path, frames, colors, delay_ms):
+    # `frames` yields index arrays (< 128) of one size and is consumed as it
+    # is written; the animation loops forever
+    frames = iter(frames)
+    first = next(frames)
+    height, width = first.shape
+    with open(path, "wb") as f:
+        f.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF6, 0, 0))
+        f.write(colors[:PALETTE_LEVELS].tobytes())
+        f.write(b"!\xff\x0bNETSCAPE2.0\x03\x01\0\0\0")
+        for indices in itertools.chain([first], frames):
+            f.write(b"!\xf9\x04\x04" + struct.pack("<H", max(round(delay_ms / 10), 2)) + b"\0\0")
+            f.write(b"," + struct.pack("<HHHHB", 0, 0, width, height, 0))
+            f.write(_gif_image_data(indices))
+        f.write(b";")
+
+
+def parse_color(text):
+    text = text.lstrip("#")
+    if len(text) != 6:
+        raise ValueError(f"colour {text!r} is not RRGGBB")
+    return tuple(bytes.fromhex(text))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pov-swing",
+        description="Render what a pattern looks like on a swinging wand, as a PNG exposure or a GIF.")
+    parser.add_argument("pattern", help="text:STRING, preset:NAME, file:PATH, or a bare string/preset/path")
+    parser.add_argument("-o", "--output", required=True, help="output image (.png or .gif)")
+    parser.add_argument("-f", "--format", choices=sorted(pov_core.FORMATS), default="heart",
+                        help="firmware layout to simulate (default: heart)")
+    parser.add_argument("-w", "--width", type=int, default=64, help="design width for text and presets (default: 64)")
+    parser.add_argument("--size", type=int, default=480, help="image width in pixels (default: 480)")
+    parser.add_argument("--frequency", type=float, default=2.0, help="full swings per second (default: 2)")
+    parser.add_argument("--amplitude", type=float, default=55.0,
+                        help="swing angle either side of upright, in degrees (default: 55)")
+    parser.add_argument("--radius", type=float, default=0.25,
+                        help="pivot to the innermost LED, in metres (default: 0.25)")
+    parser.add_argument("--pitch", type=float, default=0.006, help="LED spacing in metres (default: 0.006)")
+    parser.add_argument("--window", type=float, default=0.7,
+                        help="fraction of each stroke the columns fill (default: 0.7)")
+    parser.add_argument("--column-ms", type=float,
+                        help="fixed time per column instead of --window, in milliseconds")
+    parser.add_argument("--duty", type=float, default=1.0,
+                        help="fraction of each column period the LEDs are on (default: 1)")
+    parser.add_argument("--return", dest="return_mode", choices=RETURN_MODES, default="reverse",
+                        help="columns on the return stroke (default: reverse)")
+    parser.add_argument("--persistence", type=float,
+                        help="fade light older than this many seconds, like the eye "
+                             "(default: a uniform exposure for PNG, 0.1 for GIF)")
+    parser.add_argument("--gain", type=float, default=DEFAULT_GAIN, help=f"exposure (default: {DEFAULT_GAIN})")
+    parser.add_argument("--color", default="ff3020", help="LED colour as RRGGBB (default: ff3020)")
+    parser.add_argument("--fps", type=float, default=25.0, help="GIF frame rate (default: 25)")
+    parser.add_argument("--seconds", type=float, help="GIF length (default: two swings)")
+    args = parser.parse_args(argv)
+
+    try:
+        model = SwingModel(args.frequency, args.amplitude, args.radius, args.pitch, args.window,
+                           args.column_ms, args.duty, args.return_mode, args.persistence or 0.1)
+        colors = palette(parse_color(args.color))
+        grid = pov_compile.build_pattern(args.pattern, args.width,
+                                         height=pov_core.get_format(args.format).leds)
+        bits = column_bits(grid, args.format)
+        if args.output.lower().endswith(".gif"):
+            seconds = args.seconds or 2 * model.period
+            persistence = model.persistence
+            times = np.arange(max(1, round(seconds * args.fps))) / args.fps + model.period
+            frames = (quantize(render(bits, model, args.size, t_end=t, duration=4 * persistence,
+                                      persistence=persistence, gain=args.gain)[0])
+                      for t in times)
+            write_gif(args.output, frames, colors, 1000 / args.fps)
+        else:
+            levels, view = render(bits, model, args.size, persistence=args.persistence, gain=args.gain)
+            write_png(args.output, quantize(levels), colors)
+    except (OSError, ValueError) as e:
+        print(f"pov-swing: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
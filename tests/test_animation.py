@@ -0,0 +1,98 @@
+import random
+
+from animation import CHUNK_COLUMNS, Frame, Timeline
+from pattern_grid import PatternGrid
+
+
+def random_grid(width, seed):
+    rng = random.Random(seed)
+    return PatternGrid.from_columns([rng.getrandbits(16) for _ in range(width)])
+
+
+def edited_timeline(frames=200, width=64):
+    # Each frame is the previous one with one more cell lit
+    timeline = Timeline(PatternGrid(width))
+    for i in range(frames - 1):
+        grid = timeline.duplicate()
+        grid.set(i % 16, i * 7 % width, True)
+        timeline.store(grid)
+    return timeline
+
+
+def test_from_grid_shares_unchanged_chunks():
+    grid = random_grid(40, 1)
+    base = Frame.from_grid(grid)
+    assert len(base.chunks) == 5 and len(base.chunks[-1]) == 40 - 4 * CHUNK_COLUMNS
+    grid.set(3, 17, not grid.get(3, 17))
+    frame = Frame.from_grid(grid, base=base)
+    shared = [a is b for a, b in zip(frame.chunks, base.chunks)]
+    assert shared == [True, True, False, True, True]
+    assert frame.to_grid() == grid
+    # A base of another height shares nothing but still works
+    assert Frame.from_grid(grid.region(0, 0, 24, 40), base=base).to_grid() == grid.region(0, 0, 24, 40)
+
+
+def test_blank_frames_share_one_chunk():
+    frame = Frame.blank(20)
+    assert frame.chunks[0] is frame.chunks[1]
+    assert frame.to_grid() == PatternGrid(20)
+
+
+def test_store_and_select_round_trip():
+    grids = [random_grid(30, seed) for seed in range(4)]
+    timeline = Timeline(grids[0])
+    for grid in grids[1:]:
+        timeline.insert(grid)
+    assert [grid for grid, duration in timeline.grids()] == grids
+    grid = timeline.select(1)
+    grid.set(0, 0, not grid.get(0, 0))
+    timeline.store(grid)
+    assert timeline.select(2) == grids[2]
+    assert timeline.select(1) == grid
+    assert timeline.select(99) == grids[3] and timeline.current == 3
+
+
+def test_insert_duplicate_remove_and_move():
+    a, b = random_grid(16, 1), random_grid(24, 2)
+    timeline = Timeline(a, 250)
+    assert timeline.insert(b) == b.resized(16)
+    assert timeline.duplicate() == b.resized(16)
+    assert timeline[2].chunks == timeline[1].chunks and timeline[2].duration == 250
+    assert timeline.insert_blank() == PatternGrid(16) and len(timeline) == 4
+    assert timeline.remove() == b.resized(16) and len(timeline) == 3
+    assert timeline.move(0) == b.resized(16) and timeline.current == 0
+    assert [grid for grid, duration in timeline.grids()][1] == a
+    while len(timeline) > 1:
+        timeline.remove()
+    timeline.remove()
+    assert len(timeline) == 1
+
+
+def test_memory_stats():
+    timeline = edited_timeline()
+    held, full = timeline.memory_stats()
+    assert full == 200 * 64 * 2
+    # One changed chunk per edit, plus the first frame's
+    assert held <= (200 + 8) * CHUNK_COLUMNS * 2
+
+
+def test_resize_keeps_chunks_shared():
+    timeline = edited_timeline()
+    grids = [grid for grid, duration in timeline.grids()]
+    held = timeline.memory_stats()[0]
+    timeline.resize(100)
+    assert timeline.memory_stats()[0] <= held + 2 * CHUNK_COLUMNS * 2
+    assert [grid for grid, duration in timeline.grids()] == [grid.resized(100) for grid in grids]
+    # 24 rows take four bytes a column: twice the bytes, still shared
+    timeline.resize(100, 24)
+    assert timeline.memory_stats()[0] <= 2 * (held + 2 * CHUNK_COLUMNS * 2)
+    timeline.resize(64, 16)
+    assert timeline.memory_stats()[0] <= held
+    assert [grid for grid, duration in timeline.grids()] == grids
+
+
+def test_resize_to_fewer_rows_drops_them():
+    grid = PatternGrid.from_columns([0xFFFF] * 10)
+    timeline = Timeline(grid)
+    timeline.resize(12, 8)
+    assert timeline.select(0) == PatternGrid.from_columns([0xFF] * 10 + [0, 0], 8)
@@ -0,0 +1,48 @@
+import pytest
+
+import codec
+from pattern_grid import PatternGrid
+import pov_core
+
+
+def test_round_trip_corpus():
+    failures = [(name, output_format) for name, output_format, raw, compressed, ok
+                in codec.check_round_trip() if not ok]
+    assert failures == []
+
+
+@pytest.mark.parametrize("output_format", sorted(pov_core.FORMATS))
+def test_marquee_round_trip(output_format):
+    grid = PatternGrid(90, pov_core.get_format(output_format).leds)
+    pov_core.render_text(grid, "HELLO WAND")
+    blocks = list(pov_core.frame_blocks(grid, output_format, "marquee", 2))
+    stream = codec.format_stream(blocks, output_format)
+    assert codec.is_stream(stream, pov_core.get_format(output_format).block_size)
+    assert codec.decode_stream(stream, pov_core.get_format(output_format).block_size) == blocks
+    assert len(stream) < len(blocks) * pov_core.get_format(output_format).frame_size
+
+
+def test_ops_cover_every_run_kind():
+    blank = [bytes(2)] * 8
+    cols = [bytes(2), bytes(2), b"\1\0", b"\2\0", b"\3\3", b"\3\3", b"\3\3", bytes(2)]
+    ops = codec.encode_ops(cols, blank)
+    assert ops == bytes([codec.OP_SKIP | 1, codec.OP_LITERAL | 1, 1, 0, 2, 0,
+                         codec.OP_REPEAT | 2, 3, 3, codec.OP_SKIP])
+
+
+def test_too_many_frames():
+    with pytest.raises(ValueError, match="too many frames"):
+        codec.encode_stream([b"\0"] * 0x10000, 1, 1)
+    assert len(codec.decode_stream(codec.encode_stream([b"\0"] * 0xFFFF, 1, 1), 1)) == 0xFFFF
+
+
+@pytest.mark.parametrize("damage", [
+    lambda s: s[:-1],
+    lambda s: s + b"\0",
+    lambda s: s[:2] + b"\x02" + s[3:],
+    lambda s: s[:7] + b"\x07" + s[8:],
+])
+def test_damaged_streams_are_rejected(damage):
+    stream = codec.encode_stream([pov_core.encode(PatternGrid(64))] * 3)
+    with pytest.raises(ValueError):
+        codec.decode_stream(damage(stream))
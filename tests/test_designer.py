@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+import hex_import
+import POV_Pattern
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def designer(app):
+    window = POV_Pattern.POVWandDesigner()
+    yield window
+    window.close()
+
+
+def test_compressing_too_many_frames_is_reported(designer):
+    # A 4096-column marquee in every one of 17 frames is over 65535 frames
+    designer.format_combo.setCurrentIndex(designer.format_combo.findData("hanzi"))
+    designer.long_canvas_check.setChecked(True)
+    designer.width_spin.setValue(4096)
+    designer.frames_combo.setCurrentIndex(2)
+    for _ in range(16):
+        designer.add_frame()
+    designer.compress_check.setChecked(True)
+    designer.generate_hex_code()
+    assert "too many frames" in designer.statusBar().currentMessage()
+    assert designer.hex_output.toPlainText() == ""
+
+
+def test_format_sets_the_canvas_height(designer):
+    designer.draw_smiley()
+    for name, leds in [("wide32", 32), ("mini8", 8), ("wide24", 24), ("heart", 16)]:
+        designer.format_combo.setCurrentIndex(designer.format_combo.findData(name))
+        assert designer.height == designer.grid.height == leds
+        assert all(frame.height == leds for frame in designer.timeline)
+    designer.format_combo.setCurrentIndex(designer.format_combo.findData("wide32"))
+    designer.grid.set(30, 5, True)
+    designer.refresh()
+    designer.generate_hex_code()
+    grid, = hex_import.import_text(designer.hex_output.toPlainText(), "wide32")
+    assert grid.height == 32 and grid.get(30, 5)
+
+
+@pytest.fixture
+def warnings(monkeypatch):
+    shown = []
+    monkeypatch.setattr(POV_Pattern.QMessageBox, "warning", lambda parent, title, text: shown.append(text))
+    return shown
+
+
+def paste(monkeypatch, designer, text):
+    monkeypatch.setattr(POV_Pattern.QInputDialog, "getMultiLineText", lambda *args: (text, True))
+    designer.paste_hex()
+
+
+def test_paste_blocks_that_start_like_a_container(monkeypatch, designer, warnings):
+    grid = POV_Pattern.PatternGrid(64)
+    grid.set_column(0, 0x4F50)
+    grid.set_column(1, 0x4956)
+    grid.set(12, 30, True)
+    paste(monkeypatch, designer, POV_Pattern.pov_core.generate_hex_code(grid))
+    assert warnings == []
+    assert designer.grid == grid
+
+
+def test_paste_truncated_stream_is_reported(monkeypatch, designer, warnings):
+    import codec
+    stream = codec.encode_stream([POV_Pattern.pov_core.encode(designer.grid)] * 3)
+    paste(monkeypatch, designer, POV_Pattern.pov_core.format_hex(stream[:-2]))
+    assert len(warnings) == 1
+
+
+def test_similar_panel_uses_the_output_format(designer, tmp_path):
+    grid = POV_Pattern.PatternGrid(32, 8)
+    POV_Pattern.pov_core.draw_smiley(grid)
+    path = tmp_path / "catalogue.txt"
+    path.write_text(POV_Pattern.pov_core.generate_hex_code(grid, "mini8"))
+    designer.format_combo.setCurrentIndex(designer.format_combo.findData("mini8"))
+    panel = POV_Pattern.SimilarPanel(designer)
+    panel.load_paths([str(path)])
+    designer.grid.set_columns(0, grid.columns())
+    panel.search()
+    assert panel.results.item(0).text().endswith("(0 bits)")
+    # Another format reads the catalogue again in that format
+    designer.format_combo.setCurrentIndex(designer.format_combo.findData("heart"))
+    panel.search()
+    assert panel.index.format.name == "heart"
+
+
+def test_preview_keeps_qwidget_window(designer):
+    designer.draw_heart()
+    designer.preview_widget.grab()
+    assert designer.preview_widget.window() is designer
+    assert designer.preview_widget.image_window is not None
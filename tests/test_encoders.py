@@ -0,0 +1,148 @@
+import ast
+import random
+
+import pytest
+
+from animation import Timeline
+import encoders
+import hex_import
+from pattern_grid import PatternGrid
+import pov_core
+
+
+def reference_hex(rows, output_format):
+    # POVWandDesigner.generate_hex_code before the format registry, on a
+    # 16-row list-of-lists grid
+    width = len(rows[0])
+    max_cols = min(width, 16 if output_format == "hanzi" else 64)
+    data = []
+    for col in range(max_cols):
+        for bank in (0, 8):
+            byte = 0
+            for row in range(bank, bank + 8):
+                if rows[row][col]:
+                    byte |= 1 << (row - bank)
+            data.append(byte)
+    data += [0] * (128 - len(data))
+    return "".join("".join(f"0x{b:02X}," for b in data[line * 16:line * 16 + 16]) + "\n"
+                   for line in range(8))
+
+
+def random_grid(width, height, seed, density=0.4):
+    rng = random.Random(seed)
+    return PatternGrid.from_rows([[rng.random() < density for _ in range(width)] for _ in range(height)])
+
+
+@pytest.mark.parametrize("output_format", ["heart", "hanzi"])
+def test_heart_and_hanzi_match_the_original_output(output_format):
+    for seed, width in enumerate([1, 5, 15, 16, 17, 40, 63, 64]):
+        grid = random_grid(width, 16, seed)
+        assert pov_core.generate_hex_code(grid, output_format) == reference_hex(grid.to_rows(), output_format)
+    for name, draw in pov_core.PRESETS.items():
+        grid = PatternGrid(64)
+        draw(grid)
+        assert pov_core.generate_hex_code(grid, output_format) == reference_hex(grid.to_rows(), output_format)
+
+
+@pytest.mark.parametrize("output_format", sorted(encoders.FORMATS))
+def test_encode_decode_round_trip(output_format):
+    fmt = encoders.get_format(output_format)
+    grid = random_grid(fmt.columns, fmt.leds, 7)
+    block = fmt.encode(grid)
+    assert len(block) == fmt.block_size
+    assert block[fmt.frame_size:] == fmt.padding
+    assert fmt.decode(block) == grid
+    assert hex_import.block_to_grid(block, output_format) == grid
+
+
+@pytest.mark.parametrize("output_format", sorted(encoders.FORMATS))
+def test_frames_are_encoded_windows(output_format):
+    fmt = encoders.get_format(output_format)
+    grid = random_grid(3 * fmt.columns + 5, fmt.leds, 11)
+    starts = list(pov_core.frame_starts(grid.width, fmt, "marquee", 3))
+    for start, block in zip(starts, fmt.frames(grid, starts)):
+        assert block == fmt.encode(grid.region(0, start, fmt.leds, fmt.columns)), start
+
+
+@pytest.mark.parametrize("output_format", sorted(encoders.FORMATS))
+def test_column_spans_patch_to_a_full_encode(output_format):
+    fmt = encoders.get_format(output_format)
+    grid = random_grid(2 * fmt.columns + 9, fmt.leds, 3)
+    starts = list(pov_core.frame_starts(grid.width, fmt, "marquee", 2))
+    blocks = [bytearray(block) for block in fmt.frames(grid, starts)]
+    rng = random.Random(5)
+    for _ in range(20):
+        left = rng.randrange(grid.width)
+        right = min(grid.width, left + rng.randint(1, 12))
+        for col in range(left, right):
+            grid.set_column(col, rng.getrandbits(fmt.leds))
+        for i, offset, data in fmt.column_spans(grid, starts, left, right):
+            blocks[i][offset:offset + len(data)] = data
+        assert [bytes(block) for block in blocks] == list(fmt.frames(grid, starts))
+
+
+def test_bit_orders_and_layouts():
+    grid = PatternGrid(16)
+    grid.set(0, 0, True)
+    grid.set(9, 3, True)
+    assert encoders.get_format("heart").encode(grid)[:8] == bytes([1, 0, 0, 0, 0, 0, 0, 2])
+    # 8 LEDs, MSB first: rows 8 and up are off the wand
+    assert encoders.get_format("mini8").encode(grid)[:4] == bytes([0x80, 0, 0, 0])
+    # One row per two bytes, MSB = leftmost column
+    matrix = encoders.get_format("matrix16").encode(grid)
+    assert matrix[:2] == bytes([0x80, 0]) and matrix[18:20] == bytes([0x10, 0])
+
+
+def test_shorter_and_taller_grids_are_fitted():
+    tall = random_grid(40, 32, 9)
+    wide24 = encoders.get_format("wide24")
+    assert wide24.decode(wide24.encode(tall)) == tall.region(0, 0, 24, 96)
+    short = random_grid(40, 8, 10)
+    assert encoders.get_format("heart").decode(encoders.get_format("heart").encode(short)) == \
+        short.region(0, 0, 16, 64)
+
+
+def test_register_and_validation():
+    with pytest.raises(ValueError, match="already registered"):
+        encoders.register({"name": "heart"})
+    with pytest.raises(ValueError, match="leds"):
+        encoders.OutputFormat("bad", leds=12)
+    with pytest.raises(ValueError, match="smaller than a frame"):
+        encoders.OutputFormat("bad", columns=64, block_size=64)
+    with pytest.raises(ValueError, match="unknown output format"):
+        encoders.get_format("nope")
+
+
+def test_writers_agree():
+    rng = random.Random(1)
+    sections = [("Frame 0", bytes(rng.getrandbits(8) for _ in range(37))), (None, b""),
+                ("Frame 1", bytes(range(256)))]
+    data = b"".join(block for comment, block in sections)
+    assert encoders.write_binary(sections) == data
+    assert hex_import.parse_hex_bytes(encoders.write_hex(sections)) == data
+    c = encoders.write_c(sections, "pattern")
+    assert c.startswith(f"const uint8_t pattern[{len(data)}] = {{\n") and c.endswith("};\n")
+    assert hex_import.parse_hex_bytes(c) == data
+    namespace = {}
+    exec(encoders.write_python(sections, "PATTERN"), namespace)
+    assert namespace["PATTERN"] == data
+    assert ast.literal_eval(encoders.write_python([(None, b"")]).split("=", 1)[1].strip()) == b""
+
+
+def test_hex_rows():
+    assert encoders.hex_rows(bytes(range(18)), 8).splitlines() == [
+        "0x00,0x01,0x02,0x03,0x04,0x05,0x06,0x07,",
+        "0x08,0x09,0x0A,0x0B,0x0C,0x0D,0x0E,0x0F,",
+        "0x10,0x11,"]
+    assert encoders.hex_rows(b"") == ""
+
+
+def test_timeline_resizes_to_another_height():
+    grid = random_grid(20, 16, 4)
+    timeline = Timeline(grid)
+    timeline.duplicate()
+    timeline.resize(20, 24)
+    assert all(frame.height == 24 for frame in timeline)
+    assert timeline.select(0).region(0, 0, 16, 20) == grid
+    timeline.resize(12, 8)
+    assert timeline.select(1) == grid.region(0, 0, 8, 12)
@@ -0,0 +1,62 @@
+import pytest
+
+import codec
+import hex_import
+from pattern_grid import PatternGrid
+import pov_core
+import pov_link
+
+
+def sample_grids():
+    grids = []
+    for name, draw in pov_core.PRESETS.items():
+        grid = PatternGrid(64)
+        draw(grid)
+        grids.append(grid)
+    return grids
+
+
+def test_parse_hex_bytes():
+    assert hex_import.parse_hex_bytes("0x00,0xFF,\n0xa5, 0x1 0x123 x0x12") == b"\x00\xff\xa5\x12"
+
+
+@pytest.mark.parametrize("output_format", sorted(pov_core.FORMATS))
+def test_text_round_trip(output_format):
+    grids = sample_grids()
+    fmt = pov_core.get_format(output_format)
+    text = "".join(pov_core.generate_hex_code(grid, output_format) for grid in grids)
+    expected = [fmt.decode(fmt.encode(grid)) for grid in grids]
+    assert hex_import.import_text(text, output_format) == expected
+
+
+def test_chunked_stream_matches_whole():
+    blocks = [pov_core.encode(grid) for grid in sample_grids()]
+    data = b"".join(blocks)
+    chunks = [data[i:i + 37] for i in range(0, len(data), 37)]
+    assert list(hex_import.iter_blocks(chunks)) == blocks
+    assert list(hex_import.iter_blocks([data[:-5]]))[-1] == blocks[-1][:-5] + bytes(5)
+
+
+def test_compressed_stream_and_image():
+    blocks = [pov_core.encode(grid) for grid in sample_grids()]
+    assert list(hex_import.iter_blocks([codec.encode_stream(blocks)])) == blocks
+    entries = [pov_link.Entry.from_blocks("raw", blocks),
+               pov_link.Entry.from_blocks("packed", blocks, compress=True)]
+    assert list(hex_import.iter_blocks([bytes(pov_link.link(entries))])) == blocks + blocks
+
+
+@pytest.mark.parametrize("first_column", [0x5650, 0x4F50])
+def test_blocks_starting_with_container_magic_are_raw(first_column):
+    # Column 0 of "PV\0..." and "POVI" patterns reads like a stream or image header
+    grid = PatternGrid(64)
+    grid.set_column(0, first_column)
+    grid.set_column(1, 0x4956)
+    block = pov_core.encode(grid)
+    assert block[:2] in (codec.MAGIC, pov_link.IMAGE_MAGIC[:2])
+    assert hex_import.import_text(pov_core.generate_hex_code(grid)) == [grid]
+
+
+def test_truncated_stream_is_an_error():
+    stream = codec.encode_stream([pov_core.encode(grid) for grid in sample_grids()])
+    with pytest.raises(ValueError):
+        list(hex_import.iter_blocks([stream[:-3]]))
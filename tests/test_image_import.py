@@ -0,0 +1,136 @@
+import struct
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt5.QtGui")
+from PyQt5.QtGui import QImage
+
+import image_import
+import library
+import pov_core
+import swing_sim
+
+
+@pytest.mark.parametrize("height,width,rows,max_columns,expected", [
+    (32, 64, 16, None, (16, 32)),
+    (100, 100, 16, None, (16, 16)),
+    (10, 1000, 16, None, (16, 1600)),
+    (10, 1000, 16, 64, (1, 64)),
+    (40, 200, 16, 64, (13, 64)),
+    (64, 32, 24, None, (24, 12)),
+    (1000, 1, 8, None, (8, 1)),
+    (1, 100000, 32, None, (1, pov_core.MAX_CANVAS_WIDTH)),
+])
+def test_fit_size(height, width, rows, max_columns, expected):
+    assert image_import.fit_size(height, width, rows, max_columns) == expected
+
+
+def gradient(rows=16, columns=64):
+    # Ink rising from left to right, no level exactly on a threshold
+    return np.tile((np.arange(columns) + 0.5) / columns, (rows, 1))
+
+
+def test_threshold_gradient():
+    bits = image_import.threshold(gradient())
+    assert (bits == (np.arange(64) >= 32)[None, :]).all()
+
+
+def test_ordered_dither_tiles_match_their_level():
+    for level in np.arange(65) / 64 + 1 / 128:
+        bits = image_import.ordered_dither(np.full((16, 16), level))
+        for top in (0, 8):
+            for left in (0, 8):
+                assert bits[top:top + 8, left:left + 8].sum() == min(int(level * 64), 64)
+    bits = image_import.ordered_dither(gradient())
+    assert bits[:, 0].sum() == 0 and bits[:, -1].all()
+    assert (np.diff(bits.reshape(2, 8, 8, 8).sum(axis=(1, 3))[0]) >= 0).all()
+
+
+def reference_floyd_steinberg(levels):
+    work = np.array(levels, dtype=np.float64)
+    height, width = work.shape
+    out = np.zeros(work.shape, dtype=bool)
+    for y in range(height):
+        for x in range(width):
+            out[y, x] = work[y, x] >= 0.5
+            error = work[y, x] - out[y, x]
+            if x + 1 < width:
+                work[y, x + 1] += error * 7 / 16
+            if y + 1 < height:
+                if x > 0:
+                    work[y + 1, x - 1] += error * 3 / 16
+                work[y + 1, x] += error * 5 / 16
+                if x + 1 < width:
+                    work[y + 1, x + 1] += error * 1 / 16
+    return out
+
+
+@pytest.mark.parametrize("levels", [
+    gradient(), gradient(24, 97), gradient(1, 10), gradient(16, 1),
+    np.random.default_rng(3).random((16, 80)), np.random.default_rng(4).random((32, 5)),
+])
+def test_floyd_steinberg_matches_raster_order(levels):
+    bits = image_import.floyd_steinberg(levels)
+    assert (bits == reference_floyd_steinberg(levels)).all()
+    # Error diffusion keeps the overall ink close to the source levels
+    if levels.shape[0] >= 16:
+        assert abs(bits.mean() - levels.mean()) < 0.02
+
+
+def image_from_levels(levels):
+    # Grayscale image whose ink levels are `levels`
+    gray = np.ascontiguousarray(np.round((1 - levels) * 255).astype(np.uint8))
+    height, width = gray.shape
+    return QImage(gray.tobytes(), width, height, width, QImage.Format_Grayscale8).copy()
+
+
+@pytest.mark.parametrize("name", sorted(pov_core.FORMATS))
+def test_image_to_grid_fills_the_format_height(name):
+    leds = pov_core.get_format(name).leds
+    image = image_from_levels(gradient(64, 128))
+    grid = image_import.image_to_grid(image, method="threshold", height=leds)
+    assert (grid.height, grid.width) == (leds, leds * 2)
+    for row in grid.to_rows():
+        assert row == [col >= leds for col in range(leds * 2)]
+
+
+def test_image_to_grid_centers_on_the_canvas():
+    image = image_from_levels(np.ones((16, 16)))
+    grid = image_import.image_to_grid(image, method="threshold", width=64)
+    assert grid.width == 64
+    assert [grid.get(0, col) for col in range(64)] == [24 <= col < 40 for col in range(64)]
+
+
+def write_gif(path, delays_cs):
+    colors = np.repeat(np.linspace(0, 255, 128).round().astype(np.uint8)[:, None], 3, axis=1)
+    frames = [np.full((8, 16), 127, np.uint8) for _ in delays_cs]
+    for i, frame in enumerate(frames):
+        frame[:, i] = 0
+    swing_sim.write_gif(str(path), frames, colors, 100)
+    data = bytearray(path.read_bytes())
+    at = 0
+    for delay in delays_cs:
+        at = data.index(b"!\xf9\x04", at) + 4
+        struct.pack_into("<H", data, at, delay)
+    path.write_bytes(bytes(data))
+
+
+def test_gif_frames_and_delays(tmp_path):
+    path = tmp_path / "spinner.gif"
+    write_gif(path, [7, 0, 25, 2])
+    frames = list(image_import.iter_grids(str(path), method="threshold"))
+    assert [duration for grid, duration in frames] == [70, library.DEFAULT_DURATION_MS, 250, 20]
+    for i, (grid, duration) in enumerate(frames):
+        assert (grid.width, grid.height) == (32, 16)
+        assert grid.row(8) == [col in (2 * i, 2 * i + 1) for col in range(32)]
+
+
+def test_cli_format_sets_height_and_metadata(tmp_path):
+    write_gif(tmp_path / "spinner.gif", [5, 5])
+    path = str(tmp_path / "spinner.pov")
+    assert image_import.main([str(tmp_path / "spinner.gif"), "-f", "wide24", "-l", path, "-d", "threshold"]) == 0
+    patterns, meta = library.load(path)
+    assert meta == {"format": "wide24"}
+    assert [(name, grid.height, duration) for name, grid, duration in patterns] == [
+        ("spinner_0000", 24, 50), ("spinner_0001", 24, 50)]
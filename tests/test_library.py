@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+import library
+from pattern_grid import PatternGrid
+
+
+def patterns(count=40, seed=7):
+    rng = random.Random(seed)
+    result = []
+    for i in range(count):
+        height = rng.choice([8, 16, 24, 32])
+        grid = PatternGrid(rng.randint(1, 130), height)
+        for _ in range(rng.randint(0, 200)):
+            grid.set(rng.randrange(height), rng.randrange(grid.width), True)
+        result.append((f"pattern {i} ♥" if i % 5 == 0 else f"pattern {i}", grid, rng.randint(1, 5000)))
+    return result
+
+
+def same(a, b):
+    return [(name, grid.width, grid.height, grid.to_rows(), duration) for name, grid, duration in a] == \
+           [(name, grid.width, grid.height, grid.to_rows(), duration) for name, grid, duration in b]
+
+
+@pytest.mark.parametrize("suffix", [".pov", ".json"])
+def test_save_load_round_trip(tmp_path, suffix):
+    expected = patterns()
+    path = str(tmp_path / f"project{suffix}")
+    library.save(path, iter(expected), {"format": "wide24", "width": 96})
+    loaded, meta = library.load(path)
+    assert same(loaded, expected)
+    assert meta == {"format": "wide24", "width": 96}
+
+
+def test_binary_json_binary(tmp_path):
+    expected = patterns(seed=3)
+    first, second, third = (str(tmp_path / name) for name in ("a.pov", "b.json", "c.pov"))
+    library.save(first, expected, {"format": "mini8"})
+    library.save(second, *library.load(first))
+    library.save(third, *library.load(second))
+    loaded, meta = library.load(third)
+    assert same(loaded, expected)
+    assert meta == {"format": "mini8"}
+    with open(first, "rb") as a, open(third, "rb") as c:
+        assert a.read() == c.read()
+
+
+def test_random_access(tmp_path):
+    expected = patterns(200, seed=11)
+    path = str(tmp_path / "library.pov")
+    library.save_library(path, expected)
+    rng = random.Random(5)
+    with library.PatternLibrary(path) as lib:
+        assert len(lib) == len(expected)
+        assert lib.meta == {}
+        for i in rng.sample(range(len(expected)), 50) + [0, len(expected) - 1]:
+            name, grid, duration = expected[i]
+            assert lib.name(i) == name
+            assert lib.duration(i) == duration
+            assert lib[i].to_rows() == grid.to_rows()
+        assert lib[-1].to_rows() == expected[-1][1].to_rows()
+        with pytest.raises(IndexError):
+            lib[len(expected)]
+
+
+def test_empty_library(tmp_path):
+    path = str(tmp_path / "empty.pov")
+    library.save_library(path, [])
+    assert library.load(path) == ([], {})
+
+
+def write_library(tmp_path):
+    path = tmp_path / "library.pov"
+    library.save_library(str(path), patterns(10), {"format": "heart"})
+    return path
+
+
+def test_bad_magic(tmp_path):
+    path = write_library(tmp_path)
+    data = bytearray(path.read_bytes())
+    data[:4] = b"POVI"
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="not a pattern library"):
+        library.PatternLibrary(str(path))
+
+
+def test_bad_version(tmp_path):
+    path = write_library(tmp_path)
+    data = bytearray(path.read_bytes())
+    data[4] = library.LIBRARY_VERSION + 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="unsupported library version"):
+        library.load(str(path))
+
+
+@pytest.mark.parametrize("keep", [0, 3, library.HEADER.size - 1, library.HEADER.size, 100, -1])
+def test_truncated(tmp_path, keep):
+    path = write_library(tmp_path)
+    data = path.read_bytes()
+    path.write_bytes(data[:keep])
+    with pytest.raises(ValueError):
+        library.load(str(path))
+
+
+def test_damaged_entry(tmp_path):
+    path = write_library(tmp_path)
+    data = bytearray(path.read_bytes())
+    _, _, _, count, index_offset, _, _ = library.HEADER.unpack_from(data)
+    entry = list(library.INDEX_ENTRY.unpack_from(data, index_offset))
+    entry[2] = len(data)
+    library.INDEX_ENTRY.pack_into(data, index_offset, *entry)
+    path.write_bytes(bytes(data))
+    with library.PatternLibrary(str(path)) as lib:
+        assert lib[1].width
+        with pytest.raises(ValueError, match="pattern 0 is damaged"):
+            lib[0]
+
+
+def test_not_a_json_project(tmp_path):
+    path = tmp_path / "other.json"
+    path.write_text('{"version": 99, "patterns": []}')
+    with pytest.raises(ValueError, match="not a version 1"):
+        library.load(str(path))
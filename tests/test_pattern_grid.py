@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from pattern_grid import PatternGrid, Overlay, union_bounds
+
+
+def random_rows(height, width, seed):
+    rng = random.Random(seed)
+    return [[rng.random() < 0.4 for _ in range(width)] for _ in range(height)]
+
+
+@pytest.mark.parametrize("height", [1, 7, 8, 12, 16, 24, 32])
+def test_rows_and_bytes_round_trip(height):
+    rows = random_rows(height, 37, height)
+    grid = PatternGrid.from_rows(rows)
+    assert grid.height == height and grid.width == 37
+    assert grid.to_rows() == rows
+    assert PatternGrid.from_bytes(grid.to_bytes(), height) == grid
+    assert PatternGrid.from_columns(grid.columns(), height) == grid
+    assert all(grid.get(r, c) == rows[r][c] for r in range(height) for c in range(37))
+
+
+def test_sixteen_rows_are_the_firmware_layout():
+    # Top byte = rows 0-7, bottom byte = rows 8-15, LSB = top row
+    grid = PatternGrid(2)
+    grid.set(0, 0, True)
+    grid.set(9, 0, True)
+    grid.set(7, 1, True)
+    grid.set(15, 1, True)
+    assert grid.to_bytes() == bytes([0x01, 0x02, 0x80, 0x80])
+    assert grid.to_bytes(1) == bytes([0x01, 0x02])
+
+
+def test_set_get_out_of_bounds():
+    grid = PatternGrid(4)
+    assert not grid.set(-1, 0, True)
+    assert not grid.set(0, 4, True)
+    assert not grid.set(16, 0, True)
+    assert not grid.get(0, 99)
+    assert grid.set(3, 2, True)
+    assert not grid.set(3, 2, True)
+    assert grid.get(3, 2) and grid.column(2)[3]
+
+
+def test_dirty_rectangles():
+    grid = PatternGrid(64)
+    grid.set(2, 3, True)
+    grid.set(3, 4, True)
+    grid.set(10, 40, True)
+    assert grid.take_dirty() == [(2, 3, 4, 5), (10, 40, 11, 41)]
+    assert grid.take_dirty() == []
+    grid.set_column(5, 0b1100)
+    assert grid.take_dirty() == [(2, 5, 4, 6)]
+    grid.set_column(5, 0b1100)
+    assert grid.take_dirty() == []
+    for col in range(0, 64, 2):
+        grid.set(0, col, True)
+    grid.set(15, 63, False)
+    grid.set(15, 1, True)
+    assert len(grid.take_dirty()) == 1
+
+
+def test_snapshot_is_copy_on_write():
+    grid = PatternGrid.from_rows(random_rows(16, 20, 1))
+    snap = grid.snapshot()
+    before = snap.to_rows()
+    grid.set(0, 0, not grid.get(0, 0))
+    grid.fill()
+    assert snap.to_rows() == before
+    snap.clear()
+    assert grid.to_rows() == [[True] * 20] * 16
+
+
+def test_region_resized_and_blit():
+    grid = PatternGrid.from_rows(random_rows(16, 30, 2))
+    part = grid.region(4, 10, 8, 12)
+    assert part.to_rows() == [row[10:22] for row in grid.to_rows()[4:12]]
+    assert grid.resized(10).to_rows() == [row[:10] for row in grid.to_rows()]
+    assert grid.resized(40).columns(30) == PatternGrid(10).columns()
+    assert grid.region(0, 0, 24, 30).to_rows()[:16] == grid.to_rows()
+
+    target = PatternGrid(8)
+    target.fill()
+    target.blit(2, 6, [0b101, 0b010, 0b111], 3)
+    assert target.get_column(6) == 0xFFFF & ~(0b111 << 2) | 0b101 << 2
+    assert target.get_column(7) == 0xFFFF & ~(0b111 << 2) | 0b010 << 2
+    target.blit(14, 0, [0b11], 2, replace=False)
+    assert target.get_column(0) == 0xFFFF
+
+
+def test_overlay_and_union_bounds():
+    overlay = Overlay(5, [0, 0b0110, 0b1000])
+    assert overlay.get_column(6) == 0b0110 and overlay.get_column(20) == 0
+    assert overlay.bounds() == (1, 5, 4, 8)
+    assert Overlay(3, [0, 0]).bounds() is None
+    assert union_bounds(None, (1, 2, 3, 4), (0, 5, 2, 9)) == (0, 2, 3, 9)
+    assert union_bounds(None) is None
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        PatternGrid(-1)
+    with pytest.raises(ValueError):
+        PatternGrid(4, 0)
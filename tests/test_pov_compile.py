@@ -0,0 +1,47 @@
+import pytest
+
+import encoders
+import pov_compile
+
+SPECS = [f"text:{word}" for word in "ONE TWO THREE FOUR FIVE SIX SEVEN EIGHT NINE TEN".split()] + [
+    "preset:heart", "preset:smiley", "preset:nope", "HI THERE", "hi"]
+
+
+def compile_to(tmp_path, name, *args):
+    path = tmp_path / name
+    status = pov_compile.main(list(SPECS) + ["-o", str(path)] + list(args))
+    return status, path.read_bytes()
+
+
+@pytest.mark.parametrize("args", [
+    [], ["--binary"], ["-t", "c"], ["-f", "wide24", "-w", "100", "--frames", "marquee", "--step", "9"],
+    ["--compress", "-f", "mini8"],
+])
+def test_parallel_output_is_identical(tmp_path, capsys, args):
+    serial_status, serial = compile_to(tmp_path, "serial", "-j", "1", *args)
+    parallel_status, parallel = compile_to(tmp_path, "parallel", "-j", "4", *args)
+    # The unknown preset fails in both, and is reported once each time
+    assert serial_status == parallel_status == 1
+    assert capsys.readouterr().err.count("preset:nope") == 2
+    assert serial == parallel
+
+
+def test_specs_stay_in_order(tmp_path):
+    status, text = compile_to(tmp_path, "out.h", "-j", "4")
+    assert status == 1
+    comments = [line[3:] for line in text.decode().splitlines() if line.startswith("// ")]
+    assert comments == [spec for spec in SPECS if spec != "preset:nope"]
+    expected = "".join(encoders.write_hex([(spec, pov_compile.compile_spec(spec)[0][0])])
+                       for spec in SPECS if spec != "preset:nope")
+    assert text.decode() == expected
+
+
+def test_unwritable_output(tmp_path, capsys):
+    assert pov_compile.main(["HI", "-o", str(tmp_path / "missing" / "out.h")]) == 1
+    err = capsys.readouterr().err
+    assert err.startswith("pov-compile: ") and "missing" in err
+
+
+def test_unreadable_input_list(tmp_path, capsys):
+    assert pov_compile.main(["HI", "-i", str(tmp_path / "missing.txt"), "-o", str(tmp_path / "out.h")]) == 1
+    assert capsys.readouterr().err.startswith("pov-compile: ")
@@ -0,0 +1,112 @@
+import pytest
+
+import codec
+import hex_import
+from pattern_grid import PatternGrid
+import pov_compile
+import pov_core
+import pov_link
+
+
+def entries():
+    blocks, error = pov_compile.compile_spec("HELLO", 80, "heart", None, "split")
+    assert error is None
+    return [pov_link.Entry.from_blocks("hello", blocks, duration=250),
+            pov_link.Entry.from_blocks("hello packed", blocks, compress=True),
+            pov_link.Entry.from_blocks("heart", [pov_core.encode(preset("heart"))])], blocks
+
+
+def preset(name):
+    grid = PatternGrid(64)
+    pov_core.PRESETS[name](grid)
+    return grid
+
+
+@pytest.mark.parametrize("align", [1, 4, 64])
+def test_link_and_read_index(align):
+    linked, blocks = entries()
+    image = pov_link.link(linked, align)
+    assert pov_link.is_image(image)
+    index = pov_link.read_index(image)
+    assert [(frames, duration, flags, columns) for offset, length, frames, duration, flags, columns in index] == [
+        (len(blocks), 250, 0, 64), (len(blocks), 100, pov_link.FLAG_COMPRESSED, 64), (1, 100, 0, 64)]
+    for (offset, length, *_), entry in zip(index, linked):
+        assert offset % align == 0
+        assert image[offset:offset + length] == entry.payload
+    assert codec.decode_stream(linked[1].payload) == blocks
+
+
+def test_image_blocks_round_trip():
+    linked, blocks = entries()
+    image = bytes(pov_link.link(linked))
+    assert list(hex_import.image_blocks(image)) == blocks + blocks + [pov_core.encode(preset("heart"))]
+
+
+@pytest.mark.parametrize("output_format", sorted(pov_core.FORMATS))
+def test_every_format_round_trips(output_format):
+    fmt = pov_core.get_format(output_format)
+    blocks, error = pov_compile.compile_spec("WAND", 70, output_format, None, "marquee", 5)
+    assert error is None
+    image = bytes(pov_link.link([pov_link.Entry.from_blocks("a", blocks, output_format),
+                                 pov_link.Entry.from_blocks("b", blocks, output_format, compress=True)]))
+    assert pov_link.read_index(image)[0][5] == fmt.units
+    assert list(hex_import.iter_blocks([image], fmt.block_size)) == blocks + blocks
+
+
+def test_intel_hex_round_trip():
+    linked, blocks = entries()
+    image = bytes(pov_link.link(linked))
+    # Large enough, and based high enough, to cross a 64 KiB segment
+    image = image * (0x11000 // len(image) + 1)
+    text = pov_link.to_intel_hex(image, 0x8F00)
+    assert text.endswith(":00000001FF\n")
+    assert b"".join(hex_import.read_intel_hex_chunks(text.splitlines(True))) == image
+
+
+def test_c_header():
+    linked, blocks = entries()
+    image = bytes(pov_link.link(linked))
+    header = pov_link.to_c_header(image, linked, "flash")
+    assert "#define POV_PATTERN_HELLO 0" in header
+    assert "#define POV_PATTERN_HELLO_PACKED 1" in header
+    assert f"const uint8_t flash[{len(image)}] PROGMEM" in header
+    assert hex_import.parse_hex_bytes(header.split("PROGMEM", 1)[1]) == image
+
+
+def test_budget_and_alignment_errors():
+    linked, blocks = entries()
+    size = len(pov_link.link(linked))
+    assert len(pov_link.link(linked, budget=size)) == size
+    with pytest.raises(ValueError, match="flash budget"):
+        pov_link.link(linked, budget=size - 1)
+    with pytest.raises(ValueError, match="power of two"):
+        pov_link.link(linked, 3)
+
+
+def test_damaged_images_are_rejected():
+    linked, blocks = entries()
+    image = bytes(pov_link.link(linked))
+    assert not pov_link.is_image(image[:-1])
+    assert not pov_link.is_image(image[:4] + b"\x02" + image[5:])
+    with pytest.raises(ValueError):
+        pov_link.read_index(image[:-1])
+    # An index entry pointing past the end of the image
+    bad = bytearray(image)
+    pov_link.INDEX_ENTRY.pack_into(bad, pov_link.HEADER.size, len(image), 8, 1, 100, 0, 64, 0)
+    assert not pov_link.is_image(bytes(bad))
+
+
+def test_parse_size():
+    assert pov_link.parse_size("28k") == 28 * 1024
+    assert pov_link.parse_size("2M") == 2 * 1024 * 1024
+    assert pov_link.parse_size("100") == 100
+
+
+def test_main_writes_every_output_kind(tmp_path, capsys):
+    for name in ("image.bin", "image.h", "image.hex"):
+        assert pov_link.main(["HI", "preset:smiley", "-o", str(tmp_path / name), "--compress"]) == 0
+    image = (tmp_path / "image.bin").read_bytes()
+    assert pov_link.is_image(image) and len(pov_link.read_index(image)) == 2
+    assert list(hex_import.iter_file(str(tmp_path / "image.hex"))) == list(hex_import.iter_blocks([image]))
+    assert pov_link.main(["HI", "-o", str(tmp_path / "small.bin"), "--budget", "16"]) == 1
+    assert "flash budget" in capsys.readouterr().err
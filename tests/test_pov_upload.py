@@ -0,0 +1,116 @@
+import asyncio
+import random
+import zlib
+
+import pytest
+
+import pov_upload
+
+pytestmark = pytest.mark.skipif(not hasattr(pov_upload.os, "openpty"), reason="needs pseudo-terminals")
+
+
+def image(size=5000, seed=0):
+    return random.Random(seed).randbytes(size)
+
+
+def test_parse_packets_across_reads_and_noise():
+    stream = (pov_upload.packet(pov_upload.DATA, 7, b"abc") + pov_upload.packet(pov_upload.ACK, 1, b"\x02")
+              + b"\x00\x13" + pov_upload.packet(pov_upload.END, 2))
+    buffer = bytearray()
+    packets = []
+    for i in range(0, len(stream), 5):
+        buffer += stream[i:i + 5]
+        packets.extend(pov_upload.parse_packets(buffer))
+    assert packets == [(pov_upload.DATA, 7, b"abc"), (pov_upload.ACK, 1, b"\x02"), (pov_upload.END, 2, b"")]
+    assert buffer == b""
+
+
+def test_parse_packets_reports_crc_failures():
+    good = pov_upload.packet(pov_upload.DATA, 3, b"payload")
+    bad = bytearray(pov_upload.packet(pov_upload.DATA, 9, b"payload"))
+    bad[pov_upload.HEADER.size + 2] ^= 0x10
+    packets = list(pov_upload.parse_packets(bytearray(bytes(bad) + good)))
+    assert packets[0] == (None, 9, b"")
+    assert packets[-1] == (pov_upload.DATA, 3, b"payload")
+
+
+def test_parse_packets_skips_oversized_lengths():
+    bogus = pov_upload.HEADER.pack(pov_upload.MAGIC, pov_upload.DATA, 0, pov_upload.MAX_PAYLOAD + 1)
+    good = pov_upload.packet(pov_upload.BEGIN, 0, b"x")
+    assert list(pov_upload.parse_packets(bytearray(bogus + good))) == [(pov_upload.BEGIN, 0, b"x")]
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 60))
+
+
+async def upload_to(emulator, data, **options):
+    await emulator.start()
+    replies = []
+    reply = emulator.reply
+
+    async def record(kind, seq, answered):
+        replies.append((kind, answered))
+        await reply(kind, seq, answered)
+    emulator.reply = record
+    try:
+        return await pov_upload.upload(emulator.port, data, **options), replies
+    finally:
+        emulator.close()
+
+
+@pytest.mark.parametrize("chunk_size,window", [(256, 8), (100, 1), (4096, 4)])
+def test_clean_upload(chunk_size, window):
+    data = image()
+    emulator = pov_upload.WandEmulator()
+    result, replies = run(upload_to(emulator, data, chunk_size=chunk_size, window=window))
+    assert emulator.image == data
+    assert result.resent == 0 and result.size == len(data)
+    assert all(kind == pov_upload.ACK for kind, answered in replies)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_upload_through_noise_and_lost_acks(seed):
+    data = image(20000, seed)
+    emulator = pov_upload.WandEmulator(error_rate=0.2, drop_rate=0.1, seed=seed)
+    result, replies = run(upload_to(emulator, data, chunk_size=128, timeout=0.05, retries=30))
+    assert emulator.image == data
+    assert emulator.corrupted and emulator.dropped
+    # Corrupted packets are NAKed and resent, lost ACKs time out and are resent
+    naks = sum(kind == pov_upload.NAK for kind, answered in replies)
+    assert naks and result.resent >= emulator.dropped
+
+
+def test_upload_gives_up_after_retries():
+    emulator = pov_upload.WandEmulator(error_rate=1.0, seed=1)
+    with pytest.raises(pov_upload.UploadError, match="no acknowledgement for BEGIN"):
+        run(upload_to(emulator, image(100), timeout=0.02, retries=2))
+    assert emulator.image is None
+
+
+def test_image_crc_mismatch_is_not_acknowledged():
+    data = image(300)
+
+    async def send():
+        emulator = await pov_upload.WandEmulator().start()
+        link = pov_upload.SerialLink.open(emulator.port)
+        try:
+            # Every packet is intact, but BEGIN announces the CRC of other bytes
+            begin = pov_upload.BEGIN_PAYLOAD.pack(len(data), zlib.crc32(data[::-1]), len(data))
+            await pov_upload._exchange(link, pov_upload.BEGIN, 0, begin, 0, 1.0)
+            await pov_upload._exchange(link, pov_upload.DATA, 0, data, 0, 1.0)
+            await pov_upload._exchange(link, pov_upload.END, 0, b"", 1, 0.2)
+        finally:
+            link.close()
+            emulator.close()
+        return emulator
+
+    with pytest.raises(pov_upload.UploadError, match="no acknowledgement for END"):
+        run(send())
+
+
+def test_many_wands_receive_identical_images():
+    data = pov_upload.build_payload(["text:HELLO WORLD", "preset:heart"], 200, "wide24", "marquee", 7, True)
+    results = run(pov_upload._self_test(4, data, None, 0.05, 0.05,
+                                        {"chunk_size": 64, "timeout": 0.05, "retries": 30}))
+    assert all(isinstance(result, pov_upload.UploadResult) for result in results), results
@@ -0,0 +1,135 @@
+import math
+import random
+
+import numpy as np
+
+from pattern_grid import PatternGrid
+import raster
+
+HEIGHT = 16
+WIDTH = 64
+
+
+# The designer's list-of-lists rasterizers from before PatternGrid, kept as
+# the reference output
+
+
+def reference_line(grid, r0, c0, r1, c1, value):
+    dr = abs(r1 - r0)
+    dc = abs(c1 - c0)
+    sr = 1 if r0 < r1 else -1
+    sc = 1 if c0 < c1 else -1
+    err = (dc if dc > dr else -dr) / 2
+    while True:
+        if 0 <= r0 < HEIGHT and 0 <= c0 < WIDTH:
+            grid[r0][c0] = value
+        if r0 == r1 and c0 == c1:
+            break
+        err2 = err
+        if err2 > -dc:
+            err -= dr
+            c0 += sc
+        if err2 < dr:
+            err += dc
+            r0 += sr
+
+
+def reference_circle(grid, center_row, center_col, end_row, end_col, value):
+    radius = round(math.sqrt((end_row - center_row) ** 2 + (end_col - center_col) ** 2))
+    x, y, err = radius, 0, 0
+    while x >= y:
+        points = [(center_row + y, center_col + x), (center_row + x, center_col + y),
+                  (center_row - y, center_col + x), (center_row - x, center_col + y),
+                  (center_row - y, center_col - x), (center_row - x, center_col - y),
+                  (center_row + y, center_col - x), (center_row + x, center_col - y)]
+        if x > y:
+            points += [(center_row + y + 1, center_col + x), (center_row + x, center_col + y + 1),
+                       (center_row - y - 1, center_col + x), (center_row - x, center_col + y + 1),
+                       (center_row - y - 1, center_col - x), (center_row - x, center_col - y - 1),
+                       (center_row + y + 1, center_col - x), (center_row + x, center_col - y - 1)]
+        for r, c in points:
+            if 0 <= r < HEIGHT and 0 <= c < WIDTH:
+                grid[r][c] = value
+        y += 1
+        err += 1 + 2 * y
+        if 2 * (err - x) + 1 > 0:
+            x -= 1
+            err += 1 - 2 * x
+
+
+def reference_fill_circle(grid, center_row, center_col, radius, value):
+    for r in range(HEIGHT):
+        for c in range(WIDTH):
+            if math.sqrt((r - center_row) ** 2 + (c - center_col) ** 2) <= radius:
+                grid[r][c] = value
+
+
+def background(seed):
+    rng = random.Random(seed)
+    return [[rng.random() < 0.3 for _ in range(WIDTH)] for _ in range(HEIGHT)]
+
+
+def cases(count, seed):
+    # Endpoints inside, on the edge of and well outside the grid
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield [rng.randint(-20, HEIGHT + 20), rng.randint(-20, WIDTH + 20),
+               rng.randint(-20, HEIGHT + 20), rng.randint(-20, WIDTH + 20), rng.random() < 0.7]
+
+
+def test_line_matches_reference():
+    for args in cases(400, 1):
+        expected = background(args[0])
+        reference_line(expected, *args)
+        grid = PatternGrid.from_rows(background(args[0]))
+        raster.draw_line(grid, *args)
+        assert grid.to_rows() == expected, args
+
+
+def test_line_endpoints_all_octants():
+    for dr in range(-12, 13):
+        for dc in range(-12, 13):
+            expected = [[False] * WIDTH for _ in range(HEIGHT)]
+            reference_line(expected, 2, 30, 2 + dr, 30 + dc, True)
+            grid = PatternGrid(WIDTH)
+            raster.draw_line(grid, 2, 30, 2 + dr, 30 + dc)
+            assert grid.to_rows() == expected, (dr, dc)
+
+
+def test_circle_matches_reference():
+    for args in cases(300, 2):
+        expected = background(args[1])
+        reference_circle(expected, *args)
+        grid = PatternGrid.from_rows(background(args[1]))
+        raster.draw_circle(grid, *args)
+        assert grid.to_rows() == expected, args
+
+
+def test_fill_circle_matches_reference():
+    for args in cases(200, 3):
+        center_row, center_col, radius = args[0], args[1], abs(args[2]) / 3
+        expected = background(args[3])
+        reference_fill_circle(expected, center_row, center_col, radius, args[4])
+        grid = PatternGrid.from_rows(background(args[3]))
+        raster.fill_circle(grid, center_row, center_col, radius, args[4])
+        assert grid.to_rows() == expected, args
+
+
+def test_targets_agree():
+    # Bool arrays, packed column arrays and grids all rasterize the same cells
+    mask = np.zeros((HEIGHT, WIDTH), bool)
+    cols = np.zeros(WIDTH, np.uint16)
+    grid = PatternGrid(WIDTH)
+    for target in (mask, cols, grid):
+        raster.draw_line(target, 1, 1, 14, 50)
+        raster.draw_circle(target, 8, 20, 8, 27)
+        raster.fill_ellipse(target, 8, 45, 5, 9)
+    assert (raster.unpack_columns(cols, HEIGHT) == mask).all()
+    assert grid.to_rows() == mask.tolist()
+
+
+def test_draw_reports_dirty_cells():
+    grid = PatternGrid(WIDTH)
+    raster.draw_line(grid, 3, 10, 5, 20)
+    (top, left, bottom, right), = grid.take_dirty()
+    assert (top, left, bottom, right) == (3, 10, 6, 21)
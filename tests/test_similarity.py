@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from pattern_grid import PatternGrid
+import pov_core
+import similarity
+
+
+def random_catalogue(fmt, count, seed):
+    # Sparse patterns, near-copies of a few of them, and exact duplicates
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(count):
+        if blocks and rng.random() < 0.3:
+            frame = bytearray(rng.choice(blocks)[:fmt.frame_size])
+            for _ in range(rng.randint(0, 6)):
+                frame[rng.randrange(len(frame))] ^= 1 << rng.randrange(8)
+        else:
+            frame = bytearray(rng.getrandbits(8) if rng.random() < 0.3 else 0 for _ in range(fmt.frame_size))
+        blocks.append(bytes(frame) + fmt.padding)
+    return blocks
+
+
+def brute_force(blocks, query, fmt, k, radius=None):
+    dist = [(similarity.hamming(block[:fmt.frame_size], query[:fmt.frame_size]), i)
+            for i, block in enumerate(blocks)]
+    dist = sorted(d for d in dist if radius is None or d[0] <= radius)
+    return dist[:k]
+
+
+def queries(blocks, fmt, seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        frame = bytearray(rng.choice(blocks)[:fmt.frame_size])
+        for _ in range(rng.randint(0, 20)):
+            frame[rng.randrange(len(frame))] ^= 1 << rng.randrange(8)
+        yield bytes(frame) + fmt.padding
+    yield bytes(fmt.block_size)
+    yield bytes([0xFF]) * fmt.block_size
+
+
+@pytest.mark.parametrize("output_format", sorted(pov_core.FORMATS))
+def test_nearest_matches_a_brute_force_scan(output_format):
+    fmt = pov_core.get_format(output_format)
+    blocks = random_catalogue(fmt, 300, 1)
+    index = similarity.SimilarityIndex(blocks, output_format=fmt)
+    proven = 0
+    for query in queries(blocks, fmt, 2):
+        for k, radius in [(1, None), (5, None), (10, 4), (300, 12), (5, 0)]:
+            assert index.nearest(query, k, radius) == brute_force(blocks, query, fmt, k, radius)
+        # Count the queries answered from the hash tables without a full scan
+        ids, guaranteed = index.candidates(query)
+        proven += len(ids) > 0 and int(index.distances(query, ids).min()) <= guaranteed
+    assert proven > len(blocks) // 20
+
+
+def test_radius_past_the_probed_columns_falls_back_to_a_scan():
+    # With r >= the number of probed columns the candidates prove nothing
+    fmt = pov_core.get_format("hanzi")
+    blocks = random_catalogue(fmt, 200, 3)
+    index = similarity.SimilarityIndex(blocks, output_format=fmt)
+    query = blocks[17]
+    ids, guaranteed = index.candidates(query)
+    radius = guaranteed + 1
+    assert radius >= 1
+    expected = brute_force(blocks, query, fmt, len(blocks), radius)
+    assert index.nearest(query, len(blocks), radius) == expected
+    assert index.nearest(query, len(blocks), fmt.frame_size * 8) == brute_force(blocks, query, fmt, len(blocks))
+
+
+def test_blank_catalogue_has_no_rare_columns():
+    blocks = [pov_core.encode(PatternGrid(64))] * 5
+    index = similarity.SimilarityIndex(blocks)
+    assert index.candidates(blocks[0])[1] == -1
+    assert index.nearest(blocks[0], 3) == [(0, 0), (0, 1), (0, 2)]
+    assert similarity.SimilarityIndex([]).nearest(blocks[0]) == []
+
+
+@pytest.mark.parametrize("output_format", sorted(pov_core.FORMATS))
+def test_duplicates_match_grouping_by_content(output_format):
+    fmt = pov_core.get_format(output_format)
+    blocks = random_catalogue(fmt, 300, 4)
+    groups = {}
+    for i, block in enumerate(blocks):
+        groups.setdefault(block[:fmt.frame_size], []).append(i)
+    expected = sorted((ids for ids in groups.values() if len(ids) > 1), key=lambda ids: (-len(ids), ids[0]))
+    index = similarity.SimilarityIndex(blocks, output_format=fmt)
+    assert index.duplicates() == expected
+    assert all(index.block(i) == block for i, block in enumerate(blocks))
+
+
+def test_names_must_match_blocks():
+    with pytest.raises(ValueError):
+        similarity.SimilarityIndex([bytes(128)], ["a", "b"])
+
+
+def test_catalogue_in_another_format(tmp_path):
+    path = tmp_path / "catalogue.txt"
+    grids = []
+    for name, draw in pov_core.PRESETS.items():
+        grid = PatternGrid(32, 8)
+        draw(grid)
+        grids.append(grid)
+    path.write_text("".join(pov_core.generate_hex_code(grid, "mini8") for grid in grids))
+    names, blocks = similarity.load_catalogue([str(path)], "mini8")
+    index = similarity.SimilarityIndex(blocks, names, "mini8")
+    assert len(index) == 3
+    assert index.nearest(pov_core.encode(grids[1], "mini8"), 1) == [(0, 1)]
+    assert similarity.main([str(path), "-f", "mini8", "--dupes", "-q", "#2"]) == 0
@@ -0,0 +1,129 @@
+import os
+import random
+
+import pytest
+
+from pattern_grid import PatternGrid
+import raster
+from stroke import StrokeEngine
+
+
+def sparse_samples(rng, count, height=16, width=64, jump=20):
+    # Mouse positions as a fast drag reports them: far apart and irregular
+    row, col = rng.randrange(height), rng.randrange(width)
+    samples = [(row, col)]
+    for _ in range(count):
+        row = min(max(row + rng.randint(-jump, jump), 0), height - 1)
+        col = min(max(col + rng.randint(-jump, jump), 0), width - 1)
+        samples.append((row, col))
+    return samples
+
+
+def stroke(samples, flush_after, value=True, grid=None):
+    # Draws `samples` as one stroke, flushing after the sample indices in `flush_after`
+    grid = grid or PatternGrid(64)
+    engine = StrokeEngine()
+    engine.begin(*samples[0], value)
+    engine.flush(grid)
+    for i, sample in enumerate(samples[1:], 1):
+        engine.add_sample(*sample)
+        if i in flush_after:
+            engine.flush(grid)
+    stats = engine.end(grid)
+    assert stats.samples == len(samples) and not engine.active
+    return grid
+
+
+def reference(samples, value=True, grid=None):
+    # Every sample joined to the previous one, one line at a time
+    grid = grid or PatternGrid(64)
+    grid.set(*samples[0], value)
+    for (r0, c0), (r1, c1) in zip(samples, samples[1:]):
+        raster.draw_line(grid, r0, c0, r1, c1, value)
+    return grid
+
+
+def lit_cells(grid):
+    return {(r, c) for r in range(grid.height) for c in range(grid.width) if grid.get(r, c)}
+
+
+def connected(cells, start):
+    seen, todo = {start}, [start]
+    while todo:
+        r, c = todo.pop()
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                cell = (r + dr, c + dc)
+                if cell in cells and cell not in seen:
+                    seen.add(cell)
+                    todo.append(cell)
+    return seen == cells
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sparse_stroke_is_gap_free(seed):
+    rng = random.Random(seed)
+    samples = sparse_samples(rng, rng.randint(1, 30))
+    grid = stroke(samples, set(rng.sample(range(len(samples)), len(samples) // 3)))
+    cells = lit_cells(grid)
+    assert set(samples) <= cells
+    assert connected(cells, samples[0])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_coalesced_stroke_matches_uncoalesced(seed):
+    rng = random.Random(seed)
+    samples = sparse_samples(rng, 40, jump=rng.choice([1, 5, 40]))
+    every = stroke(samples, set(range(len(samples))))
+    assert stroke(samples, set()) == every
+    assert stroke(samples, set(rng.sample(range(len(samples)), 10))) == every
+    assert every == reference(samples)
+
+
+def filled():
+    grid = PatternGrid(64)
+    grid.fill()
+    return grid
+
+
+def test_erase_stroke_and_off_canvas_samples():
+    samples = [(-5, -10), (8, 30), (20, 70), (3, 63), (15, 0)]
+    assert stroke(samples, {2}, False, filled()) == reference(samples, False, filled())
+    assert stroke(samples, {1, 3}) == reference(samples)
+
+
+def test_designer_coalesces_mouse_moves():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+    from PyQt5.QtCore import QEvent, QPoint, Qt
+    from PyQt5.QtGui import QMouseEvent
+    import POV_Pattern
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    designer = POV_Pattern.POVWandDesigner()
+    try:
+        widget = designer.grid_widget
+        cell = widget.cell_size
+
+        def event(kind, row, col):
+            pos = QPoint(col * cell + cell // 2, row * cell + cell // 2)
+            return QMouseEvent(kind, pos, Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
+
+        samples = sparse_samples(random.Random(9), 25)
+        designer.current_tool = "draw"
+        widget.mousePressEvent(event(QEvent.MouseButtonPress, *samples[0]))
+        for i, sample in enumerate(samples[1:], 1):
+            widget.mouseMoveEvent(event(QEvent.MouseMove, *sample))
+            # The 16 ms timer batches every move since the last frame
+            assert widget.stroke_timer.interval() == POV_Pattern.FRAME_INTERVAL_MS
+            assert widget.stroke_timer.isActive()
+            if i % 7 == 0:
+                widget.stroke_timer.stop()
+                widget.flush_stroke()
+        widget.mouseReleaseEvent(event(QEvent.MouseButtonRelease, *samples[-1]))
+        assert not widget.stroke_timer.isActive()
+        assert designer.grid == reference(samples)
+        assert designer.statusBar().currentMessage().startswith(f"Stroke: {len(samples)} samples in 5 frames")
+        app.processEvents()
+    finally:
+        designer.close()
@@ -0,0 +1,168 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from pattern_grid import PatternGrid
+import swing_sim
+
+
+def png_chunks(data):
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    at = 8
+    chunks = []
+    while at < len(data):
+        length, = struct.unpack_from(">I", data, at)
+        kind, body = data[at + 4:at + 8], data[at + 8:at + 8 + length]
+        crc, = struct.unpack_from(">I", data, at + 8 + length)
+        assert crc == zlib.crc32(kind + body), kind
+        chunks.append((kind, body))
+        at += 12 + length
+    assert at == len(data)
+    return chunks
+
+
+@pytest.mark.parametrize("height,width", [(1, 1), (7, 13), (40, 300)])
+def test_png_round_trip(tmp_path, height, width):
+    indices = np.random.default_rng(height).integers(0, swing_sim.PALETTE_LEVELS, (height, width), dtype=np.uint8)
+    colors = swing_sim.palette((10, 200, 255))
+    path = tmp_path / "exposure.png"
+    swing_sim.write_png(str(path), indices, colors)
+    chunks = png_chunks(path.read_bytes())
+    assert [kind for kind, body in chunks] == [b"IHDR", b"PLTE", b"IDAT", b"IEND"]
+    assert struct.unpack(">IIBBBBB", chunks[0][1]) == (width, height, 8, 3, 0, 0, 0)
+    assert chunks[1][1] == colors.tobytes()
+    rows = np.frombuffer(zlib.decompress(chunks[2][1]), np.uint8).reshape(height, width + 1)
+    assert (rows[:, 0] == 0).all()
+    assert (rows[:, 1:] == indices).all()
+
+
+def gif_frames(data):
+    # Walks the block structure; returns (screen size, [(delay, LZW minimum code size, image bytes)])
+    assert data[:6] == b"GIF89a"
+    width, height, flags, _, _ = struct.unpack_from("<HHBBB", data, 6)
+    at = 13 + (3 << (flags & 7) + 1 if flags & 0x80 else 0)
+    frames, delay = [], None
+
+    def sub_blocks(at):
+        body = b""
+        while data[at]:
+            body += data[at + 1:at + 1 + data[at]]
+            at += 1 + data[at]
+        return body, at + 1
+
+    while data[at] != 0x3B:
+        if data[at] == 0x21:
+            label = data[at + 1]
+            body, at = sub_blocks(at + 2)
+            if label == 0xF9:
+                delay = struct.unpack_from("<H", body, 1)[0]
+        else:
+            assert data[at] == 0x2C
+            assert struct.unpack_from("<HHHHB", data, at + 1) == (0, 0, width, height, 0)
+            code_size = data[at + 10]
+            body, at = sub_blocks(at + 11)
+            frames.append((delay, code_size, body))
+    assert at == len(data) - 1
+    return (width, height), frames
+
+
+def lzw_decode(code_size, body):
+    # Enough of a GIF decoder for the fixed 8-bit codes write_gif emits
+    clear, end = 1 << code_size, (1 << code_size) + 1
+    pixels = []
+    for code in body:
+        if code == end:
+            break
+        if code != clear:
+            assert code < clear
+            pixels.append(code)
+    return pixels
+
+
+@pytest.mark.parametrize("count", [1, 3])
+def test_gif_frames(tmp_path, count):
+    rng = np.random.default_rng(count)
+    frames = [rng.integers(0, swing_sim.PALETTE_LEVELS, (9, 301), dtype=np.uint8) for _ in range(count)]
+    path = tmp_path / "swing.gif"
+    swing_sim.write_gif(str(path), iter(frames), swing_sim.palette(), 40)
+    data = path.read_bytes()
+    size, written = gif_frames(data)
+    assert size == (301, 9)
+    assert data[13:13 + 128 * 3] == swing_sim.palette().tobytes()
+    assert len(written) == count
+    for indices, (delay, code_size, body) in zip(frames, written):
+        assert delay == 4 and code_size == 7
+        assert lzw_decode(code_size, body) == indices.reshape(-1).tolist()
+
+
+def test_gif_decodes_with_qt(tmp_path):
+    QtGui = pytest.importorskip("PyQt5.QtGui")
+    frames = [np.full((4, 6), i * 40, np.uint8) for i in range(3)]
+    colors = swing_sim.palette((255, 255, 255))
+    path = tmp_path / "swing.gif"
+    swing_sim.write_gif(str(path), frames, colors, 100)
+    reader = QtGui.QImageReader(str(path))
+    assert reader.imageCount() == 3
+    for indices in frames:
+        image = reader.read()
+        assert (image.width(), image.height()) == (6, 4)
+        assert QtGui.QColor(image.pixel(3, 2)).red() == colors[indices[0, 0]][0]
+
+
+def test_blank_pattern_renders_dark():
+    levels, view = swing_sim.render(np.zeros((16, 8), bool), swing_sim.SwingModel(), 120)
+    assert levels.shape == (view.height, view.width) and not levels.any()
+
+
+def lit_pixels(levels, view, cutoff=0.2):
+    ys, xs = np.nonzero(levels > cutoff)
+    px, py = view.to_pixels(0, 0)
+    # Wand coordinates of every lit pixel, relative to the pivot
+    return (xs + 0.5 - px) / view.scale, (py - ys - 0.5) / view.scale
+
+
+def test_single_led_draws_an_arc_at_its_radius():
+    model = swing_sim.SwingModel(return_mode="blank", led_size=0.004)
+    bits = np.zeros((16, 32), bool)
+    bits[0] = True
+    levels, view = swing_sim.render(bits, model, 400)
+    x, y = lit_pixels(levels, view)
+    radius = np.hypot(x, y)
+    assert len(x) and abs(radius - model.radii()[0]).max() < 2 * model.led_size
+    # The columns fill the middle of the stroke, symmetric about upright
+    stroke = model.period / 2
+    start = (stroke - 32 * model.column_period(32)) / 2
+    reach = -model.angle(start)
+    angles = np.arctan2(x, y)
+    assert abs(angles.max() - reach) < 0.05 and abs(angles.min() + reach) < 0.05
+
+
+def test_single_column_lights_upright():
+    model = swing_sim.SwingModel(window=0.02, return_mode="blank")
+    levels, view = swing_sim.render(np.ones((16, 1), bool), model, 300)
+    x, y = lit_pixels(levels, view)
+    assert abs(x).max() < 0.02
+    assert y.min() > model.radius - 0.01 and y.max() < model.radii()[0] + 0.01
+
+
+def letter_l():
+    grid = PatternGrid(64)
+    for row in range(2, 14):
+        grid.set(row, 20, True)
+    for col in range(20, 30):
+        grid.set(13, col, True)
+    return grid
+
+
+def test_return_stroke_repeats_the_exposure():
+    # Reversed columns on the way back land where they were drawn, doubling
+    # the light of a forward-only exposure
+    bits = swing_sim.column_bits(letter_l())
+    forward, view = swing_sim.render(bits, swing_sim.SwingModel(return_mode="blank"), 200)
+    both, _ = swing_sim.render(bits, swing_sim.SwingModel(return_mode="reverse"), 200)
+    assert np.abs(both - (1 - (1 - forward) ** 2)).max() < 0.02
+    mirrored, _ = swing_sim.render(bits, swing_sim.SwingModel(return_mode="same"), 200)
+    assert np.abs(mirrored - both).max() > 0.2
+
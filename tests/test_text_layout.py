@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from glyphs import GLYPHS
+from pattern_grid import PatternGrid
+import text_layout
+
+ALPHABET = "".join(GLYPHS) + "  ab?"
+
+
+def fresh(text, width, height, layout):
+    grid = PatternGrid(width, height)
+    text_layout.render_text(grid, text, layout)
+    return grid
+
+
+def random_edit(rng, text):
+    pos = rng.randint(0, len(text))
+    action = rng.randrange(4)
+    if action == 0 or not text:
+        return text[:pos] + "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 3))) + text[pos:]
+    if action == 1:
+        return text[:pos] + text[pos + rng.randint(1, 3):]
+    if action == 2:
+        return text[:pos] + rng.choice(ALPHABET) + text[pos + 1:]
+    return text[:pos]
+
+
+LAYOUTS = [
+    text_layout.TextLayout(),
+    text_layout.TextLayout(align="left", valign="top"),
+    text_layout.TextLayout(align="right", valign="bottom", spacing=0),
+    text_layout.TextLayout(kerning="auto"),
+    text_layout.TextLayout(kerning="auto", spacing=2, align="right", space_width=3),
+    text_layout.TextLayout(kerning={("A", "V"): -2, ("L", "T"): -3, ("T", "A"): -1}, align="left"),
+    text_layout.TextLayout(row=4, align="center", spacing=0, kerning="auto"),
+]
+
+
+@pytest.mark.parametrize("layout", range(len(LAYOUTS)))
+@pytest.mark.parametrize("width,height", [(64, 16), (20, 16), (97, 24), (32, 8)])
+def test_incremental_render_matches_fresh_render(layout, width, height):
+    layout = LAYOUTS[layout]
+    rng = random.Random(f"{layout} {width} {height}")
+    grid = PatternGrid(width, height)
+    renderer = text_layout.TextRenderer(grid, layout)
+    text = ""
+    for _ in range(150):
+        text = random_edit(rng, text)[:24]
+        renderer.set_text(text)
+        assert grid == fresh(text, width, height, layout), text
+
+
+def test_set_layout_redraws_the_text():
+    grid = PatternGrid(64, 16)
+    renderer = text_layout.render_text(grid, "LAVA TWO")
+    rng = random.Random(2)
+    for _ in range(30):
+        layout = rng.choice(LAYOUTS)
+        renderer.set_layout(layout)
+        assert grid == fresh("LAVA TWO", 64, 16, layout)
+
+
+def test_unchanged_text_restamps_nothing():
+    grid = PatternGrid(64, 16)
+    renderer = text_layout.TextRenderer(grid, text_layout.TextLayout(align="left"))
+    assert renderer.set_text("HELLO") == 5
+    assert renderer.set_text("HELLO") == 0
+    # Appending on a left-aligned line only stamps the new glyph
+    assert renderer.set_text("HELLOW") == 1
+
+
+def test_auto_kerning_keeps_glyphs_apart():
+    layout = text_layout.TextLayout(kerning="auto", align="left")
+    for left in GLYPHS:
+        for right in GLYPHS:
+            a, b = layout.place(left + right, 64)
+            overlap = set(range(a.col, a.end)) & set(range(b.col, b.end))
+            for col in overlap:
+                assert not a.glyph.columns[col - a.col] & b.glyph.columns[col - b.col]
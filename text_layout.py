@@ -0,0 +1,175 @@
+from functools import lru_cache
+
+from glyphs import GLYPH_HEIGHT, GLYPH_WIDTH, GLYPHS
+
+ALIGNMENTS = ("left", "center", "right")
+VERTICAL_ALIGNMENTS = ("top", "middle", "bottom")
+
+
+@lru_cache(maxsize=None)
+def auto_kerning(left, right, spacing, max_kern=1):
+    # Tighten a pair by up to `max_kern` columns as long as no lit cell of
+    # `right` comes within `spacing` columns of a lit cell of `left` in the
+    # same or a neighbouring row
+    a, b = GLYPHS[left], GLYPHS[right]
+    best = 0
+    for adjust in range(-1, -max_kern - 1, -1):
+        for ca, mask_a in enumerate(a.columns):
+            near = mask_a | mask_a << 1 | mask_a >> 1
+            for cb, mask_b in enumerate(b.columns):
+                if a.width + spacing + adjust + cb - ca <= spacing and near & mask_b:
+                    return best
+        best = adjust
+    return best
+
+
+class Placement:
+    __slots__ = ("glyph", "col")
+
+    def __init__(self, glyph, col):
+        self.glyph = glyph
+        self.col = col
+
+    def __eq__(self, other):
+        return self.glyph is other.glyph and self.col == other.col
+
+    @property
+    def end(self):
+        return self.col + self.glyph.width
+
+
+class TextLayout:
+    # kerning: None, "auto", or a dict of (left, right) letter pairs -> column adjustment
+    # row: explicit top row, overriding valign
+
+    def __init__(self, spacing=1, kerning=None, align="center", valign="middle",
+                 row=None, space_width=GLYPH_WIDTH):
+        if align not in ALIGNMENTS:
+            raise ValueError(f"align must be one of {', '.join(ALIGNMENTS)}")
+        if valign not in VERTICAL_ALIGNMENTS:
+            raise ValueError(f"valign must be one of {', '.join(VERTICAL_ALIGNMENTS)}")
+        self.spacing = spacing
+        self.kerning = kerning
+        self.align = align
+        self.valign = valign
+        self.row = row
+        self.space_width = space_width
+
+    def kern(self, left, right):
+        if self.kerning == "auto":
+            return auto_kerning(left, right, self.spacing)
+        if self.kerning:
+            return self.kerning.get((left, right), 0)
+        return 0
+
+    def top(self, height):
+        if self.row is not None:
+            return self.row
+        if self.valign == "top":
+            return 0
+        if self.valign == "bottom":
+            return height - GLYPH_HEIGHT
+        return (height - GLYPH_HEIGHT) // 2
+
+    def place(self, text, width):
+        # Lay glyphs out from column 0, then shift the whole line for alignment
+        placements = []
+        col = 0
+        previous = None
+        for ch in text.upper():
+            if ch == " ":
+                col += self.space_width + self.spacing
+                previous = None
+                continue
+            glyph = GLYPHS.get(ch)
+            if glyph is None:
+                continue
+            if previous is not None:
+                col += self.kern(previous, ch)
+            placements.append(Placement(glyph, col))
+            col += glyph.width + self.spacing
+            previous = ch
+        text_width = max(col - self.spacing, 0)
+
+        if self.align == "center":
+            offset = (width - text_width) // 2
+        elif self.align == "right":
+            offset = width - text_width
+        else:
+            offset = 0
+        for placement in placements:
+            placement.col += offset
+        return placements
+
+
+def _extent(placements):
+    if not placements:
+        return None
+    return min(p.col for p in placements), max(p.end for p in placements)
+
+
+class TextRenderer:
+    # Keeps one line of text rendered into a grid. set_text() only clears and
+    # re-stamps from the first glyph whose placement changed.
+
+    def __init__(self, grid, layout=None):
+        self.grid = grid
+        self.layout = layout or TextLayout()
+        self.text = ""
+        self.top = self.layout.top(grid.height)
+        self.placements = []
+
+    def reset(self):
+        # Forget what was drawn (after the grid was cleared underneath us)
+        self.text = ""
+        self.placements = []
+
+    def set_layout(self, layout):
+        text = self.text
+        self.clear()
+        self.layout = layout
+        self.set_text(text)
+
+    def clear(self):
+        extent = _extent(self.placements)
+        if extent is not None:
+            self._clear_columns(*extent)
+        self.reset()
+
+    def _clear_columns(self, start, end):
+        start = max(start, 0)
+        if end > start:
+            self.grid.blit(self.top, start, [0] * (end - start), GLYPH_HEIGHT)
+
+    def set_text(self, text):
+        top = self.layout.top(self.grid.height)
+        if top != self.top:
+            self.clear()
+            self.top = top
+        old, new = self.placements, self.layout.place(text, self.grid.width)
+        first = 0
+        while first < len(old) and first < len(new) and old[first] == new[first]:
+            first += 1
+        self.text = text
+        if first == len(old) == len(new):
+            return 0
+
+        # Clear from the first changed glyph to the end of the old or new line,
+        # then re-stamp every new glyph that reaches into that span
+        changed = _extent(old[first:] + new[first:])
+        start, end = changed
+        self._clear_columns(start, end)
+        restamped = 0
+        for placement in new:
+            if placement.end > start:
+                self.grid.blit(self.top, placement.col, placement.glyph.columns,
+                               placement.glyph.height, replace=False)
+                restamped += 1
+        self.placements = new
+        return restamped
+
+
+def render_text(grid, text, layout=None):
+    renderer = TextRenderer(grid, layout)
+    renderer.set_text(text)
+    return renderer